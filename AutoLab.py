@@ -38,6 +38,7 @@ import os
 import datetime
 import time
 import importlib
+import json
 from pathlib import Path
 
 from multiprocessing import Process, Queue, Pipe
@@ -59,13 +60,27 @@ class Window(tk.Frame):
     This class should handle GUI
     """
     
-    Data = []
+    #Number of measurement slots opened so far, the main window is slot 0
+    SlotCount = 1
     
-    def __init__(self, master,Resources):
+    def __init__(self, master,Resources,Slot=0):
         """
         Initial setup of widgets and the general window position
+        
+        Parameters
+        ----------
+        master : tk.Tk or tk.Toplevel
+            Window to put everything in
+        Resources : ResourcesObj
+            Shared instrument connections
+        Slot : int, optional
+            Measurement slot number. Slot 0 is the main window, the others are
+            extra windows running their own measurement at the same time. The default is 0.
         """
         super().__init__(master)
+        
+        self.Slot = Slot
+        self.Closed = False
         #self.pack()
         
         #Setup multiprocesing
@@ -76,8 +91,46 @@ class Window(tk.Frame):
         self.Measure = None
         self.MeasureActive = False
         
+        #Columnar store of everything received this run, used for plotting
+        self.Data = Utility.DataStore()
+        #Optional shared memory ring for the numeric data, made by the handler if it wants one
+        self.Ring = None
+        
+        #What to do with each type of message from the worker, see Utility.Messages
+        self.MessageHandlers = {Utility.MSG_ROW:self.AddRow,
+                                Utility.MSG_BLOCK:self.AddBlock,
+                                Utility.MSG_HEADER:self.AddHeader,
+                                Utility.MSG_CONTROL:self.RunCommand,
+                                Utility.MSG_ERROR:self.ShowError,
+                                Utility.MSG_CHECKPOINT:self.SaveCheckpoint}
+        
         self.Resources = Resources
         
+        #Runs waiting to go, each one is the settings of a worker script and a filename.
+        #Kept in a file so it survives closing AutoLab
+        if Slot == 0:
+            self.QueueFile = "RunQueue.json"
+        else:
+            self.QueueFile = "RunQueue_Slot{}.json".format(Slot)
+        self.RunQueue = self.LoadQueue()
+        self.QueueRunning = False
+        self.QueueWindow = None
+        
+        #Every save file made gets added to the run catalog so it can be searched later.
+        #All the slots share the same one
+        self.CatalogFile = "RunCatalog.db"
+        try:
+            self.Catalog = Utility.RunCatalog(self.CatalogFile)
+        except Exception as e:
+            print(e)
+            print("Couldn't open the run catalog, runs won't be catalogued")
+            self.Catalog = None
+        self.RunID = None
+        
+        #Checkpoint file of the current save file, for resuming a run that was cut short
+        self.CheckpointPath = None
+        self.RunInfo = {}
+        
         ###################################
         ##########  Setup Frames  #########
         ###################################
@@ -95,7 +148,7 @@ class Window(tk.Frame):
         
         ######### Utility frame and Tabs ###########
         
-        self.UtilFrame = tk.Frame()
+        self.UtilFrame = tk.Frame(master)
         self.UtilFrame.grid(column=1, row=4, columnspan=1, rowspan=1)
         self.UtilFrame['borderwidth'] = 2
         self.UtilFrame['relief'] = 'raised'
@@ -117,6 +170,10 @@ class Window(tk.Frame):
         self.GraphUtilTab = Utility.GraphUtil.Util(self.UtilTabs)
         self.utilTabModules[self.GraphUtilTab.name] = self.GraphUtilTab
         
+        #timings of each window update, for finding out why things are slow
+        self.PerfTab = Utility.PerfUtil.Util(self.UtilTabs)
+        self.utilTabModules[self.PerfTab.name] = self.PerfTab
+        
         # self.sudoTab=Utility.sudoUtil.Util(self.UtilTabs,parent=self)
         # self.utilTabModules[self.sudoTab.name]=self.sudoTab
         #self.CreateGraphUtilTab()
@@ -125,7 +182,7 @@ class Window(tk.Frame):
         
         ############## File frame ##################
         
-        self.fileSysFrame = tk.Frame()
+        self.fileSysFrame = tk.Frame(master)
         self.fileSysFrame.grid(column=0, row=1, columnspan=1, rowspan=1)
         self.fileSysFrame['borderwidth'] = 2
         self.fileSysFrame['relief'] = 'raised'
@@ -164,7 +221,7 @@ class Window(tk.Frame):
         
         ############## Graph frame + Graph utility ##################
         
-        self.GraphFrame = tk.Frame()
+        self.GraphFrame = tk.Frame(master)
         self.GraphFrame.grid(column=1, row=1, columnspan=1, rowspan=3)
         self.GraphFrame['borderwidth'] = 2
         self.GraphFrame['relief'] = 'raised'
@@ -178,7 +235,7 @@ class Window(tk.Frame):
         
         ############## Measurement frame ###################
         
-        self.MeasFrame = tk.Frame()
+        self.MeasFrame = tk.Frame(master)
         self.MeasFrame.grid(column=0, row=2, columnspan=1, rowspan=2)
         self.MeasFrame['borderwidth'] = 2
         self.MeasFrame['relief'] = 'raised'
@@ -194,12 +251,14 @@ class Window(tk.Frame):
         
         self.CreateMeasTab()
         
-        self.SetupInstruments(setupFilename)
+        #Instruments are shared between all the slots, only load them once
+        if Slot == 0:
+            self.SetupInstruments(setupFilename)
         
         
         ############# Start/stop/busy frame ######################
         
-        self.RunFrame = tk.Frame()
+        self.RunFrame = tk.Frame(master)
         self.RunFrame.grid(column=0, row=4, columnspan=1, rowspan=1)
         self.RunFrame['borderwidth'] = 2
         self.RunFrame['relief'] = 'raised'
@@ -237,7 +296,15 @@ class Window(tk.Frame):
         self.IndicatorLabel["image"] = self.Icons["IDLE"]
         self.IndicatorLabel.grid(column=2, row=0)
         
-        self.IndicatorFlashState = 0
+        #How far behind reading the worker's data is, 0 when it's keeping up
+        self.LagLabel = tk.Label(self.RunFrame,text="Lag: 0.0 s")
+        self.LagLabel.grid(column=2, row=1)
+        self.CaughtUp_T = time.time()
+        
+        #Refresh scheduling, the interval is adjusted between the limits set in the graph tab
+        self.RefreshInterval = 250
+        self.LastDraw_T = 0
+        self.DrawTime = 0
         
         #self.UtilLabel = tk.Label(self.UtilFrame,text="Utilities")
         #self.UtilLabel.pack(side="top")
@@ -254,45 +321,109 @@ class Window(tk.Frame):
         """
         This is the general window that updates anything that needs updating.
         Avoid running long process here, must be quick as possible
+        Every slot window has its own UpdateWindow running on the same Tk mainloop.
+        
+        Reschedules itself: quickly while data is coming in, slowing down towards
+        the max refresh time when idle. Reading the pipe is done every time,
+        the graph is only redrawn when there is something new and it's been long
+        enough since the last draw (at least 4x the time the last draw took).
         """
         
+        #Slot window has been closed, stop updating
+        if self.Closed:
+            return
+        
+        Backlog = False
+        nPoints = len(self.Data)
+        ReadTime = 0
+        self.GraphTime = 0
+        self.CanvasTime = 0
         
         if self.MeasureActive:
             # Update measurement stuff
             
-            # flash the active icon
-            FlashCycles = 4 # Number of cycles to switch flash on
+            # flash the active icon, on for half a second then off for half a second
             #TODO: Grey-Out things in the top-bar while measurement is running.
-            if self.IndicatorFlashState<FlashCycles:
+            if time.time() % 1 < 0.5:
                 self.IndicatorLabel["image"] = self.Icons["ACTIVE"]
             else:
                 self.IndicatorLabel["image"] = self.Icons["ACTIVE_DARK"]
-
-            self.IndicatorFlashState += 1
-            if self.IndicatorFlashState>FlashCycles*2:
-                self.IndicatorFlashState = 0
-                
             
+            # Get data from the worker by reading the que, for a limited time
+            #Still stuff waiting means don't spend time drawing until it's read
+            Read_T = time.perf_counter()
+            Backlog = not self.GetData()
+            ReadTime = time.perf_counter() - Read_T
+            #Only finish once everything the worker sent has been read and saved
+            if self.MeasureActive and not Backlog:
+                Finished = self.CheckMeasureFinished()
+                if Finished:
+                    print("Measurement finished with exitcode {}".format(self.MeasHandler.Worker.exitcode))
+                    self.MeasureFinished(self.MeasHandler.Worker.exitcode==0)
+                    self.MeasureActive = False
             
-            # Get data from the worker by reading the que
-            self.GetData()
-            Finished = self.CheckMeasureFinished()
-            if Finished:
-                print("Measurement finished with exitcode {}".format(self.MeasHandler.Worker.exitcode))
-                self.MeasureFinished()
-                self.MeasureActive = False
+            self.LagLabel["text"] = "Lag: {:.1f} s".format(time.time()-self.CaughtUp_T)
         else:
             self.IndicatorLabel["image"] = self.Icons["IDLE"]
         
+        #Start the next queued run straight away once the last one has finished
+        if not self.MeasureActive and self.QueueRunning:
+            self.StartNextQueued()
+        
+        NewData = len(self.Data) != nPoints
         
         if self.GraphUtilTab.CurrentGraph ==  self.GraphUtilTab.GraphSelectOption.get():
-            self.UpdateGraph()
+            #With a backlog reading comes first, but never leave the graph longer than the
+            #max refresh interval or a worker that keeps the pipe full freezes it for the whole run
+            SinceDraw = time.time()-self.LastDraw_T
+            MaxGap = max(self.GraphUtilTab.RefreshBounds()[1]/1000, 4*self.DrawTime)
+            if (not Backlog and SinceDraw >= 4*self.DrawTime) or SinceDraw >= MaxGap:
+                Start_T = time.time()
+                if self.UpdateGraph():
+                    self.LastDraw_T = time.time()
+                    self.DrawTime = self.LastDraw_T - Start_T
         else:
             #re create graph is new graph type
             self.GraphUtilTab.CurrentGraph = self.GraphUtilTab.GraphSelectOption.get()
             self.CreateGraph()
         
-        self.after(250,self.UpdateWindow)
+        Refresh = self.NextRefresh(NewData,Backlog)
+        
+        #Does nothing unless turned on in the performance tab
+        self.PerfTab.Record(ReadTime, self.GraphTime, self.CanvasTime,
+                            getattr(self,"FileWriter",None), self.Ring, Backlog,
+                            len(self.Data)-nPoints, Refresh)
+        
+        self.after(Refresh,self.UpdateWindow)
+    
+    def NextRefresh(self,NewData,Backlog):
+        """
+        Works out how long to wait until the next UpdateWindow in ms
+        
+        Parameters
+        ----------
+        NewData : bool
+            Points arrived this time round
+        Backlog : bool
+            There was still data waiting in the pipe/ring after reading
+        """
+        Min, Max = self.GraphUtilTab.RefreshBounds()
+        
+        if Backlog:
+            #go flat out until it's caught up
+            self.RefreshInterval = Min
+        elif NewData:
+            self.RefreshInterval = self.RefreshInterval/2
+        else:
+            #nothing happening, back off
+            self.RefreshInterval = self.RefreshInterval*1.5
+        
+        #No point coming back before the graph is allowed to be redrawn, unless there's data to read
+        if not Backlog:
+            self.RefreshInterval = max(self.RefreshInterval, 4000*self.DrawTime)
+        
+        self.RefreshInterval = min(max(self.RefreshInterval,Min),Max)
+        return int(self.RefreshInterval)
     
     #########################################
     ####### Setup utilites section ##########
@@ -303,7 +434,7 @@ class Window(tk.Frame):
         Setup menu options at the top of the window. add extra functionality here.
         """
         
-        menuFrame = tk.Frame()
+        menuFrame = tk.Frame(self.master)
         menuFrame.grid(column=0, row=0, columnspan=2,sticky="w")
         menuFrame['relief'] = 'raised'
         
@@ -318,13 +449,22 @@ class Window(tk.Frame):
         self.rescriptButton=tk.Button(menuFrame,text="Refresh Scripts",command=self.refresh_Workers)
         self.rescriptButton.grid(column=1,row=0,padx=20)#button to re-fresh the loaded script
         
+        self.queueButton=tk.Button(menuFrame,text="Run Queue",command=self.OpenQueueWindow)
+        self.queueButton.grid(column=2,row=0,padx=20)#list of runs to do one after the other
+        
+        self.slotButton=tk.Button(menuFrame,text="New Slot",command=self.OpenSlot)
+        self.slotButton.grid(column=3,row=0,padx=20)#another window to run a second measurement at the same time
+        
+        self.resumeButton=tk.Button(menuFrame,text="Resume Run",command=self.ResumeRun)
+        self.resumeButton.grid(column=4,row=0,padx=20)#carry on a run from its checkpoint after a crash
+        
     
     def SetupUtilTabs(self,SetupFile):
         
         print("Loading Utilities")
-        rm=pyvisa.ResourceManager()
-        self.address_list=rm.list_resources()
-        rm.close()#Create a list of Valid GPIB/COMS ports. Useful for passing to workers/utils
+        #List of Valid GPIB/COMS ports. Useful for passing to workers/utils
+        #Scanned once in the background by ResourcesObj, only waits if it hasn't finished yet
+        self.address_list=self.Resources.Discovery.List()
         
         file = open(SetupFile,"r")
         
@@ -397,12 +537,26 @@ class Window(tk.Frame):
     def refresh_Address_list(self):
         """
         quick routine to re-poll the resource list.
+        The scan runs in the background, address_list is updated when it's done
         TODO: Test this on a live rig
 
         """
-        rm=pyvisa.ResourceManager()
-        self.address_list=rm.list_resources()
-        rm.close()
+        self.Resources.Discovery.Refresh(Wait=False)
+        self.refreshButton["state"] = "disabled"
+        self.after(200,self.CheckAddressRefresh)
+    
+    def CheckAddressRefresh(self):
+        """
+        Picks up the new resource list once the background scan has finished
+        """
+        if self.Closed:
+            return
+        if self.Resources.Discovery.IsScanning():
+            self.after(200,self.CheckAddressRefresh)
+            return
+        self.address_list=self.Resources.Discovery.List()
+        self.refreshButton["state"] = "normal"
+        print("Found {} VISA resources".format(len(self.address_list)))
         
     def refresh_Workers(self):
         """
@@ -470,12 +624,20 @@ class Window(tk.Frame):
         """Update the graph widget with the latest data, using the selected settings
         """
         
-        self.GraphUtilTab.UpdateGraph(self.Data)
+        Start_T = time.perf_counter()
+        Changed = self.GraphUtilTab.UpdateGraph(self.Data)
+        Graph_T = time.perf_counter()
+        self.GraphTime = Graph_T - Start_T
         
         try:
-            self.fig.canvas.draw()
+            #blits just the data if the axes haven't changed
+            if Changed:
+                self.GraphUtilTab.Draw()
         except:
             print("Couldn't update graph")
+        self.CanvasTime = time.perf_counter() - Graph_T
+        
+        return Changed
         
     ########################################
     ####### Setup Measure section ##########
@@ -522,43 +684,63 @@ class Window(tk.Frame):
             filename = filename.name[( len(os.getcwd())+1 ):-3]
             Module_ID = filename.replace("/",".")
             #importlib.import_module requires an ID in the format Package.subpackage.module, this supplies this nicely
-            self.MeasWorkerScript = importlib.import_module(Module_ID,file_path)
-            #Only the Module we need has been loaded now, rather than everything in Workers
-            #also means we can call importlib.reload on it to apply changes
-            # for module in modules[1:]:
-            #     MeasWorkerScript = getattr(MeasWorkerScript, module)
-            
-            self.MeasHandler = self.MeasWorkerScript.Handler(self.WorkerBook,self)
-            try:
-                self.GraphUtilTab.Initialise_Dropdowns(self.MeasHandler.Header_List)
-            except AttributeError:
-                #if tehre is no Header list, you're stuck with the old Textboxes, enjoy!
-                self.GraphUtilTab.Initialise_Textboxes()
-            
-            self.MeasWorker = self.MeasWorkerScript.Worker           
+            self.LoadWorkerModule(Module_ID,file_path)
             
             print("Finished loading worker")
             return
+    
+    def LoadWorkerModule(self,Module_ID,file_path=None):
+        """
+        Imports a worker script (e.g. Workers.TestWorker) and makes its Handler in the WorkerBook
+        """
+        self.MeasWorkerScript = importlib.import_module(Module_ID,file_path)
+        self.MeasWorkerID = Module_ID
+        #Only the Module we need has been loaded now, rather than everything in Workers
+        #also means we can call importlib.reload on it to apply changes
+        
+        self.MeasHandler = self.MeasWorkerScript.Handler(self.WorkerBook,self)
+        try:
+            self.GraphUtilTab.Initialise_Dropdowns(self.MeasHandler.Header_List)
+        except AttributeError:
+            #if tehre is no Header list, you're stuck with the old Textboxes, enjoy!
+            self.GraphUtilTab.Initialise_Textboxes()
+        
+        self.MeasWorker = self.MeasWorkerScript.Worker
         
     
     ################################################################
     ##### Starting, stopping and moditoring measure section ########
     ################################################################
     
-    def RunMeasure(self):
+    def RunMeasure(self,Resume=None,Append=False):
         """Starts the measurement Worker
         Calls the MeasHandler.Start and gives it the Pipe to send data back and forth
+        
+        Parameters
+        ----------
+        Resume : dict, optional
+            Checkpoint to carry on from, see ResumeRun. The default is None (start from the beginning).
+        Append : bool, optional
+            Carry on in the checkpoint's save file rather than a new one. The default is False.
         """
         
         #Reset all of graphing data lists
-        self.Data = []
+        #one column per Header_List entry, otherwise the width is taken from the first point
+        try:
+            self.Data = Utility.DataStore(self.MeasHandler.Header_List)
+        except AttributeError:
+            self.Data = Utility.DataStore()
         self.xData = []
         self.y1Data = []
         self.y2Data = []
         
         try:
-            filename = self.filenameInput.get()
-            if self.CreateFile(filename):
+            if Append:
+                Created = self.ReopenSaveFile(Resume)
+            else:
+                filename = self.filenameInput.get()
+                Created = self.CreateFile(filename)
+            if Created:
                 print("File created")
             else:
                 raise()
@@ -566,6 +748,14 @@ class Window(tk.Frame):
             print(e)
             print("Failed to create file")
             return
+        
+        #What goes in the checkpoints, enough to set the run up again
+        self.RunInfo = self.CurrentRun()
+        self.RunInfo.update(self.SaveFileInfo)
+        
+        #Tell the worker where to carry on from, it reads this with Utility.ResumeIndex
+        if Resume is not None:
+            self.PipeRecv.send(("RESUME",Resume["Index"]))
              
         # try to start the measurement worker, raise error if it failed
         try:
@@ -576,112 +766,237 @@ class Window(tk.Frame):
                 return
         except Exception as e:
             print(e)
+            #don't leave the resume message for the next worker
+            while self.PipeSend.poll():
+                self.PipeSend.recv()
             self.CloseSaveFile()
             return
         
+        #If the handler made a SharedRing the numbers come through that, only commands through the pipe
+        try:
+            self.Ring = self.MeasHandler.Ring
+        except AttributeError:
+            self.Ring = None
+        
+        self.CaughtUp_T = time.time()
         self.MeasureActive = True
     
     def GetData(self):
         """
         Check if the pipe has anything in it
         Loads data from the pipe and adds it to the datasets
+        
+        Messages are tagged (see Utility.Messages): a single point [X,Y1,Y2...],
+        a block of points (2D numpy array or list of rows) unpacked in one go,
+        header text, a command or an exception.
+        
+        Only reads for as long as the read budget in the graph tab allows (and up
+        to a max number of messages) so the GUI doesn't freeze when the worker is
+        fast. Whatever is left gets read next time round.
+        
+        Returns
+        -------
+        True if everything waiting has been read, False if there is a backlog
         """
-        #start timeout timer for reading the pipe contents, 5sec max
+        Budget, MaxMessages = self.GraphUtilTab.ReadLimits()
         Start_T = time.time()
+        nMessages = 0
+        
+        if not self.DrainRing(Start_T+Budget):
+            return False
         
         while(True):
-            # Timeout if it spends too long reading the que, likely because is very full
-            if time.time()-Start_T>5:
-                print("Timeout, Queue might be too large!")
-                break
-            
             #Check if there is something to recieve in the pipe
             if not self.PipeRecv.poll():
                 break
             
-            #get data from pipe
-            Data = self.PipeRecv.recv()#this should be a short list of data to be plotted/written to file
-
-            #TODO make flags for drawning to graph
-            #TODO unwraping multiple points
-            #If data isn't a string append to rawdata list for plotting
-            try:
-                types=[type(ob) for ob in Data]
-
-                if str not in types:
-                    self.Data.append(Data)
-                    #This is the Data to be PLotted On-Screen, not what is saved to the save-file
-                    
-                # TODO add more key work commands, NewFile, ClearGraph,
-
-                elif Data=="Esc":
-                    self.MeasureFinished()
-                    break
-                elif Data=="ClearGraph":
-                    self.Data = []
-                    self.xData = []
-                    self.y1Data = []
-                    self.y2Data = []
-                    continue
-                elif str(Data).startswith("NewFile"):
-                    self.CloseSaveFile()
-                    #get filename and add everything after 'Newfile '
-                    filename = self.filenameInput.get()
-                    self.CreateFile(filename[:-4] + Data[8:] + filename[-4:])
-                    #now have new save file but want the plotted data to reflect whats in the file, 
-                    #so duplicate the above fn.
-                    self.Data = []
-                    self.xData = []
-                    self.y1Data = []
-                    self.y2Data = []
-                    continue
-                
-            except TypeError as e:
-                #if Data is a single int/float, the types generator wont work. 
-                #because strings are lists of string characters, strings work fine.
-                #But Exceptions are not indexable. If the Handler throws an exception we can catch it here to MakeToast
-                
-                if isinstance(Data,Exception):
-                    #Should catch any Exception object (Any exception, TypeError, AttrError...)
-                    #that is sent down the pipe.
-                    #Allows for Error-finding that won't get swamped by other statements on the Terminal.
-                    tk.messagebox.showerror("Found an error!",Data.args[0])
-                    #print(Data)
-                    self.MeasureFinished()
-                else:
-                    print(e)
-                    print("Received Data that couldnt be iterated over, not sure what you're doing! Aborting.")
-                    print(Data)
-                    self.MeasureFinished()
-                    break
-                
+            # Out of time for this update, leave the rest in the pipe for next time
+            if nMessages>=MaxMessages or time.time()-Start_T>Budget:
+                return False
+            nMessages += 1
             
-            ##### Save data to save file ####
+            #The worker writes to the ring before sending commands down the pipe,
+            #so empty the ring first to keep everything in order
+            if not self.DrainRing(Start_T+Budget):
+                return False
             
-            #Convert Data list to string and remove the brackets. This is what gets saved, so strings are OK.
-            if type(Data)==list:
-            #assume by this point data Has been sanitised, so can pass to routines w. impunity
-                try:
-                    self.MeasHandler.Update(Data)
-                    #pass Data to the measurement Handler in order to update GUI elements within the Worker
-                except AttributeError:
-                    pass
-                #Handle the case where there is no Update routine
-                    
-                save_Data = str(Data)
-                save_Data = save_Data.replace(", ",self.delimiterOption)
-                save_Data = save_Data[1:-1]+"\n" #removes brackets on either end and ameks new line
+            #get data from pipe
+            Data = self.PipeRecv.recv()#this should be a short list of data to be plotted/written to file
             
-                #write Data to string
-                self.file.write( str(save_Data) )
-
+            #Messages are (Tag, Payload), look up what to do from the tag.
+            #Each one returns True if reading should stop, e.g. at the end of the measurement
+            Tag, Payload = Utility.Unpack(Data)
+            if self.MessageHandlers.get(Tag,self.BadMessage)(Payload):
+                break
+        
+        self.CaughtUp_T = time.time()
+        return True
+    
+    def AddRow(self,Row):
+        """
+        Adds a single point to the graph data and the save file
+        """
+        #a single point as a 1D numpy array, treat it like a list
+        if isinstance(Row,np.ndarray):
+            Row = Row.tolist()
+        else:
+            Row = list(Row)
+        
+        try:
+            self.Data.Append(Row)
+            #This is the Data to be PLotted On-Screen, not what is saved to the save-file
+        except ValueError as e:
+            #Wrong number of columns or not numbers, still gets saved below
+            print(e)
+            print("Couldn't add point to graph data")
+        
+        try:
+            self.MeasHandler.Update(Row)
+            #pass Data to the measurement Handler in order to update GUI elements within the Worker
+        except AttributeError:
+            pass
+        #Handle the case where there is no Update routine
+        
+        #Formatting and writing happens on the FileWriter thread
+        self.FileWriter.WriteRow(Row)
+    
+    def AddHeader(self,Header):
+        """
+        Writes column names (list) or a line of header text (str) to the save file
+        """
+        if isinstance(Header,str):
+            if not Header.endswith("\n"):
+                Header = Header + "\n"
+            self.FileWriter.WriteText(Header)
+        else:
+            self.FileWriter.WriteRow(list(Header))
+    
+    def RunCommand(self,Command):
+        """
+        Commands from the worker: Esc, ClearGraph or NewFile
+        """
+        # TODO add more key work commands
+        if Command=="Esc":
+            self.MeasureFinished()
+            return True
+        elif Command=="ClearGraph":
+            self.Data.Clear()
+        elif str(Command).startswith("NewFile"):
+            self.CloseSaveFile()
+            #the worker has moved on from the last file, there's nothing to resume in it
+            self.RemoveCheckpoint()
+            #get filename and add everything after 'Newfile '
+            filename = self.filenameInput.get()
+            self.CreateFile(filename[:-4] + Command[8:] + filename[-4:])
+            #now have new save file but want the plotted data to reflect whats in the file, 
+            #so duplicate the above fn.
+            self.Data.Clear()
+        else:
+            print("Unknown command from worker: {}".format(Command))
+        return False
+    
+    def ShowError(self,Error):
+        """
+        The worker sent an exception, show it and finish the measurement
+        """
+        #Allows for Error-finding that won't get swamped by other statements on the Terminal.
+        if len(getattr(Error,"args",())) > 0:
+            Text = str(Error.args[0])
+        else:
+            Text = str(Error)
+        tk.messagebox.showerror("Found an error!",Text)
+        #don't carry on with the queue until someone has looked at it
+        self.StopQueue()
+        #keep the checkpoint so it can be resumed once it's sorted out
+        self.MeasureFinished(False)
+        #The worker has stopped, what's left (the Esc from its finally) would end the next run
+        while self.PipeRecv.poll():
+            print("Discarding {}".format(self.PipeRecv.recv()))
+        return True
+    
+    def BadMessage(self,Data):
+        """
+        Something came down the pipe that isn't a known message
+        """
+        print("Received Data that couldnt be iterated over, not sure what you're doing! Aborting.")
+        print(Data)
+        self.StopQueue()
+        self.MeasureFinished(False)
+        return True
+    
+    def AddBlock(self,Block):
+        """
+        Adds a block of points to the graph data and writes them to the save file in one go
+        Workers doing buffered reads should send these instead of one message per point
+        """
+        if isinstance(Block,np.ndarray):
+            #copy, it might be a view of the shared ring which gets reused once we're done
+            Block = np.array(Block,dtype=float)
+        else:
+            Block = [list(Row) for Row in Block]
+        
+        if len(Block)==0:
+            return
+        
+        try:
+            self.Data.AppendBlock(Block)
+        except ValueError as e:
+            #Wrong number of columns or not numbers, still gets saved below
+            print(e)
+            print("Couldn't add block to graph data")
+        
+        try:
+            #Only the latest point matters for updating the GUI elements
+            self.MeasHandler.Update(list(Block[-1]))
+        except AttributeError:
+            pass
+        
+        self.FileWriter.WriteBlock(Block)
+    
+    def DrainRing(self,Deadline=None):
+        """
+        Reads everything waiting in the shared memory ring (if there is one)
+        into the graph data and the save file
+        
+        Parameters
+        ----------
+        Deadline : float, optional
+            time.time() to stop reading at. None reads until the ring is empty.
+        
+        Returns
+        -------
+        True if the ring has been emptied
+        """
+        if self.Ring is None:
+            return True
+        
+        #Only go round the ring once so a very fast worker can't keep us here forever
+        Drained = 0
+        Block = self.Ring.Peek()
+        while len(Block)>0:
+            if Drained>=self.Ring.Capacity or (Deadline is not None and time.time()>Deadline):
+                return False
+            self.AddBlock(Block)
+            self.Ring.Consume(len(Block))
+            Drained += len(Block)
+            Block = self.Ring.Peek()
+        return True
+    
+    def CloseRing(self):
+        """
+        Frees the shared memory ring at the end of a measurement
+        """
+        if self.Ring is not None:
+            self.Ring.Close()
+            self.Ring = None
     
     def CheckMeasureFinished(self):
         """
         Checks if the measurement has finished without disturding it, in theory
         """
         try:
-            self.MeasHandler.Worker.join(timeout=0.1)
+            #don't wait, this gets called every update
+            self.MeasHandler.Worker.join(timeout=0)
             Alive = self.MeasHandler.Worker.is_alive()
             if not Alive:
                 return True
@@ -692,11 +1007,21 @@ class Window(tk.Frame):
         
         
             
-    def MeasureFinished(self):
+    def MeasureFinished(self,Completed=True):
         """
         Handles when measurement is finished
+        
+        Parameters
+        ----------
+        Completed : bool, optional
+            The worker got to the end, so there's nothing to resume and the
+            checkpoint is deleted. The default is True.
         """
         
+        #Already done, e.g. an Esc after the worker sent an error
+        if not self.MeasureActive:
+            return
+        
         print("Measurement finished")
         
         try:
@@ -706,13 +1031,21 @@ class Window(tk.Frame):
             print("Could not close worker")
             print(e)
         self.MeasureActive = False
+        #Anything left in the ring was written before the worker finished, save it
+        self.DrainRing()
+        self.CloseRing()
         self.CloseSaveFile()
+        if Completed:
+            self.RemoveCheckpoint()
         
     def StopMeasure(self):
         """
         Force stop the measurement
         """
         
+        #Stopping by hand pauses the queue too, otherwise the next run would start
+        self.StopQueue()
+        
         #Send stop command
         #Call the stop function in the worker in case it needs to do anything after
         self.PipeRecv.send("STOP")
@@ -734,6 +1067,7 @@ class Window(tk.Frame):
             print("Boths pipes have been emptied")
             
             self.MeasureActive = False
+            self.CloseRing()
             self.CloseSaveFile()
         
         else:
@@ -741,6 +1075,244 @@ class Window(tk.Frame):
                 
         
         
+    ######################################
+    ####### Measurement slots ############
+    ######################################
+    
+    def OpenSlot(self):
+        """
+        Opens another AutoLab window as a new measurement slot. It has its own
+        worker, pipe, save file and graph so two measurements on different
+        instruments can run at once. Instruments are shared through Resources.
+        """
+        Top = tk.Toplevel(self.master)
+        Slot = Window.SlotCount
+        Window.SlotCount += 1
+        Top.title("Autolab - Slot {}".format(Slot))
+        
+        SlotWindow = Window(Top,self.Resources,Slot)
+        Top.protocol("WM_DELETE_WINDOW",SlotWindow.CloseSlot)
+    
+    def CloseSlot(self):
+        """
+        Closes a slot window, stopping its measurement first
+        """
+        if self.MeasureActive:
+            if not tk.messagebox.askyesno("Close slot","A measurement is running in this slot, stop it and close?"):
+                return
+            self.StopMeasure()
+        
+        self.StopQueue()
+        self.Closed = True
+        self.master.destroy()
+    
+    ######################################
+    ####### Run queue section ############
+    ######################################
+    
+    def LoadQueue(self):
+        """
+        Loads the run queue saved last time, empty if there isn't one
+        """
+        if not os.path.isfile(self.QueueFile):
+            return []
+        try:
+            with open(self.QueueFile,"r") as file:
+                return json.load(file)
+        except Exception as e:
+            print(e)
+            print("Couldn't load the run queue, starting with an empty one")
+            return []
+    
+    def SaveQueue(self):
+        """
+        Saves the run queue so it's still there if AutoLab is restarted
+        """
+        try:
+            with open(self.QueueFile,"w") as file:
+                json.dump(self.RunQueue,file,indent=1)
+        except Exception as e:
+            print(e)
+            print("Couldn't save the run queue")
+    
+    def HandlerSettings(self):
+        """
+        Takes the values of all the entries/variables of the loaded worker's Handler
+        
+        Returns
+        -------
+        Dictionary of attribute name: value
+        """
+        Settings = {}
+        for Name, Widget in vars(self.MeasHandler).items():
+            try:
+                if isinstance(Widget,(tk.Entry,tk.Variable)):
+                    Settings[Name] = Widget.get()
+            except Exception as e:
+                print(e)
+        return Settings
+    
+    def ApplyHandlerSettings(self,Settings):
+        """
+        Puts values from HandlerSettings back into the loaded worker's Handler
+        """
+        for Name, Value in Settings.items():
+            Widget = getattr(self.MeasHandler,Name,None)
+            try:
+                if isinstance(Widget,tk.Entry):
+                    Widget.delete(0,tk.END)
+                    Widget.insert(tk.END,Value)
+                elif isinstance(Widget,tk.Variable):
+                    Widget.set(Value)
+                else:
+                    print("Worker has no setting called {}, skipped".format(Name))
+            except Exception as e:
+                print(e)
+                print("Couldn't set {}".format(Name))
+    
+    def SwitchWorker(self,Module_ID):
+        """
+        Loads a different worker script in place of the current one
+        """
+        try:
+            self.WorkerBook.destroy()
+        except AttributeError:
+            pass
+        self.WorkerBook = ttk.Notebook(self.MeasTabs,height = 330,width = 480)
+        self.WorkerBook.pack(side="bottom")
+        self.LoadWorkerModule(Module_ID)
+    
+    def CurrentRun(self):
+        """
+        The loaded worker with its current settings and the filename, as kept in the queue and checkpoints
+        """
+        return {"Script":getattr(self,"MeasWorkerID",None),
+                "Settings":self.HandlerSettings(),
+                "Path":self.pathInput.get(),
+                "Filename":self.filenameInput.get(),
+                "Header":self.headerInput.get("1.0",tk.END)[:-1]}
+    
+    def QueueCurrent(self):
+        """
+        Adds the loaded worker with its current settings and the current filename to the end of the queue
+        """
+        try:
+            Run = self.CurrentRun()
+            if Run["Script"] is None:
+                raise AttributeError("No script loaded")
+        except AttributeError:
+            print("Load a script before adding to the queue")
+            return
+        
+        self.RunQueue.append(Run)
+        self.SaveQueue()
+        self.RefreshQueueList()
+    
+    def StartNextQueued(self):
+        """
+        Sets up and starts the run at the front of the queue, it's removed once it has started
+        """
+        if len(self.RunQueue)==0:
+            print("Run queue finished")
+            self.StopQueue()
+            return
+        
+        Run = self.RunQueue[0]
+        try:
+            if getattr(self,"MeasWorkerID",None) != Run["Script"]:
+                self.SwitchWorker(Run["Script"])
+            self.ApplyHandlerSettings(Run["Settings"])
+            self.path.set(Run["Path"])
+            self.filename.set(Run["Filename"])
+            self.headerInput.delete("1.0",tk.END)
+            self.headerInput.insert("1.0",Run["Header"])
+        except Exception as e:
+            print(e)
+            print("Couldn't set up the next run, queue paused")
+            self.StopQueue()
+            return
+        
+        print("Starting queued run: {} -> {}".format(Run["Script"],Run["Filename"]))
+        self.RunMeasure()
+        
+        if self.MeasureActive:
+            self.RunQueue.pop(0)
+            self.SaveQueue()
+            self.RefreshQueueList()
+        else:
+            print("Queued run failed to start, queue paused")
+            self.StopQueue()
+    
+    def StartQueue(self):
+        self.QueueRunning = True
+        self.RefreshQueueList()
+    
+    def StopQueue(self):
+        self.QueueRunning = False
+        self.RefreshQueueList()
+    
+    def MoveQueued(self,Step):
+        """
+        Moves the selected run up (-1) or down (+1) the queue
+        """
+        try:
+            i = self.QueueList.curselection()[0]
+        except (AttributeError, IndexError):
+            return
+        j = i + Step
+        if j<0 or j>=len(self.RunQueue):
+            return
+        self.RunQueue[i], self.RunQueue[j] = self.RunQueue[j], self.RunQueue[i]
+        self.SaveQueue()
+        self.RefreshQueueList()
+        self.QueueList.selection_set(j)
+    
+    def RemoveQueued(self):
+        try:
+            i = self.QueueList.curselection()[0]
+        except (AttributeError, IndexError):
+            return
+        self.RunQueue.pop(i)
+        self.SaveQueue()
+        self.RefreshQueueList()
+    
+    def OpenQueueWindow(self):
+        """
+        Window for adding, reordering and starting queued runs
+        """
+        if self.QueueWindow is not None and self.QueueWindow.winfo_exists():
+            self.QueueWindow.lift()
+            return
+        
+        self.QueueWindow = tk.Toplevel(self)
+        self.QueueWindow.title("Run Queue")
+        
+        self.QueueList = tk.Listbox(self.QueueWindow,width = 70,height = 15)
+        self.QueueList.grid(column=0, row=0, rowspan=7)
+        
+        tk.Button(self.QueueWindow,text="Add current",command=self.QueueCurrent).grid(column=1, row=0, sticky="ew")
+        tk.Button(self.QueueWindow,text="Remove",command=self.RemoveQueued).grid(column=1, row=1, sticky="ew")
+        tk.Button(self.QueueWindow,text="Up",command=lambda: self.MoveQueued(-1)).grid(column=1, row=2, sticky="ew")
+        tk.Button(self.QueueWindow,text="Down",command=lambda: self.MoveQueued(1)).grid(column=1, row=3, sticky="ew")
+        tk.Button(self.QueueWindow,text="Start queue",bg="green",command=self.StartQueue).grid(column=1, row=4, sticky="ew")
+        tk.Button(self.QueueWindow,text="Pause queue",bg="red",command=self.StopQueue).grid(column=1, row=5, sticky="ew")
+        
+        self.QueueStatus = tk.Label(self.QueueWindow)
+        self.QueueStatus.grid(column=1, row=6)
+        
+        self.RefreshQueueList()
+    
+    def RefreshQueueList(self):
+        """
+        Updates the queue window if it's open
+        """
+        if self.QueueWindow is None or not self.QueueWindow.winfo_exists():
+            return
+        self.QueueList.delete(0,tk.END)
+        for i, Run in enumerate(self.RunQueue):
+            self.QueueList.insert(tk.END,"{}: {} -> {}".format(i+1,Run["Script"],Run["Filename"]))
+        self.QueueStatus["text"] = "Running" if self.QueueRunning else "Paused"
+    
     ##################################################
     ####### Save filename managemant section ##########
     ##################################################
@@ -779,12 +1351,52 @@ class Window(tk.Frame):
             print(e)
             print("Failed to get delimiterOption")
         
+        # Check number format, fall back to full precision if it's nonsense
+        try:
+            floatFormat = self.FileUtiltab.floatFormatOption.get()
+            floatFormat % 1.0
+            #NaN and inf come up too, e.g. "%d" can't do them
+            floatFormat % float("nan")
+        except Exception as e:
+            print(e)
+            print("Invalid number format, using full precision")
+            floatFormat = "%r"
+        
+        # Check file type, text or one of the binary formats
+        try:
+            fileType = self.FileUtiltab.fileTypeOption.get()
+        except Exception as e:
+            print(e)
+            print("Failed to get file type, saving as text")
+            fileType = "Text"
+        
+        if fileType == "HDF5" and not Utility.BinaryWriter.HasHDF5:
+            print("h5py is not installed, saving as .npy instead")
+            fileType = "NPY"
+        
+        if fileType == "HDF5":
+            binaryWriter = Utility.HDF5Writer
+        elif fileType == "NPY":
+            binaryWriter = Utility.NpyWriter
+        else:
+            binaryWriter = None
+        
+        # Compression of text files, done by the FileWriter thread as it writes
+        try:
+            compression = Utility.CheckCompression(self.FileUtiltab.compressionOption.get())
+        except Exception as e:
+            print(e)
+            print("Failed to get compression option, saving uncompressed")
+            compression = None
+        
+        if binaryWriter is not None:
+            filenamePath = os.path.splitext(filenamePath)[0] + binaryWriter.Extension
+        elif compression is not None:
+            filenamePath = filenamePath + Utility.CompressionExtensions[compression]
         
         if Overide:
             #Make/replaces file
-            self.file = open(filenamePath,"w")
-            self.file.seek(0)
-            self.file.truncate()
+            pass
         else:
             #Check if file exist before
             fileExist = os.path.isfile(filenamePath)
@@ -799,40 +1411,20 @@ class Window(tk.Frame):
             
             elif (AutoEnum==False) & (fileExist==False):
                 # Make file
-                self.file = open(filenamePath,"w")
-                self.file.seek(0)
-                self.file.truncate()
+                pass
                 
             elif AutoEnum==True:
                 
-                fileExist = True
-                N = 0
-                
-                enumFilename = filenamePath
+                #Next number comes from a cached listing of the folder rather than checking each one
+                filenamePath = Utility.NextEnumeratedPath(filenamePath)
                 
-                while(fileExist):
-                    
-                    N += 1
-                    EnumStr = str(N).zfill(3)
-                    enumFilename = filenamePath[:-4] +"_"+ EnumStr + filenamePath[-4:]
-                    fileExist = os.path.isfile(enumFilename)
-                    if N>999:
-                        print("timeout finding Enumeration")
-                        return False
-                
-                filenamePath = enumFilename
-                
-                print("made file with number: {}".format(N))
-                self.file = open(filenamePath,"w")
-                self.file.seek(0)
-                self.file.truncate()
+                print("made file: {}".format(os.path.basename(filenamePath)))
         
-        #Inset header file here
         #Add current date and time if needed
-        self.file.write(header.format( str(datetime.datetime.now() ).split(".")[0] ) )
-        self.file.write("\n#HeaderEnd\n")
-        #write metadata
-
+        headerText = header.format( str(datetime.datetime.now() ).split(".")[0] )
+        
+        #get metadata
+        metaData = []
         for key in self.WorkerBook.children.keys():
             try:
                 #iterate through all children of the main WorkerBook and attempt to call Export_MetaData
@@ -843,14 +1435,46 @@ class Window(tk.Frame):
                     #children includes the tk frames and the scripts within.
                     #we just want the scripts
                     try:
-                        self.file.write(str(self.WorkerBook.children[key].Export_MetaData()))
-                        self.file.write("\n")
+                        metaData.append(self.WorkerBook.children[key].Export_MetaData())
                         
                     except AttributeError:#Handle the case were no Export_Metadata method exists
                         pass
             except Exception as e:
                 print(e)
+        
+        try:
+            columns = self.MeasHandler.Header_List
+        except AttributeError:
+            columns = None
+        
+        self.CatalogRun(filenamePath,headerText,metaData,columns)
+        
+        #For checkpoints, only plain text files can be carried on in the same file
+        self.CheckpointPath = filenamePath + ".checkpoint.json"
+        self.SaveFileInfo = {"SaveFile":filenamePath,
+                             "Delimiter":getattr(self,"delimiterOption","    "),
+                             "FloatFormat":floatFormat,
+                             "CanAppend":binaryWriter is None and compression is None}
+        
+        if binaryWriter is not None:
+            #Header and metadata are stored in the binary file itself
+            self.FileWriter = binaryWriter(filenamePath,headerText,metaData,columns)
+            return True
+        
+        self.file = Utility.OpenSaveFile(filenamePath,compression)
+        
+        #Inset header file here
+        self.file.write(headerText)
+        self.file.write("\n#HeaderEnd\n")
+        #write metadata
+        for metaDict in metaData:
+            self.file.write(str(metaDict))
+            self.file.write("\n")
         self.file.write("\n#MetadataEnd\n\n")
+        
+        #Data rows get written by a background thread so disk access doesn't hold up the GUI
+        self.FileWriter = Utility.FileWriter(self.file,self.delimiterOption,floatFormat)
+        
         #return True for succesful file creation
         return True
         
@@ -860,9 +1484,133 @@ class Window(tk.Frame):
     
     def CloseSaveFile(self):
         """Closes Save file
+        Waits for the FileWriter to finish writing everything queued first
         """
-        self.file.close()
-        print("Save file has been closed")
+        if self.FileWriter.Close():
+            print("Save file has been closed")
+        else:
+            tk.messagebox.showerror("Save file error",
+                                    "Writing the save file failed, some data may be missing:\n{}".format(self.FileWriter.Error))
+        
+        #Now everything is written the catalog can have the number of rows and column ranges
+        if self.Catalog is not None and self.RunID is not None:
+            try:
+                self.Catalog.FinishRun(self.RunID,self.FileWriter.nDataRows,
+                                       self.FileWriter.ColumnMin,self.FileWriter.ColumnMax)
+            except Exception as e:
+                print(e)
+                print("Failed to update the run catalog")
+        self.RunID = None
+    
+    def ReopenSaveFile(self,Checkpoint):
+        """
+        Opens the save file of a checkpoint to carry on writing to the end of it.
+        Anything written after the checkpoint is cut off first as the worker will do it again.
+        """
+        filenamePath = Checkpoint["SaveFile"]
+        
+        if not Checkpoint.get("CanAppend",False) or Checkpoint.get("FileSize") is None:
+            print("Can't carry on in this type of file, start a new one")
+            return False
+        
+        with open(filenamePath,"r+b") as file:
+            file.truncate(Checkpoint["FileSize"])
+        
+        self.file = open(filenamePath,"a")
+        self.FileWriter = Utility.FileWriter(self.file,Checkpoint["Delimiter"],Checkpoint["FloatFormat"])
+        
+        #not a new run, it's already in the catalog
+        self.RunID = None
+        self.CheckpointPath = filenamePath + ".checkpoint.json"
+        self.SaveFileInfo = {Key:Checkpoint[Key] for Key in ("SaveFile","Delimiter","FloatFormat","CanAppend")}
+        return True
+    
+    def SaveCheckpoint(self,Index):
+        """
+        The worker has saved everything up to sweep point Index. The FileWriter writes
+        the checkpoint once all of that is on the disk
+        """
+        if self.CheckpointPath is None:
+            return False
+        Info = dict(self.RunInfo)
+        #the file being written now, NewFile changes it part way through a run
+        Info.update(self.SaveFileInfo)
+        Info["Index"] = Index
+        self.FileWriter.WriteCheckpoint(self.CheckpointPath,Info)
+        return False
+    
+    def RemoveCheckpoint(self):
+        """
+        Deletes the checkpoint of a run that finished properly
+        """
+        try:
+            if self.CheckpointPath is not None and os.path.isfile(self.CheckpointPath):
+                os.remove(self.CheckpointPath)
+        except Exception as e:
+            print(e)
+            print("Couldn't remove checkpoint file")
+        self.CheckpointPath = None
+    
+    def ResumeRun(self):
+        """
+        Carries on a run that was cut short (crash, power cut, error) from its checkpoint file.
+        The worker script and its settings are set back to what they were, then it's
+        told which sweep point to start from. Plain text files can be carried on in the
+        same file, otherwise a new one is made.
+        """
+        if self.MeasureActive:
+            print("Stop the current measurement first")
+            return
+        
+        CheckpointPath = fd.askopenfilename(title="Checkpoint to resume",
+                                            initialdir=self.pathInput.get(),
+                                            filetypes=[("Checkpoints","*.checkpoint.json"),("All files","*.*")])
+        if CheckpointPath=="":
+            return
+        
+        try:
+            with open(CheckpointPath,"r") as file:
+                Checkpoint = json.load(file)
+        except Exception as e:
+            print(e)
+            print("Couldn't read checkpoint")
+            return
+        
+        try:
+            if getattr(self,"MeasWorkerID",None) != Checkpoint["Script"]:
+                self.SwitchWorker(Checkpoint["Script"])
+            self.ApplyHandlerSettings(Checkpoint["Settings"])
+            self.path.set(Checkpoint["Path"])
+            self.filename.set(Checkpoint["Filename"])
+            self.headerInput.delete("1.0",tk.END)
+            self.headerInput.insert("1.0",Checkpoint["Header"])
+        except Exception as e:
+            print(e)
+            print("Couldn't set the run back up from the checkpoint")
+            return
+        
+        Append = False
+        if Checkpoint.get("CanAppend",False) and os.path.isfile(Checkpoint["SaveFile"]):
+            Append = tk.messagebox.askyesno("Resume Run",
+                                            "Carry on in the same file?\n{}\n\nNo starts a new file.".format(Checkpoint["SaveFile"]))
+        
+        print("Resuming {} after point {}".format(Checkpoint["Script"],Checkpoint["Index"]))
+        self.RunMeasure(Checkpoint,Append)
+    
+    def CatalogRun(self,filenamePath,headerText,metaData,columns):
+        """
+        Adds a new save file to the run catalog
+        """
+        self.RunID = None
+        if self.Catalog is None:
+            return
+        try:
+            self.RunID = self.Catalog.StartRun(filenamePath,getattr(self,"MeasWorkerID",None),
+                                               headerText,columns,metaData)
+        except Exception as e:
+            #never stop a measurement because of the catalog
+            print(e)
+            print("Failed to add run to the catalog")
 
 
 class ResourcesObj(object):
@@ -875,7 +1623,14 @@ class ResourcesObj(object):
         """
         Takes a setup file
         """
-        self.rm = pyvisa.ResourceManager()
+        #One process owns every VISA session, this one and the worker processes all go through it.
+        #Started here unless it's already running (python -m Utility.InstrumentBroker)
+        self.Broker = Utility.StartBroker()
+        self.rm = Utility.ResourceManager()
+        
+        #VISA addresses, scanned once in the background and shared with all the tabs
+        self.Discovery = Utility.SharedDiscovery()
+        self.Discovery.StartScan()
         
         self.insts = {}
     
@@ -913,6 +1668,20 @@ class ResourcesObj(object):
                 inst.__del__()
             except:
                 print("Failed to close {}".format(Name))
+    
+    def Close(self):
+        """
+        Close everything when AutoLab exits
+        """
+        self.CloseAll()
+        try:
+            self.rm.close()
+        except Exception:
+            pass
+        if self.Broker is not None:
+            #the broker was started by us, so it goes with us
+            Utility.StopBroker()
+            self.Broker.join(5)
 
 
 if __name__=="__main__":
@@ -926,4 +1695,6 @@ if __name__=="__main__":
     root.title("Autolab")
 
     Experiment.mainloop()
+    
+    Resources.Close()
     
\ No newline at end of file
@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+"""
+Runs a measurement worker without the GUI, for overnight/batch runs.
+
+The Worker function of a worker script is started in a process the same way
+Window.RunMeasure does it, and everything it sends is written straight to the
+save file. No Tk window and no graph, so it starts quickly and uses very little CPU.
+
+The worker script is never imported in this process, the arguments of its Worker
+function are read from the source and the script is only imported inside the
+worker process. Parameters come from a JSON file and/or --set on the command line.
+
+Examples:
+    python AutoLabHeadless.py TestWorker --set Str=0 --set Stp=10 --set Steps=1000 --set Dwl=0.01 --columns X,Y1,Y2
+    python AutoLabHeadless.py Workers/Users/ExampleUser/TestWorker.py --params Sweep.json --file Sweep.txt
+    python AutoLabHeadless.py TestWorker --list
+    python AutoLabHeadless.py Simply_2Lockin_Field_Sweep --simulate --set Str=0 --set Stp=1 --set Rate=10 --set Dwl=0.1
+
+Stop with Ctrl+C, the worker is sent STOP and what has been received is saved.
+"""
+
+import argparse
+import ast
+import datetime
+import importlib
+import json
+import os
+import sys
+import time
+from multiprocessing import Process, Pipe
+
+#so worker scripts can import Instruments and Utility like they do from AutoLab.py
+RootDir = os.path.dirname(os.path.abspath(__file__))
+if RootDir not in sys.path:
+    sys.path.insert(0, RootDir)
+
+#Only the non-GUI parts of Utility are used here
+from Utility.FileWriter import FileWriter
+from Utility import BinaryWriter
+from Utility.Messages import Unpack, MSG_ROW, MSG_BLOCK, MSG_HEADER, MSG_CONTROL, MSG_ERROR, MSG_CHECKPOINT
+from Utility.SharedRing import SharedRing
+from Utility.RunCatalog import RunCatalog
+from Utility.FileEnum import NextEnumeratedPath
+from Utility.Compression import CheckCompression, SplitCompression, OpenSaveFile, CompressionExtensions
+
+
+def FindWorker(Name):
+    """
+    Works out the module name and the folder to import it from
+
+    Parameters
+    ----------
+    Name : str
+        Name of a script in Workers (e.g. TestWorker) or a path to a .py file
+
+    Returns
+    -------
+    (module name, folder to add to sys.path or None, path of the .py file)
+    """
+    if Name.endswith(".py") or os.path.sep in Name or "/" in Name:
+        FilePath = os.path.abspath(Name)
+        if not FilePath.endswith(".py"):
+            FilePath += ".py"
+        return os.path.basename(FilePath)[:-3], os.path.dirname(FilePath), FilePath
+
+    FilePath = os.path.join(RootDir, "Workers", Name + ".py")
+    return "Workers." + Name, None, FilePath
+
+
+def WorkerArguments(FilePath):
+    """
+    Reads the arguments of the Worker function from the script without running it
+
+    Returns
+    -------
+    List of (name, default) after the Pipe argument, default is None if there isn't one
+    """
+    with open(FilePath, "r") as File:
+        Tree = ast.parse(File.read(), FilePath)
+
+    for Node in Tree.body:
+        if isinstance(Node, ast.FunctionDef) and Node.name == "Worker":
+            Names = [Arg.arg for Arg in Node.args.args]
+            Defaults = [None]*(len(Names)-len(Node.args.defaults))
+            for Default in Node.args.defaults:
+                try:
+                    Defaults.append(ast.literal_eval(Default))
+                except ValueError:
+                    Defaults.append(None)
+            #first one is the pipe
+            return list(zip(Names, Defaults))[1:]
+
+    raise ValueError("No Worker function in {}".format(FilePath))
+
+
+def ParseValue(Text):
+    """
+    Turns a --set value into a number/list/bool if it looks like one, otherwise leaves it as a string
+    """
+    try:
+        return ast.literal_eval(Text)
+    except (ValueError, SyntaxError):
+        return Text
+
+
+def RunWorker(ModuleName, ImportPath, WorkerPipe, Args):
+    """
+    Target of the worker process, imports the script there and runs its Worker
+    """
+    if ImportPath is not None:
+        sys.path.insert(0, ImportPath)
+    Module = importlib.import_module(ModuleName)
+    Module.Worker(WorkerPipe, *Args)
+
+
+class HeadlessRun(object):
+    """
+    Reads everything a worker sends and saves it, the GUI-less version of
+    Window.GetData and Window.CreateFile
+    """
+
+    def __init__(self, Filename, Header="", MetaData=None, Columns=None,
+                 FileType="Text", Delimiter="    ", FloatFormat="%r", Overwrite=False,
+                 Catalog=None, Worker=None, Compression=None):
+        self.Filename = Filename
+        self.Header = Header
+        self.MetaData = MetaData if MetaData is not None else []
+        self.Columns = Columns
+        self.FileType = FileType
+        self.Delimiter = Delimiter
+        self.FloatFormat = FloatFormat
+        self.Overwrite = Overwrite
+        self.Compression = CheckCompression(Compression)
+        #RunCatalog to add the save files to, and the worker name to put in it
+        self.Catalog = Catalog
+        self.Worker = Worker
+        self.RunID = None
+
+        self.FileWriter = None
+        self.Ring = None
+        self.nPoints = 0
+        self.Finished = False
+        #the FileWriter hit an error, some rows may not be in the file
+        self.SaveFailed = False
+
+        self.Handlers = {MSG_ROW:self.AddRow,
+                         MSG_BLOCK:self.AddBlock,
+                         MSG_HEADER:self.AddHeader,
+                         MSG_CONTROL:self.RunCommand,
+                         MSG_ERROR:self.ShowError,
+                         MSG_CHECKPOINT:self.Checkpoint}
+
+    def CreateFile(self, Filename):
+        """
+        Opens a save file, same layout as the GUI makes.
+        Auto enumerates (_001, _002...) unless overwriting.
+        """
+        Folder = os.path.dirname(Filename)
+        if Folder != "":
+            os.makedirs(Folder, exist_ok=True)
+
+        Writer = None
+        if self.FileType == "HDF5" and not BinaryWriter.HasHDF5:
+            print("h5py is not installed, saving as .npy instead")
+            self.FileType = "NPY"
+        if self.FileType == "HDF5":
+            Writer = BinaryWriter.HDF5Writer
+        elif self.FileType == "NPY":
+            Writer = BinaryWriter.NpyWriter
+
+        if Writer is not None:
+            Filename = os.path.splitext(Filename)[0] + Writer.Extension
+        elif self.Compression is not None and SplitCompression(Filename)[1] is None:
+            Filename = Filename + CompressionExtensions[self.Compression]
+
+        if not self.Overwrite and os.path.isfile(Filename):
+            Filename = NextEnumeratedPath(Filename)
+
+        HeaderText = self.Header.format(str(datetime.datetime.now()).split(".")[0])
+
+        if self.Catalog is not None:
+            try:
+                self.RunID = self.Catalog.StartRun(Filename, self.Worker, HeaderText, self.Columns, self.MetaData)
+            except Exception as e:
+                print(e)
+                print("Failed to add run to the catalog")
+                self.RunID = None
+
+        if Writer is not None:
+            self.FileWriter = Writer(Filename, HeaderText, self.MetaData, self.Columns)
+        else:
+            File = OpenSaveFile(Filename, self.Compression)
+            File.write(HeaderText)
+            File.write("\n#HeaderEnd\n")
+            for MetaDict in self.MetaData:
+                File.write(str(MetaDict))
+                File.write("\n")
+            File.write("\n#MetadataEnd\n\n")
+            self.FileWriter = FileWriter(File, self.Delimiter, self.FloatFormat)
+
+        print("Saving to {}".format(Filename))
+
+    def CloseFile(self):
+        if self.FileWriter is not None:
+            if not self.FileWriter.Close():
+                self.SaveFailed = True
+            if self.Catalog is not None and self.RunID is not None:
+                try:
+                    self.Catalog.FinishRun(self.RunID, self.FileWriter.nDataRows,
+                                           self.FileWriter.ColumnMin, self.FileWriter.ColumnMax)
+                except Exception as e:
+                    print(e)
+                    print("Failed to update the run catalog")
+            self.RunID = None
+            self.FileWriter = None
+
+    ######## Message handlers, same as the ones in Window ########
+
+    def AddRow(self, Row):
+        if hasattr(Row, "tolist"):
+            Row = Row.tolist()
+        self.FileWriter.WriteRow(list(Row))
+        self.nPoints += 1
+
+    def AddBlock(self, Block):
+        if hasattr(Block, "copy"):
+            #might be a view of the shared ring
+            Block = Block.copy()
+        self.FileWriter.WriteBlock(Block)
+        self.nPoints += len(Block)
+
+    def AddHeader(self, Header):
+        if isinstance(Header, str):
+            if not Header.endswith("\n"):
+                Header = Header + "\n"
+            self.FileWriter.WriteText(Header)
+        else:
+            self.FileWriter.WriteRow(list(Header))
+
+    def RunCommand(self, Command):
+        if Command == "Esc":
+            self.Finished = True
+            return True
+        elif str(Command).startswith("NewFile"):
+            self.CloseFile()
+            Root, Ext = os.path.splitext(self.Filename)
+            self.CreateFile(Root + Command[8:] + Ext)
+        elif Command != "ClearGraph":
+            print("Unknown command from worker: {}".format(Command))
+        return False
+
+    def ShowError(self, Error):
+        print("Error from worker: {}".format(Error))
+        return False
+
+    def Checkpoint(self, Index):
+        #resuming is only done from the GUI, nothing to keep
+        return False
+
+    def BadMessage(self, Data):
+        print("Received Data that couldnt be understood, stopping")
+        print(Data)
+        self.Finished = True
+        return True
+
+    ######## Main loop ########
+
+    def DrainRing(self):
+        if self.Ring is None:
+            return
+        Block = self.Ring.Peek()
+        while len(Block) > 0:
+            self.AddBlock(Block)
+            self.Ring.Consume(len(Block))
+            Block = self.Ring.Peek()
+
+    def Run(self, Worker, PipeRecv, Ring=None, ReportInterval=10):
+        """
+        Reads from the pipe (and ring) until the worker says Esc or stops
+
+        Parameters
+        ----------
+        Worker : multiprocessing.Process
+            The started worker process
+        PipeRecv : Connection
+            GUI end of the pipe
+        Ring : SharedRing, optional
+            Ring the worker writes numbers to
+        ReportInterval : float, optional
+            Seconds between progress messages, 0 for none. The default is 10.
+        """
+        self.Ring = Ring
+        Report_T = time.time()
+
+        try:
+            while not self.Finished:
+                self.DrainRing()
+
+                #waiting in poll uses no CPU
+                if PipeRecv.poll(0.1):
+                    self.DrainRing()
+                    Tag, Payload = Unpack(PipeRecv.recv())
+                    if self.Handlers.get(Tag, self.BadMessage)(Payload):
+                        break
+                elif not Worker.is_alive():
+                    #gone without saying Esc, get anything that's left and stop
+                    self.DrainRing()
+                    if not PipeRecv.poll():
+                        print("Worker stopped with exitcode {}".format(Worker.exitcode))
+                        break
+
+                if ReportInterval > 0 and time.time()-Report_T > ReportInterval:
+                    Report_T = time.time()
+                    print("{} points".format(self.nPoints))
+
+        except KeyboardInterrupt:
+            print("Stopping measurement")
+            PipeRecv.send("STOP")
+            Worker.join(5)
+            if Worker.is_alive():
+                Worker.terminate()
+            #whatever made it out before stopping still gets saved
+            while PipeRecv.poll():
+                Tag, Payload = Unpack(PipeRecv.recv())
+                if Tag in (MSG_ROW, MSG_BLOCK, MSG_HEADER):
+                    self.Handlers[Tag](Payload)
+
+        self.DrainRing()
+        Worker.join(5)
+        self.CloseFile()
+        print("Measurement finished, {} points".format(self.nPoints))
+
+
+def main(argv=None):
+
+    Parser = argparse.ArgumentParser(description="Run an AutoLab worker script without the GUI")
+    Parser.add_argument("worker", help="Name of a script in Workers, or a path to a worker .py file")
+    Parser.add_argument("--params", help="JSON file of Worker arguments, {name: value}")
+    Parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Set a Worker argument, can be used many times. Overrides --params")
+    Parser.add_argument("--columns", help="Column names separated by commas, used for Headers/Header_List arguments and binary files")
+    Parser.add_argument("--file", default="test.txt", help="Save file. The default is test.txt")
+    Parser.add_argument("--header", default="Measurement started at {}", help="Header text, {} gets the date and time")
+    Parser.add_argument("--type", default="Text", choices=["Text","HDF5","NPY"], help="Save file type")
+    Parser.add_argument("--delimiter", default="    ", help="Delimiter for text files. The default is 4 spaces")
+    Parser.add_argument("--format", default="%r", help="Number format for text files. The default is full precision")
+    Parser.add_argument("--compression", default="None", choices=["None","gzip","zstd","lz4"],
+                        help="Compress text save files as they are written")
+    Parser.add_argument("--overwrite", action="store_true", help="Overwrite the save file rather than auto enumerating")
+    Parser.add_argument("--catalog", default="RunCatalog.db", help="Run catalog to add the save file to, empty for none")
+    Parser.add_argument("--report", type=float, default=10, help="Seconds between progress messages, 0 for none")
+    Parser.add_argument("--list", action="store_true", help="List the Worker arguments and exit")
+    Parser.add_argument("--simulate", nargs="?", const="1", metavar="CONFIG",
+                        help="Use simulated instruments, optionally a json file of SimResourceManager settings")
+    Args = Parser.parse_args(argv)
+
+    if Args.simulate is not None:
+        #picked up by Utility.ResourceManager() in the worker process
+        os.environ["AUTOLAB_SIMULATE"] = Args.simulate
+
+    ModuleName, ImportPath, FilePath = FindWorker(Args.worker)
+    try:
+        Arguments = WorkerArguments(FilePath)
+    except Exception as e:
+        print(e)
+        print("Couldn't read the Worker function of {}".format(FilePath))
+        return 1
+
+    if Args.list:
+        for Name, Default in Arguments:
+            print("{} = {}".format(Name, Default))
+        return 0
+
+    Params = {}
+    if Args.params is not None:
+        with open(Args.params, "r") as File:
+            Params.update(json.load(File))
+    for Item in Args.set:
+        if "=" not in Item:
+            print("--set needs NAME=VALUE, got {}".format(Item))
+            return 1
+        Name, Value = Item.split("=", 1)
+        Params[Name.strip()] = ParseValue(Value)
+
+    Columns = None
+    if Args.columns is not None:
+        Columns = [Column.strip() for Column in Args.columns.split(",")]
+
+    Ring = None
+    WorkerArgs = []
+    Missing = []
+    for Name, Default in Arguments:
+        if Name in Params:
+            WorkerArgs.append(Params[Name])
+        elif Name in ("Headers", "Header_List") and Columns is not None:
+            WorkerArgs.append(Columns)
+        elif Name == "Ring":
+            if Columns is None:
+                print("This worker uses a shared memory ring, give the columns with --columns")
+                return 1
+            Ring = SharedRing(len(Columns))
+            WorkerArgs.append(Ring)
+        elif Default is not None:
+            WorkerArgs.append(Default)
+        else:
+            Missing.append(Name)
+
+    if len(Missing) > 0:
+        print("Missing Worker arguments: {}".format(", ".join(Missing)))
+        return 1
+
+    #record what was run in the file metadata, like Export_MetaData does in the GUI
+    MetaData = {"Worker":Args.worker}
+    MetaData.update({Name:Value for Name, Value in zip([A[0] for A in Arguments], WorkerArgs) if Name != "Ring"})
+
+    Catalog = None
+    if Args.catalog:
+        try:
+            Catalog = RunCatalog(Args.catalog)
+        except Exception as e:
+            print(e)
+            print("Couldn't open the run catalog, the run won't be catalogued")
+
+    Run = HeadlessRun(Args.file, Args.header, [MetaData], Columns,
+                      Args.type, Args.delimiter, Args.format, Args.overwrite,
+                      Catalog, ModuleName, Args.compression)
+    Run.CreateFile(Args.file)
+
+    PipeRecv, PipeSend = Pipe(duplex=True)
+    Worker = Process(target=RunWorker, args=(ModuleName, ImportPath, PipeSend, WorkerArgs))
+    Worker.start()
+
+    try:
+        Run.Run(Worker, PipeRecv, Ring, Args.report)
+    finally:
+        if Ring is not None:
+            Ring.Close()
+        if Catalog is not None:
+            Catalog.Close()
+
+    return 1 if Run.SaveFailed else 0
+
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -1,5 +1,3 @@
-
-
 #Code from https://stackoverflow.com/questions/1057431/how-to-load-all-modules-in-a-folder
 #from os.path import dirname, basename, isfile, join
 #import glob
@@ -7,49 +5,56 @@
 #modules = glob.glob(join(dirname(__file__), "*.py"))
 #__all__ = [ basename(f)[:-3] for f in modules if isfile(f) and not f.endswith('__init__.py')]
 
-#Actually works
-# =============================================================================
-# AUTOLAB CODE MODULES
-# =============================================================================
-from .Dummy import *
-
-# =============================================================================
-# LOCKIN MODULES
-# =============================================================================
-from .DSP_7265 import *
-from .DSP_7280 import *
-from .SR830 import *
-from .SR860 import *
-from .SR530 import *
-from .Princeton5210 import *
-
-# =============================================================================
-# KEITHLEY MODULES
-# =============================================================================
-
-from .Keithley2400 import *
-from .Keithley6221 import *
-from .Keithley236 import*
-
 # =============================================================================
-# TEMPERATURE CONTROL MODULES
+# LAZY LOADING
 # =============================================================================
-
-from .lakeshore350 import*
-from .lakeshore218 import *
-from .OI_503 import *
-
-# =============================================================================
-# MAGNET SUPPLY MODULES
-# =============================================================================
-from .IPS120 import *
-from .SMS120C import *
-
-# =============================================================================
-# OTHER MODULES
-# =============================================================================
-
-from .Arroyo4300 import *
-from .OI_ILM import*
-
-
+#Every driver used to be imported here with "from .X import *", so loading one
+#instrument (or starting a worker process) imported all of them.
+#Now a driver is only imported the first time it's asked for, e.g. Inst.SR830 or
+#getattr(Instruments,"SR830") in ResourcesObj.LoadInst. Each driver file has a class
+#with the same name as the file, that's what you get back.
+#
+#Use Instruments.SR830 rather than "import Instruments.SR830", importing the file
+#directly before it's been used makes Instruments.SR830 the module instead of the class.
+#
+#Drivers (one file each):
+#   AUTOLAB CODE MODULES:   Dummy
+#   LOCKIN MODULES:         DSP_7265, DSP_7280, SR830, SR860, SR530, Princeton5210
+#   KEITHLEY MODULES:       Keithley2400, Keithley6221, Keithley236
+#   TEMPERATURE CONTROL:    lakeshore350, lakeshore218, OI_503
+#   MAGNET SUPPLY MODULES:  IPS120, SMS120C
+#   OTHER MODULES:          Arroyo4300, OI_ILM, AgilentE3634A
+
+import os
+import importlib
+
+#Names that aren't the same as the file they're in
+_LazyNames = {"Instrument":"Instrument_class"}
+
+_Folder = os.path.dirname(__file__)
+
+def _Modules():
+    """
+    Names of all the driver files
+    """
+    return [File[:-3] for File in os.listdir(_Folder) if File.endswith(".py") and File != "__init__.py"]
+
+def __getattr__(Name):
+    """
+    Imports a driver the first time it's used
+    """
+    if Name in _LazyNames:
+        Value = getattr(importlib.import_module("." + _LazyNames[Name], __name__), Name)
+    elif not Name.startswith("_") and os.path.isfile(os.path.join(_Folder, Name + ".py")):
+        Module = importlib.import_module("." + Name, __name__)
+        #the driver class if there is one, otherwise the module (e.g. Instrument_class)
+        Value = getattr(Module, Name, Module)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, Name))
+
+    #next time it's found straight away
+    globals()[Name] = Value
+    return Value
+
+def __dir__():
+    return sorted(set(globals()) | set(_Modules()) | set(_LazyNames))
@@ -15,6 +15,7 @@ from tkinter import font as tkFont
 
 import time
 import pyvisa
+from .InstrumentBroker import ResourceManager
 
 try:
     import Instruments as Inst
@@ -134,7 +135,7 @@ Output : {}"""
     
     def Connect(self):
         
-        rm = pyvisa.ResourceManager()
+        rm = ResourceManager()
         
         try:
             Port = self.ComEntry.get()
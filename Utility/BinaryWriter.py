@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Binary save file writers. Same interface as FileWriter (WriteRow, WriteBlock,
+WriteText, Close) so GetData doesn't care which one it's talking to.
+
+HDF5Writer:
+    One .h5 file. Data goes in a chunked, gzip compressed dataset called "Data"
+    that grows as points come in. The header text, column names and the
+    Export_MetaData dictionaries are stored as attributes.
+    Needs h5py.
+
+NpyWriter:
+    For when h5py isn't installed. Data is appended to a plain .npy file
+    (float64, one row per point) and the shape in the .npy header is updated
+    every flush, so the file is always loadable with np.load(mmap_mode="r").
+    Header, columns and metadata go in a .json file next to it.
+"""
+
+import json
+import numpy as np
+
+from .FileWriter import FileWriter
+
+try:
+    import h5py
+    HasHDF5 = True
+except ImportError:
+    h5py = None
+    HasHDF5 = False
+
+class _BinaryWriter(FileWriter):
+    """
+    Common bits of the binary writers, rows are kept as float arrays rather than text
+    """
+
+    def __init__(self, File, Header="", MetaData=None, Columns=None, **kwargs):
+        self.Header = Header
+        self.MetaData = MetaData if MetaData is not None else []
+        self.Columns = list(Columns) if Columns is not None else None
+        #Text that isn't data (e.g. header rows sent by the worker) is kept here
+        self.Notes = []
+        self.nColumns = None if self.Columns is None else len(self.Columns)
+        self.nRows = 0
+
+        #Write the header before the writer thread starts
+        self.File = File
+        self.Setup()
+
+        super().__init__(File, **kwargs)
+
+    def Setup(self):
+        pass
+
+    def FormatRows(self, Rows):
+        try:
+            Block = np.asarray(Rows, dtype=np.float64)
+            if Block.ndim != 2:
+                raise ValueError("Not a block of rows")
+        except (ValueError, TypeError):
+            #Something in there isn't numbers, e.g. a list of column names.
+            #Go through row by row, keeping the numbers and making notes of the rest
+            Numeric = []
+            for Row in Rows:
+                try:
+                    Numeric.append(np.asarray(Row, dtype=np.float64).ravel())
+                except (ValueError, TypeError):
+                    self.Notes.append(str(list(Row)))
+            if len(Numeric) == 0:
+                return None
+            try:
+                Block = np.vstack(Numeric)
+            except ValueError:
+                print("Rows of different lengths. Not saved!")
+                return None
+
+        if Block.shape[0] == 0:
+            return None
+
+        if self.nColumns is None:
+            self.nColumns = Block.shape[1]
+        elif Block.shape[1] != self.nColumns:
+            print("Expected rows of {0} values, got {1}. Not saved!".format(self.nColumns,Block.shape[1]))
+            return None
+
+        self.AddStats(Block)
+        return Block
+
+    def FormatText(self, Text):
+        self.Notes.append(str(Text))
+        return None
+
+    def ChunkSize(self, Chunk):
+        return Chunk.nbytes
+
+    def MetaDataDicts(self):
+        """
+        Export_MetaData dictionaries with anything that isn't a plain value turned into a string
+        """
+        Cleaned = []
+        for Dict in self.MetaData:
+            Clean = {}
+            for Key, Value in Dict.items():
+                if isinstance(Value, (bool, int, float, str)):
+                    Clean[str(Key)] = Value
+                else:
+                    Clean[str(Key)] = str(Value)
+            Cleaned.append(Clean)
+        return Cleaned
+
+
+class HDF5Writer(_BinaryWriter):
+    """
+    Writes the save file as HDF5
+    """
+
+    Extension = ".h5"
+
+    def __init__(self, Path, Header="", MetaData=None, Columns=None, ChunkRows=4096, Compression=4, **kwargs):
+        """
+        Parameters
+        ----------
+        Path : str
+            Path of the .h5 file to make, overwritten if it exists
+        Header : str
+            The header text from the main window
+        MetaData : list of dict
+            Export_MetaData dictionaries from the utility tabs
+        Columns : list of str, optional
+            Column names (Header_List)
+        ChunkRows : int, optional
+            Rows per HDF5 chunk. The default is 4096.
+        Compression : int, optional
+            gzip level 0-9. The default is 4.
+        """
+        if h5py is None:
+            raise ImportError("h5py is not installed, can't save as HDF5")
+
+        self.ChunkRows = ChunkRows
+        self.Compression = Compression
+        self.Dataset = None
+
+        File = h5py.File(Path, "w")
+        super().__init__(File, Header, MetaData, Columns, **kwargs)
+
+    def Setup(self):
+        self.File.attrs["Header"] = self.Header
+        if self.Columns is not None:
+            self.File.attrs["Columns"] = self.Columns
+        Group = self.File.create_group("MetaData")
+        for i, Dict in enumerate(self.MetaDataDicts()):
+            Sub = Group.create_group(str(i))
+            for Key, Value in Dict.items():
+                Sub.attrs[Key] = Value
+
+    def WriteChunks(self, Chunks):
+        Block = np.concatenate(Chunks)
+
+        if self.Dataset is None:
+            self.Dataset = self.File.create_dataset("Data",
+                                                    shape=(0, self.nColumns),
+                                                    maxshape=(None, self.nColumns),
+                                                    dtype=np.float64,
+                                                    chunks=(self.ChunkRows, self.nColumns),
+                                                    compression="gzip",
+                                                    compression_opts=self.Compression,
+                                                    shuffle=True)
+
+        self.Dataset.resize(self.nRows + Block.shape[0], axis=0)
+        self.Dataset[self.nRows:] = Block
+        self.nRows += Block.shape[0]
+        self.File.flush()
+
+    def CloseFile(self):
+        if len(self.Notes) > 0:
+            self.File.attrs["Notes"] = "\n".join(self.Notes)
+        self.File.close()
+
+
+class NpyWriter(_BinaryWriter):
+    """
+    Writes the save file as an append-only .npy with a .json sidecar for the header
+    """
+
+    Extension = ".npy"
+
+    #Fixed header size so it can be rewritten in place as the number of rows grows
+    HeaderLength = 128
+
+    def __init__(self, Path, Header="", MetaData=None, Columns=None, **kwargs):
+        """
+        Parameters
+        ----------
+        Path : str
+            Path of the .npy file to make, overwritten if it exists.
+            The header goes in the same path with .json on the end instead.
+        Header, MetaData, Columns : see HDF5Writer
+        """
+        self.Path = Path
+        self.JsonPath = Path[:-len(self.Extension)] + ".json" if Path.endswith(self.Extension) else Path + ".json"
+
+        File = open(Path, "wb")
+        super().__init__(File, Header, MetaData, Columns, **kwargs)
+
+    def Setup(self):
+        self.WriteHeader()
+        self.WriteJson()
+
+    def WriteHeader(self):
+        """
+        (Re)writes the .npy header with the current number of rows
+        """
+        Dict = "{{'descr': '<f8', 'fortran_order': False, 'shape': ({0}, {1}), }}".format(self.nRows, self.nColumns or 0)
+        #magic string + version 1.0 + 2 byte header length, then the dict padded with spaces ending in \n
+        Pad = self.HeaderLength - 10 - len(Dict) - 1
+        Header = b"\x93NUMPY\x01\x00" + (self.HeaderLength-10).to_bytes(2,"little") + (Dict + " "*Pad + "\n").encode("latin1")
+        self.File.seek(0)
+        self.File.write(Header)
+
+    def WriteJson(self):
+        Info = {"Header":self.Header,
+                "Columns":self.Columns,
+                "MetaData":self.MetaDataDicts(),
+                "Notes":self.Notes,
+                "Data":self.Path}
+        with open(self.JsonPath, "w") as JsonFile:
+            json.dump(Info, JsonFile, indent=1)
+
+    def WriteChunks(self, Chunks):
+        Block = np.concatenate(Chunks)
+        self.File.seek(0, 2)
+        self.File.write(Block.astype("<f8").tobytes())
+        self.nRows += Block.shape[0]
+        #keep the shape in the header up to date so the file is always readable
+        self.WriteHeader()
+        self.File.flush()
+
+    def CloseFile(self):
+        self.WriteHeader()
+        self.File.close()
+        self.WriteJson()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Compressed text save files.
+
+The save file is opened through one of the streaming compressors so the FileWriter
+thread compresses as it writes, nothing extra happens on the GUI thread. Each flush
+ends a compressed block, so the file can be read up to the last flush even while
+the measurement is still going.
+
+    gzip : always there (python standard library), .gz
+    zstd : needs zstandard, much faster than gzip for the same size, .zst
+    lz4  : needs lz4, fastest but bigger files, .lz4
+
+If the one asked for isn't installed gzip is used instead. DataLoader reads all of
+them, the extension says which one it is.
+"""
+
+import gzip
+import os
+
+try:
+    import zstandard
+    HasZstd = True
+except ImportError:
+    zstandard = None
+    HasZstd = False
+
+try:
+    import lz4.frame
+    HasLz4 = True
+except ImportError:
+    HasLz4 = False
+
+#Options shown in the save settings tab
+CompressionOptions = ["None", "gzip", "zstd", "lz4"]
+
+CompressionExtensions = {"gzip":".gz", "zstd":".zst", "lz4":".lz4"}
+
+#Quick enough to keep up with any measurement, most of the size reduction
+CompressionLevels = {"gzip":5, "zstd":3, "lz4":0}
+
+
+def CheckCompression(Compression):
+    """
+    Returns the compression to actually use, None for none
+    """
+    if Compression in (None, "", "None"):
+        return None
+    if Compression not in CompressionExtensions:
+        print("Unknown compression {}, saving uncompressed".format(Compression))
+        return None
+    if Compression == "zstd" and not HasZstd:
+        print("zstandard is not installed, using gzip instead")
+        return "gzip"
+    if Compression == "lz4" and not HasLz4:
+        print("lz4 is not installed, using gzip instead")
+        return "gzip"
+    return Compression
+
+
+def SplitCompression(Path):
+    """
+    Splits the compression extension off a path
+
+    Returns
+    -------
+    (path without it, compression name or None)
+    """
+    Root, Ext = os.path.splitext(Path)
+    for Compression, CompressionExt in CompressionExtensions.items():
+        if Ext.lower() == CompressionExt:
+            return Root, Compression
+    return Path, None
+
+
+def OpenCompressed(Path, Compression, Mode="wt"):
+    """
+    Opens a file through a streaming compressor
+
+    Parameters
+    ----------
+    Path : str
+    Compression : str
+        gzip, zstd or lz4
+    Mode : str, optional
+        Same as open(). The default is "wt".
+    """
+    Writing = "w" in Mode or "a" in Mode
+    if Compression == "gzip":
+        if Writing:
+            return gzip.open(Path, Mode, compresslevel=CompressionLevels["gzip"])
+        return gzip.open(Path, Mode)
+    if Compression == "zstd":
+        if Writing:
+            return zstandard.open(Path, Mode, cctx=zstandard.ZstdCompressor(level=CompressionLevels["zstd"]))
+        return zstandard.open(Path, Mode)
+    if Compression == "lz4":
+        if Writing:
+            return lz4.frame.open(Path, Mode, compression_level=CompressionLevels["lz4"])
+        return lz4.frame.open(Path, Mode)
+    raise ValueError("Unknown compression {}".format(Compression))
+
+
+def OpenSaveFile(Path, Compression=None):
+    """
+    Opens a text save file for writing, compressed if asked
+
+    Parameters
+    ----------
+    Path : str
+        Path of the file, the compression extension should already be on the end
+    Compression : str, optional
+        From CheckCompression. The default is None (plain text).
+    """
+    if Compression is None:
+        return open(Path, "w")
+    return OpenCompressed(Path, Compression, "wt")
@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+"""
+Loads AutoLab save files back in for analysis.
+
+Text files (made by CreateFile) look like:
+    header text
+    #HeaderEnd
+    {metadata dict}
+    #MetadataEnd
+    column names (optional, whatever the worker sent)
+    delimited rows of numbers
+
+The header and metadata are read once, the delimiter is worked out from the
+first row of numbers, then the rest of the file is split into big chunks and each
+chunk is turned into numbers in one numpy call rather than line by line.
+Big files have their chunks parsed in parallel in a process pool.
+Lines that aren't numbers (e.g. column names) are kept in Notes.
+Compressed text files (.gz, .zst, .lz4) are decompressed as they are read,
+in one process as they can't be split up.
+
+Binary files from BinaryWriter are loaded without reading the data at all:
+.npy files are memory mapped (header from the .json next to them) and .h5 files
+give the h5py dataset, which only reads what is sliced out of it.
+
+    Data = Utility.LoadData("test_001.txt")
+    Data.Columns, Data.MetaData
+    X = Data.Column("X")
+"""
+
+import ast
+import json
+import os
+import warnings
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .Compression import SplitCompression, OpenCompressed
+
+class AutoLabData(object):
+    """
+    A loaded save file
+    """
+
+    def __init__(self, Path, Header="", MetaData=None, Columns=None, Data=None, Notes=None):
+        self.Path = Path
+        #Header text from the main window
+        self.Header = Header
+        #Export_MetaData dictionaries
+        self.MetaData = MetaData if MetaData is not None else []
+        #Column names if the file has them
+        self.Columns = Columns
+        #Array (or memory map/h5py dataset) of rows, shape (points, columns)
+        self.Data = Data if Data is not None else np.empty((0,0))
+        #Lines that weren't data
+        self.Notes = Notes if Notes is not None else []
+
+    def __len__(self):
+        return len(self.Data)
+
+    def Column(self, Column):
+        """
+        One column of the data by number or name
+        """
+        if isinstance(Column, str):
+            if self.Columns is None:
+                raise KeyError("File has no column names, can't find column {}".format(Column))
+            Column = self.Columns.index(Column)
+        return self.Data[:, Column]
+
+    def __getitem__(self, Column):
+        return self.Column(Column)
+
+
+def LoadData(Path, ChunkSize=64*1024*1024, Processes=None):
+    """
+    Loads an AutoLab save file, text or binary
+
+    Parameters
+    ----------
+    Path : str
+        Save file. .npy/.json and .h5 are loaded as binary, anything else as text
+        (compressed if it ends in .gz, .zst or .lz4)
+    ChunkSize : int, optional
+        Bytes of text parsed at a time. The default is 64MB.
+    Processes : int, optional
+        Number of processes to parse big text files with. The default (None)
+        uses all the cores, 1 does it all in this process.
+
+    Returns
+    -------
+    AutoLabData
+    """
+    Ext = os.path.splitext(Path)[1].lower()
+
+    if Ext in (".npy", ".json"):
+        return LoadNpy(Path)
+    if Ext in (".h5", ".hdf5"):
+        return LoadHDF5(Path)
+    return LoadText(Path, ChunkSize, Processes)
+
+
+def LoadNpy(Path):
+    """
+    Memory maps a .npy save file, header and metadata come from the .json next to it
+    """
+    Root = os.path.splitext(Path)[0]
+    NpyPath = Root + ".npy"
+    JsonPath = Root + ".json"
+
+    Info = {}
+    if os.path.isfile(JsonPath):
+        with open(JsonPath, "r") as JsonFile:
+            Info = json.load(JsonFile)
+
+    #no copy, pages are only read from disk when used
+    Data = np.load(NpyPath, mmap_mode="r")
+
+    return AutoLabData(NpyPath, Info.get("Header",""), Info.get("MetaData",[]),
+                       Info.get("Columns",None), Data, Info.get("Notes",[]))
+
+
+def LoadHDF5(Path):
+    """
+    Opens a .h5 save file. Data is the h5py dataset so the file stays open,
+    slice it (Data.Data[:]) to get a numpy array.
+    """
+    import h5py
+
+    File = h5py.File(Path, "r")
+
+    MetaData = []
+    if "MetaData" in File:
+        for Key in sorted(File["MetaData"].keys(), key=int):
+            MetaData.append(dict(File["MetaData"][Key].attrs))
+
+    Columns = None
+    if "Columns" in File.attrs:
+        Columns = [str(Column) for Column in File.attrs["Columns"]]
+
+    Notes = []
+    if "Notes" in File.attrs:
+        Notes = str(File.attrs["Notes"]).split("\n")
+
+    if "Data" in File:
+        Data = File["Data"]
+    else:
+        Data = np.empty((0, len(Columns) if Columns is not None else 0))
+
+    return AutoLabData(Path, str(File.attrs.get("Header","")), MetaData, Columns, Data, Notes)
+
+
+######## Text files ########
+
+def OpenText(Path):
+    """
+    Opens a text save file for reading as bytes, decompressing it if it's compressed
+    """
+    Compression = SplitCompression(Path)[1]
+    if Compression is not None:
+        return OpenCompressed(Path, Compression, "rb")
+    return open(Path, "rb")
+
+
+def ReadChunks(File, ChunkSize, Delimiter, nColumns):
+    """
+    Parses the rest of an open file a chunk at a time, for files that can't be
+    split up by position (compressed ones)
+
+    Returns
+    -------
+    List of (array of rows, list of lines that weren't numbers)
+    """
+    Results = []
+    Leftover = b""
+    while True:
+        Chunk = File.read(ChunkSize)
+        if Chunk == b"":
+            break
+        Chunk = Leftover + Chunk
+        #only whole lines, the end of the last one comes with the next chunk
+        End = Chunk.rfind(b"\n") + 1
+        Leftover = Chunk[End:]
+        Chunk = Chunk[:End]
+        if Chunk.strip() != b"":
+            Notes = []
+            Results.append((ParseChunk(Chunk, Delimiter, nColumns, Notes), Notes))
+
+    if Leftover.strip() != b"":
+        Notes = []
+        Results.append((ParseChunk(Leftover, Delimiter, nColumns, Notes), Notes))
+    return Results
+
+
+def ReadHeader(File):
+    """
+    Reads the header and metadata, leaves the file at the start of the data.
+    Files without #HeaderEnd/#MetadataEnd are treated as all data.
+
+    Returns
+    -------
+    (header text, list of metadata dicts)
+    """
+    Start = File.tell()
+    HeaderLines = []
+    MetaData = []
+    InMetaData = False
+
+    for Line in iter(File.readline, b""):
+        Text = Line.decode("latin1").rstrip("\r\n")
+
+        if Text == "#HeaderEnd":
+            InMetaData = True
+        elif Text == "#MetadataEnd":
+            return "\n".join(HeaderLines), MetaData
+        elif InMetaData:
+            if Text.strip() == "":
+                continue
+            try:
+                MetaData.append(ast.literal_eval(Text))
+            except (ValueError, SyntaxError):
+                #not a plain dict, keep it as text
+                MetaData.append(Text)
+        else:
+            HeaderLines.append(Text)
+
+    #no header markers, start again from the top
+    File.seek(Start)
+    return "", []
+
+
+def FindDelimiter(Line):
+    """
+    Works out the delimiter from a line of numbers.
+    Returns None for whitespace (spaces or tabs).
+    """
+    if b"," in Line:
+        return b","
+    return None
+
+
+def ParseLine(Line, Delimiter):
+    """
+    Turns one line into floats, None if it isn't a line of numbers
+    """
+    try:
+        return [float(Value) for Value in Line.split(Delimiter)]
+    except ValueError:
+        return None
+
+
+def ParseChunk(Chunk, Delimiter, nColumns, Notes):
+    """
+    Turns a chunk of whole lines into an array of shape (lines, nColumns).
+    Tries the whole chunk in one go, falls back to line by line if there
+    are any lines that aren't numbers or have the wrong length.
+    """
+    Text = Chunk
+    if Delimiter is not None:
+        Text = Text.replace(Delimiter, b" ")
+
+    nLines = Chunk.count(b"\n") + (0 if Chunk.endswith(b"\n") else 1)
+
+    with warnings.catch_warnings():
+        #numpy warns when it can't read to the end, that's handled below
+        warnings.simplefilter("ignore")
+        try:
+            Values = np.fromstring(Text, dtype=np.float64, sep=" ")
+        except ValueError:
+            Values = None
+
+    if Values is not None and Values.size == nLines*nColumns and Chunk.strip(b" \t\r\n") != b"":
+        return Values.reshape(nLines, nColumns)
+
+    #Something odd in there, do it the slow way
+    Rows = []
+    for Line in Chunk.splitlines():
+        if Line.strip() == b"":
+            continue
+        Row = ParseLine(Line, Delimiter)
+        if Row is None or len(Row) != nColumns:
+            Notes.append(Line.decode("latin1"))
+            continue
+        Rows.append(Row)
+
+    if len(Rows) == 0:
+        return np.empty((0, nColumns))
+    return np.array(Rows, dtype=np.float64)
+
+
+def ColumnNames(Notes, Delimiter, nColumns):
+    """
+    Looks for a line of column names in the lines before the data
+    """
+    for Note in Notes:
+        Text = Note.strip().lstrip("#")
+        if Delimiter is None:
+            Names = Text.split()
+        else:
+            Names = Text.split(Delimiter.decode())
+        Names = [Name.strip().strip("'\"") for Name in Names]
+        Names = [Name for Name in Names if Name != ""]
+        if len(Names) == nColumns:
+            return Names
+    return None
+
+
+def ParseRange(Path, Start, Stop, DataStart, Delimiter, nColumns):
+    """
+    Parses the lines that start between byte Start and Stop of the file.
+    Separate function so it can be run in a process pool.
+
+    Returns
+    -------
+    (array of rows, list of lines that weren't numbers)
+    """
+    Notes = []
+    with OpenText(Path) as File:
+        File.seek(Start)
+        if Start > DataStart:
+            #a line that started in the range before belongs to that one
+            File.seek(Start-1)
+            if File.read(1) != b"\n":
+                File.readline()
+
+        Begin = File.tell()
+        if Begin >= Stop:
+            return np.empty((0, nColumns)), Notes
+
+        Chunk = File.read(Stop-Begin)
+        if not Chunk.endswith(b"\n"):
+            Chunk += File.readline()
+
+    if Chunk.strip() == b"":
+        return np.empty((0, nColumns)), Notes
+
+    return ParseChunk(Chunk, Delimiter, nColumns, Notes), Notes
+
+
+def LoadText(Path, ChunkSize=64*1024*1024, Processes=None):
+    """
+    Loads a text save file, see LoadData
+    """
+    Notes = []
+
+    with OpenText(Path) as File:
+        Header, MetaData = ReadHeader(File)
+
+        #Find the first row of numbers, anything before it is kept (column names)
+        Delimiter = None
+        nColumns = None
+        FirstRow = None
+        for Line in iter(File.readline, b""):
+            Stripped = Line.strip()
+            if Stripped == b"":
+                continue
+            Delimiter = FindDelimiter(Stripped)
+            FirstRow = ParseLine(Stripped, Delimiter)
+            if FirstRow is not None:
+                nColumns = len(FirstRow)
+                break
+            Notes.append(Stripped.decode("latin1"))
+
+        DataStart = File.tell()
+
+        Results = None
+        if nColumns is not None and SplitCompression(Path)[1] is not None:
+            #positions in the file mean nothing once it's compressed, just read through it
+            Results = ReadChunks(File, ChunkSize, Delimiter, nColumns)
+
+    if nColumns is None:
+        #no data in the file
+        return AutoLabData(Path, Header, MetaData, ColumnNames(Notes, None, -1), None, Notes)
+
+    Columns = ColumnNames(Notes, Delimiter, nColumns)
+
+    if Results is None:
+        Results = SplitAndParse(Path, DataStart, ChunkSize, Processes, Delimiter, nColumns)
+
+    Blocks = [np.array([FirstRow], dtype=np.float64)]
+    for Block, BlockNotes in Results:
+        Blocks.append(Block)
+        Notes.extend(BlockNotes)
+
+    Data = np.concatenate(Blocks)
+
+    return AutoLabData(Path, Header, MetaData, Columns, Data, Notes)
+
+
+def SplitAndParse(Path, DataStart, ChunkSize, Processes, Delimiter, nColumns):
+    """
+    Splits the rest of an uncompressed file into chunks by position and parses them,
+    in parallel if it's big enough
+
+    Returns
+    -------
+    List of (array of rows, list of lines that weren't numbers)
+    """
+    #Split the rest of the file into chunks, each one is parsed in one go
+    FileSize = os.path.getsize(Path)
+    Starts = list(range(DataStart, FileSize, ChunkSize))
+    Stops = [min(Start+ChunkSize, FileSize) for Start in Starts]
+    n = len(Starts)
+
+    if Processes is None:
+        Processes = os.cpu_count() or 1
+
+    Results = None
+    if Processes > 1 and n > 1:
+        #Big file, parse the chunks in parallel
+        try:
+            with ProcessPoolExecutor(min(Processes, n)) as Pool:
+                Results = list(Pool.map(ParseRange, [Path]*n, Starts, Stops, [DataStart]*n,
+                                        [Delimiter]*n, [nColumns]*n))
+        except Exception as e:
+            #e.g. on windows when the calling script has no if __name__=="__main__"
+            print(e)
+            print("Couldn't load in parallel, loading in this process")
+            Results = None
+
+    if Results is None:
+        Results = [ParseRange(Path, Start, Stop, DataStart, Delimiter, nColumns)
+                   for Start, Stop in zip(Starts, Stops)]
+
+    return Results
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar store for the data coming back from the measurement worker.
+Replaces the list of lists that used to live in Window.Data.
+
+Each column is kept in its own row of a 2D numpy array, so a column is one
+contiguous block of memory and can be handed to matplotlib as a view without
+copying. The array grows geometrically (doubles) so appending is amortised O(1)
+and memory is ~8 bytes per value rather than a python float + list per point.
+"""
+
+import numpy as np
+
+class DataStore(object):
+    """
+    Growable, preallocated columnar data store
+    """
+
+    def __init__(self, Headers=None, nColumns=None, Capacity=1024):
+        """
+        Parameters
+        ----------
+        Headers : list of str, optional
+            Column names, normally the Header_List of the measurement script.
+            Sets the number of columns if given.
+        nColumns : int, optional
+            Number of columns if there are no headers. If neither is given
+            the width is taken from the first row appended.
+        Capacity : int, optional
+            Number of rows to preallocate. The default is 1024.
+        """
+        self.Headers = None
+        self.nColumns = nColumns
+
+        self._InitCapacity = max(int(Capacity),1)
+        self._Buffer = None
+        self._Length = 0
+        #goes up every Clear(), so anything keeping track of what it has already
+        #used can tell the store has been emptied and refilled
+        self.Generation = 0
+
+        if Headers is not None:
+            self.SetHeaders(Headers)
+
+    def __len__(self):
+        return self._Length
+
+    def SetHeaders(self, Headers):
+        """
+        Set the column names. Only allowed to change the width if the store is empty.
+        """
+        Headers = [str(h) for h in Headers]
+        if self._Length > 0 and len(Headers) != self.nColumns:
+            raise ValueError("Expected {0} headers, got {1}".format(self.nColumns,len(Headers)))
+        self.Headers = Headers
+        if self.nColumns != len(Headers):
+            self.nColumns = len(Headers)
+            self._Buffer = None
+
+    def _Reserve(self, nRows):
+        """
+        Make sure there is room for nRows more rows, doubling the buffer if not
+        """
+        Needed = self._Length + nRows
+
+        if self._Buffer is None:
+            Capacity = max(self._InitCapacity, Needed)
+            self._Buffer = np.empty((self.nColumns, Capacity))
+            return
+
+        Capacity = self._Buffer.shape[1]
+        if Needed <= Capacity:
+            return
+
+        while Capacity < Needed:
+            Capacity *= 2
+        NewBuffer = np.empty((self.nColumns, Capacity))
+        NewBuffer[:, :self._Length] = self._Buffer[:, :self._Length]
+        self._Buffer = NewBuffer
+
+    def Append(self, Row):
+        """
+        Append a single row (list of numbers) to the store
+        """
+        Row = np.asarray(Row, dtype=float).ravel()
+
+        if self.nColumns is None:
+            self.nColumns = Row.size
+        elif Row.size != self.nColumns:
+            raise ValueError("Expected a row of {0} values, got {1}".format(self.nColumns,Row.size))
+
+        self._Reserve(1)
+        self._Buffer[:, self._Length] = Row
+        self._Length += 1
+
+    def AppendBlock(self, Block):
+        """
+        Append many rows at once
+
+        Parameters
+        ----------
+        Block : Array-like
+            2D array or list of rows, shape (number of rows, number of columns)
+        """
+        Block = np.asarray(Block, dtype=float)
+        if Block.ndim == 1:
+            Block = Block.reshape(1,-1)
+        if Block.ndim != 2:
+            raise ValueError("Expected a 2D block of rows, got {} dimensions".format(Block.ndim))
+
+        nRows, nCols = Block.shape
+        if nRows == 0:
+            return
+
+        if self.nColumns is None:
+            self.nColumns = nCols
+        elif nCols != self.nColumns:
+            raise ValueError("Expected rows of {0} values, got {1}".format(self.nColumns,nCols))
+
+        self._Reserve(nRows)
+        self._Buffer[:, self._Length:self._Length+nRows] = Block.T
+        self._Length += nRows
+
+    def ColumnIndex(self, Column):
+        """
+        Convert a column name or number to a column number
+        """
+        if isinstance(Column, str):
+            if self.Headers is None:
+                raise KeyError("No column headers set, can't find column {}".format(Column))
+            return self.Headers.index(Column)
+
+        Column = int(Column)
+        if self.nColumns is not None and not (-self.nColumns <= Column < self.nColumns):
+            raise IndexError("Column {0} out of range, there are {1} columns".format(Column,self.nColumns))
+        return Column
+
+    def Column(self, Column, Start=0):
+        """
+        Returns a view of one column, no copy is made.
+        Don't hold onto it over a Clear(), the memory gets reused.
+
+        Parameters
+        ----------
+        Column : int or str
+            Column number or header name
+        Start : int, optional
+            First row to return. The default is 0.
+        """
+        Index = self.ColumnIndex(Column)
+        if self._Buffer is None:
+            return np.empty(0)
+        return self._Buffer[Index, Start:self._Length]
+
+    def Rows(self, Start=0, Stop=None):
+        """
+        Returns a (rows, columns) view of the data between Start and Stop
+        """
+        if self._Buffer is None:
+            return np.empty((0, self.nColumns or 0))
+        if Stop is None or Stop > self._Length:
+            Stop = self._Length
+        return self._Buffer[:, Start:Stop].T
+
+    def Clear(self):
+        """
+        Remove all the data but keep the column layout.
+        Drops back to the initial capacity so a long run doesn't keep its memory.
+        """
+        self._Length = 0
+        self.Generation += 1
+        if self._Buffer is not None and self._Buffer.shape[1] > self._InitCapacity:
+            self._Buffer = None
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Auto enumeration of save file names (test_001.txt, test_002.txt...).
+
+CreateFile used to check test_001, test_002... with os.path.isfile until it found
+one that didn't exist, which on a network drive with hundreds of runs is hundreds
+of slow stat calls before every run, and it gave up after 999.
+
+Now each folder is listed once and the numbers already used for a name are
+worked out from that listing, so finding the next one doesn't touch the disk.
+Names given out are added straight away. The listing is redone every CacheTime
+seconds in case another computer is saving to the same folder, and the name
+given out is checked once before it's used so nothing gets overwritten.
+
+Like before, the first free number is used, and only files with the same name and
+extension count (test_20240101.txt doesn't move test.txt on to test_20240102.txt).
+Numbers carry on past 999 (test_1000.txt).
+"""
+
+import os
+import re
+import time
+import threading
+
+#Seconds before a folder is listed again
+CacheTime = 300
+
+#{folder: (time listed, file names, {(name, extension): set of numbers used})}
+_Cache = {}
+_Lock = threading.Lock()
+
+#Windows file names don't care about case, like os.path.isfile there
+_Flags = re.IGNORECASE if os.name == "nt" else 0
+
+
+def _ListFolder(Folder):
+    """
+    Lists a folder into the cache
+    """
+    try:
+        Files = os.listdir(Folder if Folder != "" else ".")
+    except OSError:
+        Files = []
+    Entry = (time.time(), Files, {})
+    _Cache[Folder] = Entry
+    return Entry
+
+
+def _UsedNumbers(Entry, Root, Ext):
+    """
+    Numbers already used for Root_<number>Ext in a listed folder
+    """
+    Key = (Root, Ext)
+    if Key not in Entry[2]:
+        Pattern = re.compile(re.escape(Root) + r"_(\d{3,})" + re.escape(Ext) + "$", _Flags)
+        Used = set()
+        for File in Entry[1]:
+            Match = Pattern.match(File)
+            if Match is not None:
+                Used.add(int(Match.group(1)))
+        Entry[2][Key] = Used
+    return Entry[2][Key]
+
+
+def _FirstFree(Used):
+    N = 1
+    while N in Used:
+        N += 1
+    return N
+
+
+def NextEnumeratedPath(FilePath, Digits=3):
+    """
+    Gives the next free enumerated version of a file path and reserves it
+
+    Parameters
+    ----------
+    FilePath : str
+        Path without the number, e.g. C:\\Data\\test.txt
+    Digits : int, optional
+        Minimum number of digits, padded with 0s. The default is 3.
+
+    Returns
+    -------
+    Path with _<number> before the extension, e.g. C:\\Data\\test_004.txt
+    """
+    Folder, Name = os.path.split(FilePath)
+    Name, CompressionExt = os.path.splitext(Name)
+    if CompressionExt.lower() not in (".gz", ".zst", ".lz4"):
+        Name, CompressionExt = Name + CompressionExt, ""
+    Root, Ext = os.path.splitext(Name)
+    Ext = Ext + CompressionExt
+
+    with _Lock:
+        Entry = _Cache.get(Folder)
+        if Entry is None or time.time() - Entry[0] > CacheTime:
+            Entry = _ListFolder(Folder)
+
+        Used = _UsedNumbers(Entry, Root, Ext)
+        N = _FirstFree(Used)
+        EnumPath = os.path.join(Folder, Root + "_" + str(N).zfill(Digits) + Ext)
+
+        #Someone else made it since the folder was listed, list again
+        if os.path.exists(EnumPath):
+            Entry = _ListFolder(Folder)
+            Used = _UsedNumbers(Entry, Root, Ext)
+            Used.add(N)
+            N = _FirstFree(Used)
+            EnumPath = os.path.join(Folder, Root + "_" + str(N).zfill(Digits) + Ext)
+
+        Used.add(N)
+
+    return EnumPath
+
+
+def ClearEnumCache(Folder=None):
+    """
+    Forget the listing of a folder (or all of them), e.g. after deleting files
+    """
+    with _Lock:
+        if Folder is None:
+            _Cache.clear()
+        else:
+            _Cache.pop(Folder, None)
@@ -10,6 +10,8 @@ from tkinter import ttk
 from tkinter import filedialog as fd
 from tkinter import font as tkFont
 
+from .Compression import CompressionOptions
+
 class Util(tk.Frame):
     """Creates the utilities tab for controlling how the file should be saved
         """
@@ -68,6 +70,51 @@ class Util(tk.Frame):
                                               variable=self.delimiterOption,
                                               value="\t")
         TabOptionOption.pack(anchor="w")
+        
+        
+        FileTypeFrame = tk.Frame(FileUtilTab)
+        FileTypeFrame.pack(side=tk.LEFT)
+        
+        # Text is the normal delimited file, the binary ones are much smaller and quicker to load
+        self.fileTypeOption = tk.StringVar(None,"Text")
+        
+        TextOption = ttk.Radiobutton(FileTypeFrame,
+                                         text="Text",
+                                         variable=self.fileTypeOption,
+                                         value="Text")
+        TextOption.pack(anchor="w")
+        
+        HDF5Option = ttk.Radiobutton(FileTypeFrame,
+                                         text="Binary (HDF5)",
+                                         variable=self.fileTypeOption,
+                                         value="HDF5")
+        HDF5Option.pack(anchor="w")
+        
+        NpyOption = ttk.Radiobutton(FileTypeFrame,
+                                         text="Binary (.npy)",
+                                         variable=self.fileTypeOption,
+                                         value="NPY")
+        NpyOption.pack(anchor="w")
+        
+        
+        FormatFrame = tk.Frame(FileUtilTab)
+        FormatFrame.pack(side=tk.LEFT)
+        
+        FormatLabel = tk.Label(FormatFrame,text="Number Format")
+        FormatLabel.pack(anchor="w")
+        
+        # % style format for each number, e.g. %.6e. Default is full precision
+        self.floatFormatOption = tk.StringVar(None,"%r")
+        FormatEntry = tk.Entry(FormatFrame,textvariable=self.floatFormatOption,width = 10)
+        FormatEntry.pack(anchor="w")
+        
+        # Text files can be compressed as they are written, zstd/lz4 need their packages installed
+        CompressionLabel = tk.Label(FormatFrame,text="Compression")
+        CompressionLabel.pack(anchor="w")
+        
+        self.compressionOption = tk.StringVar(None,"None")
+        CompressionMenu = tk.OptionMenu(FormatFrame,self.compressionOption,*CompressionOptions)
+        CompressionMenu.pack(anchor="w")
 
 
 if __name__=="__main__":
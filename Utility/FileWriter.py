@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+Background writer for the measurement save file.
+
+GetData used to turn every point into a string and write it to the file on the
+Tk thread, so slow (network) drives would stall the GUI. Now GetData just puts
+the rows on a queue and this thread formats them in blocks and writes them in
+big chunks, flushing every FlushInterval seconds or FlushSize bytes.
+
+Close() writes out everything still queued before closing the file, so no rows
+are lost when changing file (NewFile) or finishing a measurement.
+
+Every SyncInterval seconds the file is fsync'd so a crash or power cut loses at
+most that much. Checkpoints (see Messages.SendCheckpoint) go through the same queue
+as the rows: everything before one is written and synced before its .json file is
+(atomically) replaced, so a checkpoint never claims more than is on the disk.
+"""
+
+import threading
+import queue
+import time
+import json
+import os
+import numpy as np
+
+class FileWriter(threading.Thread):
+    """
+    Thread that owns an open save file and writes data rows to it
+    """
+
+    #Kinds of things that can be put on the queue
+    ROW = 0
+    BLOCK = 1
+    TEXT = 2
+    CHECKPOINT = 3
+
+    def __init__(self, File, Delimiter="    ", FloatFormat="%r", FlushInterval=1.0, FlushSize=1048576,
+                 SyncInterval=30.0, CheckpointInterval=10.0):
+        """
+        Parameters
+        ----------
+        File : file object
+            Open text file, header should already be written.
+            The writer closes it when Close() is called.
+        Delimiter : str, optional
+            Put between values on a row. The default is 4 spaces.
+        FloatFormat : str, optional
+            % style format for each number. The default "%r" gives the full precision.
+        FlushInterval : float, optional
+            Max seconds between writes to disk. The default is 1.0.
+        FlushSize : int, optional
+            Write to disk once this many characters are waiting. The default is 1MB.
+        SyncInterval : float, optional
+            Max seconds between fsyncs of the file, 0 for never. The default is 30.
+        CheckpointInterval : float, optional
+            Min seconds between checkpoint files being written, checkpoints that come
+            quicker than this are skipped. The default is 10.
+        """
+        super().__init__(daemon=False)
+
+        self.File = File
+        self.Delimiter = Delimiter
+        self.FloatFormat = FloatFormat
+        self.FlushInterval = FlushInterval
+        self.FlushSize = FlushSize
+        self.SyncInterval = SyncInterval
+        self.CheckpointInterval = CheckpointInterval
+        self.LastCheckpoint = 0.0
+
+        self._Queue = queue.Queue()
+
+        #Total seconds spent writing to disk, read by the performance tab
+        self.WriteTime = 0.0
+
+        #Number of rows of numbers written and the range of each column, for the run catalog.
+        #Only read them after Close()
+        self.nDataRows = 0
+        self.ColumnMin = None
+        self.ColumnMax = None
+
+        #First unexpected error in the writer thread, reported by Close()
+        self.Error = None
+        self.FormatWarned = False
+
+        self.start()
+
+    ######## Called from the GUI thread ########
+
+    def WriteRow(self, Row):
+        """
+        Queue a single row (list of values) to be written
+        """
+        self._Queue.put((self.ROW, Row))
+
+    def WriteBlock(self, Block):
+        """
+        Queue a block of rows (2D array or list of rows) to be written
+        """
+        self._Queue.put((self.BLOCK, Block))
+
+    def WriteText(self, Text):
+        """
+        Queue some text to be written as it is
+        """
+        self._Queue.put((self.TEXT, Text))
+
+    def WriteCheckpoint(self, Path, Info):
+        """
+        Queue a checkpoint, written to Path as json once everything queued before it is on the disk.
+        The number of rows and the size of the save file at that point are added to Info.
+        """
+        self._Queue.put((self.CHECKPOINT, (Path, Info)))
+
+    def Close(self):
+        """
+        Write out everything still queued, then close the file.
+        Waits until it's done so the file can be safely reopened afterwards.
+
+        Returns
+        -------
+        False if the writer thread hit an error (kept in self.Error), so rows may be missing
+        """
+        self._Queue.put(None)
+        self.join()
+        if self.Error is not None:
+            print(self.Error)
+            print("The save file writer failed, some data may not have been saved!")
+            return False
+        return True
+
+    ######## Writer thread ########
+
+    def FormatRows(self, Rows):
+        """
+        Turn rows into lines of text in one go
+
+        Parameters
+        ----------
+        Rows : 2D array or list of rows
+
+        Returns
+        -------
+        String with one line per row
+        """
+        try:
+            Block = np.asarray(Rows, dtype=float)
+            if Block.ndim != 2:
+                raise ValueError("Not a block of rows")
+        except (ValueError, TypeError):
+            #Not all numbers, or rows of different lengths. Do them one at a time the old way
+            self.AddStats(self.NumericRows(Rows))
+            return self.FormatPlain(Rows)
+
+        nRows, nCols = Block.shape
+        if nRows == 0:
+            return ""
+
+        self.AddStats(Block)
+
+        #Build one format string for the whole block so it is formatted in a single call
+        RowFormat = self.Delimiter.join([self.FloatFormat]*nCols) + "\n"
+        try:
+            return (RowFormat*nRows) % tuple(Block.ravel().tolist())
+        except (TypeError, ValueError, OverflowError) as e:
+            #e.g. "%d" can't do NaN or inf, save them the old way rather than lose them
+            if not self.FormatWarned:
+                print(e)
+                print("Couldn't use number format {}, saving at full precision".format(self.FloatFormat))
+                self.FormatWarned = True
+            return self.FormatPlain(Block.tolist())
+
+    def FormatPlain(self, Rows):
+        """
+        One row at a time with str(), works for anything
+        """
+        return "".join(str(list(Row)).replace(", ",self.Delimiter)[1:-1]+"\n" for Row in Rows)
+
+    def FormatText(self, Text):
+        return str(Text)
+
+    def NumericRows(self, Rows):
+        """
+        The rows that are all numbers as a 2D array, None if there aren't any
+        """
+        Numeric = []
+        for Row in Rows:
+            try:
+                Numeric.append(np.asarray(Row, dtype=float).ravel())
+            except (ValueError, TypeError):
+                pass
+        if len(Numeric) == 0:
+            return None
+        try:
+            return np.vstack(Numeric)
+        except ValueError:
+            #rows of different lengths
+            return None
+
+    def AddStats(self, Block):
+        """
+        Adds a block of rows to the row count and column ranges.
+        NaNs are ignored, blocks of a different width to the first are left out.
+        """
+        if Block is None or Block.ndim != 2 or Block.shape[0] == 0:
+            return
+        #fmin/fmax skip NaNs without warnings
+        Mins = np.fmin.reduce(Block, axis=0)
+        Maxs = np.fmax.reduce(Block, axis=0)
+        if self.ColumnMin is None:
+            self.ColumnMin = Mins
+            self.ColumnMax = Maxs
+        elif len(self.ColumnMin) == len(Mins):
+            self.ColumnMin = np.fmin(self.ColumnMin, Mins)
+            self.ColumnMax = np.fmax(self.ColumnMax, Maxs)
+        else:
+            return
+        self.nDataRows += Block.shape[0]
+
+    def ChunkSize(self, Chunk):
+        """
+        Size of a formatted chunk, compared against FlushSize
+        """
+        return len(Chunk)
+
+    def WriteChunks(self, Chunks):
+        """
+        Write formatted chunks to the file. Should raise if it fails so they are kept for later
+        """
+        self.File.write("".join(Chunks))
+        self.File.flush()
+
+    def CloseFile(self):
+        self.File.close()
+
+    def SyncFile(self):
+        """
+        Make sure what has been written is on the disk, not just in the OS cache
+        """
+        try:
+            os.fsync(self.File.fileno())
+        except (OSError, AttributeError, ValueError):
+            #some compressed streams don't have a file number, they've still been flushed
+            pass
+
+    def FileOffset(self):
+        """
+        Size of the save file on disk
+        """
+        try:
+            return os.fstat(self.File.fileno()).st_size
+        except (OSError, AttributeError, ValueError):
+            return None
+
+    def Flush(self, Pending):
+        """
+        Writes the pending chunks, returns True if it worked
+        """
+        if len(Pending) == 0:
+            return True
+        try:
+            Write_T = time.perf_counter()
+            self.WriteChunks(Pending)
+            self.WriteTime += time.perf_counter() - Write_T
+            return True
+        except Exception as e:
+            #keep hold of it and try again next time (e.g. network drive dropped out)
+            print(e)
+            print("Failed to write to save file!")
+            return False
+
+    def SaveCheckpoint(self, Path, Info):
+        """
+        Writes a checkpoint file. Written to a temporary file first and swapped in,
+        so there is always a whole checkpoint file even if it crashes half way through.
+        """
+        Info = dict(Info)
+        Info["Rows"] = self.nDataRows
+        Info["FileSize"] = self.FileOffset()
+        Info["Time"] = time.time()
+        Temp = Path + ".tmp"
+        try:
+            with open(Temp, "w") as File:
+                json.dump(Info, File, indent=1, default=str)
+                File.flush()
+                os.fsync(File.fileno())
+            os.replace(Temp, Path)
+        except Exception as e:
+            print(e)
+            print("Failed to write checkpoint")
+
+    def run(self):
+
+        Pending = []
+        PendingSize = 0
+        Rows = []
+        LastFlush = time.time()
+        LastSync = time.time()
+        Closing = False
+
+        while not Closing:
+
+            #Wait for something, then take everything else that is waiting too
+            try:
+                Items = [self._Queue.get(timeout=self.FlushInterval)]
+            except queue.Empty:
+                Items = []
+            while True:
+                try:
+                    Items.append(self._Queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            Chunks = []
+            try:
+                for Item in Items:
+                    if Item is None:
+                        Closing = True
+                        break
+
+                    Kind, Payload = Item
+
+                    if Kind == self.ROW:
+                        #collect single rows up so they can be formatted together
+                        Rows.append(Payload)
+                        continue
+
+                    if len(Rows) > 0:
+                        Chunks.append(self.FormatRows(Rows))
+                        Rows = []
+
+                    if Kind == self.CHECKPOINT:
+                        if time.time()-self.LastCheckpoint < self.CheckpointInterval:
+                            continue
+                        #everything before the checkpoint has to be on the disk first
+                        for Chunk in Chunks:
+                            if Chunk is not None:
+                                Pending.append(Chunk)
+                                PendingSize += self.ChunkSize(Chunk)
+                        Chunks = []
+                        if self.Flush(Pending):
+                            Pending = []
+                            PendingSize = 0
+                            LastFlush = time.time()
+                            self.SyncFile()
+                            LastSync = time.time()
+                            self.SaveCheckpoint(*Payload)
+                            self.LastCheckpoint = time.time()
+                    elif Kind == self.BLOCK:
+                        Chunks.append(self.FormatRows(Payload))
+                    else:
+                        Chunks.append(self.FormatText(Payload))
+
+                if len(Rows) > 0:
+                    Chunks.append(self.FormatRows(Rows))
+                    Rows = []
+            except Exception as e:
+                #Keep going, if the thread died everything after this would be lost without a word.
+                #Close() reports it
+                print(e)
+                print("Save file writer error, some rows were not saved!")
+                if self.Error is None:
+                    self.Error = e
+                Rows = []
+                Closing = Closing or None in Items
+
+            for Chunk in Chunks:
+                if Chunk is not None:
+                    Pending.append(Chunk)
+                    PendingSize += self.ChunkSize(Chunk)
+
+            if Closing or PendingSize >= self.FlushSize or time.time()-LastFlush >= self.FlushInterval:
+                if self.Flush(Pending):
+                    Pending = []
+                    PendingSize = 0
+                LastFlush = time.time()
+
+                if Closing or (self.SyncInterval > 0 and time.time()-LastSync >= self.SyncInterval):
+                    self.SyncFile()
+                    LastSync = time.time()
+
+        try:
+            self.CloseFile()
+        except Exception as e:
+            print(e)
+            print("Failed to close save file")
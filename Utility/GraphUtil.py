@@ -91,9 +91,51 @@ class Util(tk.Frame):
                                           variable=self.GraphSelectOption,
                                           value="2D")
         Graph2DOption.pack(anchor="w")
+        
+        #Limits on how often the main window refreshes, it picks a rate in between
+        RefreshFrame = tk.Frame(GraphUtilTab)
+        RefreshFrame.grid(column = 4, row = 0, rowspan = 3)
+        
+        RefreshLabel = tk.Label(RefreshFrame,text="Refresh (ms)")
+        RefreshLabel.grid(column=0, row=0, columnspan=4)
+        
+        RefreshMinLabel = tk.Label(RefreshFrame,text="Min")
+        RefreshMinLabel.grid(column=0, row=1)
+        self.RefreshMinEntry = tk.StringVar(RefreshFrame,"50")
+        RefreshMinBox = tk.Entry(RefreshFrame,textvariable=self.RefreshMinEntry,width = 6)
+        RefreshMinBox.grid(column=1, row=1)
+        
+        RefreshMaxLabel = tk.Label(RefreshFrame,text="Max")
+        RefreshMaxLabel.grid(column=0, row=2)
+        self.RefreshMaxEntry = tk.StringVar(RefreshFrame,"1000")
+        RefreshMaxBox = tk.Entry(RefreshFrame,textvariable=self.RefreshMaxEntry,width = 6)
+        RefreshMaxBox.grid(column=1, row=2)
+        
+        self.RefreshLimits = (50,1000)
+        
+        #How long to spend reading data from the worker each refresh
+        ReadLabel = tk.Label(RefreshFrame,text="Read (ms)")
+        ReadLabel.grid(column=2, row=1)
+        self.ReadBudgetEntry = tk.StringVar(RefreshFrame,"20")
+        ReadBudgetBox = tk.Entry(RefreshFrame,textvariable=self.ReadBudgetEntry,width = 6)
+        ReadBudgetBox.grid(column=3, row=1)
+        
+        ReadMaxLabel = tk.Label(RefreshFrame,text="Max msgs")
+        ReadMaxLabel.grid(column=2, row=2)
+        self.ReadMaxEntry = tk.StringVar(RefreshFrame,"1000")
+        ReadMaxBox = tk.Entry(RefreshFrame,textvariable=self.ReadMaxEntry,width = 6)
+        ReadMaxBox.grid(column=3, row=2)
+        
+        self.ReadLimitsValue = (0.02,1000)
+        
         self.isTextbox=True
         #bool to tell the update graph whether to parse strings as invalid or to compare to the list of columns
         
+        #Remember what has already been plotted so only new points are processed each update
+        self.Selection1DKey = None
+        self.Selection1D = None
+        self.ResetIncremental()
+        
     def CreateGraph(self):
         """Creates the figure to put inside the graphic section of Autolab
         Determine if either 1d or 2d graph type
@@ -135,8 +177,14 @@ class Util(tk.Frame):
         self.ax = self.fig.add_subplot(111)
         self.axtwin = self.ax.twinx()
         
+        #after the new axes are made so the decimators get their width
+        self.ResetIncremental()
+        
+        #blitted on top of the cached background, see FullDraw
         self.Plot1, = self.ax.plot(xData, y1Data,"#000000",antialiased=False,linewidth=0.5)
         self.Plot2, = self.axtwin.plot(xData, y2Data,"#E69F00",antialiased=False,linewidth=0.5)
+        self.BlitArtists = [(self.ax,self.Plot1),(self.axtwin,self.Plot2)]
+        self.BlitCanvas = None
         
         self.ax.set_facecolor("white")
         self.ax.grid(color="grey")
@@ -162,17 +210,126 @@ class Util(tk.Frame):
         self.ax = self.fig.add_subplot(111)
         
         self.Plot2D = self.ax.imshow([[0]],extent=[0,1,0,1],aspect='auto')
+        self.BlitArtists = [(self.ax,self.Plot2D)]
+        self.BlitCanvas = None
         
         self.fig.colorbar(self.Plot2D, ax = self.ax)
     
     def UpdateGraph(self,Data):
         """Updates the graph with given data and selected columns
+        Data should be a Utility.DataStore
+        
+        Returns True if the graph changed and needs redrawing
         """
         
         if self.CurrentGraph == "1D":
-            self.UpdateGraph1D(Data)
+            return self.UpdateGraph1D(Data)
         else:
-            self.UpdateGraph2D(Data)
+            return self.UpdateGraph2D(Data)
+    
+    def RefreshBounds(self):
+        """
+        Min and max refresh interval in ms from the entries.
+        Keeps the last good values while they are being typed in.
+        """
+        try:
+            Min = max(int(self.RefreshMinEntry.get()),10)
+            Max = int(self.RefreshMaxEntry.get())
+            if Max >= Min:
+                self.RefreshLimits = (Min,Max)
+        except ValueError:
+            pass
+        return self.RefreshLimits
+    
+    def ReadLimits(self):
+        """
+        Time budget in seconds and max number of messages for reading the pipe each refresh
+        """
+        try:
+            Budget = float(self.ReadBudgetEntry.get())/1000
+            MaxMessages = int(self.ReadMaxEntry.get())
+            if Budget > 0 and MaxMessages > 0:
+                self.ReadLimitsValue = (Budget,MaxMessages)
+        except ValueError:
+            pass
+        return self.ReadLimitsValue
+    
+    ########## Blitting ##########
+    
+    def LimitsKey(self):
+        """
+        Everything that, if changed, means the axes/ticks/colourbar need a full redraw
+        """
+        Key = [self.ax.get_xlim(), self.ax.get_ylim()]
+        for Ax, Artist in self.BlitArtists:
+            if Ax is not self.ax:
+                Key.append(Ax.get_ylim())
+            if hasattr(Artist,"get_clim"):
+                #the colourbar is in the background, the extent isn't
+                Key.append(Artist.get_clim())
+        return Key
+    
+    def SetupBlit(self):
+        """
+        Hook into the canvas so the background gets cached every time it is fully drawn
+        """
+        self.BlitCanvas = self.fig.canvas
+        self.Background = None
+        self.DrawnLimits = None
+        self.Caching = False
+        self.BlitCanvas.mpl_connect("draw_event", self.OnDraw)
+    
+    def FullDraw(self):
+        """
+        Draws everything and caches the background without the data.
+        The data is only animated (left out) for this draw, so savefig, resizing and
+        the toolbar still draw it like any other figure.
+        """
+        for Ax, Artist in self.BlitArtists:
+            Artist.set_animated(True)
+        self.Caching = True
+        try:
+            self.BlitCanvas.draw()
+        finally:
+            self.Caching = False
+            for Ax, Artist in self.BlitArtists:
+                Artist.set_animated(False)
+    
+    def OnDraw(self,event):
+        """
+        Called after every full draw, grab the background then put the data back on top
+        """
+        if not self.Caching:
+            #drawn by something else (resize, zoom, savefig...), the data is in it
+            #so it can't be used as the background
+            self.Background = None
+            return
+        self.Background = self.BlitCanvas.copy_from_bbox(self.fig.bbox)
+        self.DrawnLimits = self.LimitsKey()
+        for Ax, Artist in self.BlitArtists:
+            Ax.draw_artist(Artist)
+    
+    def Draw(self):
+        """
+        Draw the graph. If only the data changed just the lines/image are redrawn over
+        the cached background, a full redraw is only done when the limits change.
+        """
+        if self.BlitCanvas is not self.fig.canvas:
+            self.SetupBlit()
+        Canvas = self.BlitCanvas
+        
+        if not Canvas.supports_blit:
+            Canvas.draw()
+            return
+        
+        if self.Background is None or self.LimitsKey() != self.DrawnLimits:
+            self.FullDraw()
+            return
+        
+        Canvas.restore_region(self.Background)
+        for Ax, Artist in self.BlitArtists:
+            Ax.draw_artist(Artist)
+        Canvas.blit(self.fig.bbox)
     
     def Initialise_Dropdowns(self,column_List):
         """
@@ -239,65 +396,175 @@ class Util(tk.Frame):
         self.isTextbox=True
         
         
+    def ResetIncremental(self):
+        """
+        Forget what has been plotted so the next update starts from the first point.
+        Called when the graph, the column selection or the data store changes.
+        """
+        self.PlottedData = None
+        self.PlottedGeneration = None
+        self.nPlotted = 0
+        self.Limits = {}
+        self.Ranges = {}
+        #about 2 points per pixel are drawn, however long the run is
+        try:
+            Width = self.ax.bbox.width
+        except AttributeError:
+            Width = 600
+        self.Decimators = {"y1":MinMaxDecimator(Width), "y2":MinMaxDecimator(Width)}
+        self.MeshState = None
+        self.Selection2DKey = None
+    
+    def DataChanged(self, Data):
+        """
+        True if Data isn't what was plotted last time: a different store, or the same
+        one that has been cleared (ClearGraph, NewFile) since, even if it has refilled
+        """
+        return (Data is not self.PlottedData or Data.Generation != self.PlottedGeneration
+                or len(Data) < self.nPlotted)
+    
+    def ParseSelection1D(self):
+        """
+        Works out the column numbers from the X, Y1, Y2 entries/dropdowns.
+        Only re-parses when one of them has changed.
+        
+        Returns
+        -------
+        (x column, y1 column, y2 column)
+        """
+        #Autoscale is in here too so ticking it redraws straight away
+        Key = (self.isTextbox, self.XaxisEntry.get(), self.Y1axisEntry.get(), self.Y2axisEntry.get(), self.Autoscale.get())
+        if Key == self.Selection1DKey:
+            return self.Selection1D
+        
+        if self.isTextbox==True:
+            xAxisSel = int(self.XaxisEntry.get())
+            Str = self.Y1axisEntry.get()
+            y1AxisSel = [int(i) for i in Str.replace(" ","").split(",")]
+            Str = self.Y2axisEntry.get()
+            y2AxisSel = [int(i) for i in Str.replace(" ","").split(",")]
+        else:
+            xAxisSel=self.Data_Columns.index(self.XaxisEntry.get())
+            y1AxisSel=self.Data_Columns.index(self.Y1axisEntry.get())
+            y2AxisSel=self.Data_Columns.index(self.Y2axisEntry.get())
+        
+        #for when we can do lists to axis. Not now, just the first one is plotted
+        if type(y1AxisSel)!=int:
+            y1AxisSel = y1AxisSel[0]
+        if type(y2AxisSel)!=int:
+            y2AxisSel = y2AxisSel[0]
+        
+        self.Selection1DKey = Key
+        self.Selection1D = (xAxisSel, y1AxisSel, y2AxisSel)
+        self.ResetIncremental()
+        return self.Selection1D
+    
+    def UpdateLimits(self, Name, NewData):
+        """
+        Update the running min/max of one plotted column with just the new points
+        """
+        NewData = NewData[np.isfinite(NewData)]
+        if NewData.size == 0:
+            return
+        Min = NewData.min()
+        Max = NewData.max()
+        if Name in self.Limits:
+            OldMin, OldMax = self.Limits[Name]
+            Min = min(Min, OldMin)
+            Max = max(Max, OldMax)
+        self.Limits[Name] = (Min, Max)
+    
+    def PaddedLimits(self, Name):
+        """
+        Running min/max of a column with a 5% margin, like matplotlib's autoscale
+        """
+        Min, Max = self.Limits[Name]
+        Pad = 0.05*(Max-Min)
+        if Pad == 0:
+            Pad = 0.05*abs(Min) if Min != 0 else 0.5
+        return (Min-Pad, Max+Pad)
+    
+    def PaddedRange(self, Name):
+        """
+        Same as PaddedLimits, but only moves when the data goes outside the range it
+        gave last time, so a growing sweep doesn't force a full redraw every update
+        """
+        Min, Max = self.Limits[Name]
+        Old = self.Ranges.get(Name)
+        if Old is None or Min < Old[0] or Max > Old[1]:
+            self.Ranges[Name] = self.PaddedLimits(Name)
+        return self.Ranges[Name]
+    
     def UpdateGraph1D(self,Data):
+        """
+        Updates the 1D graph with any points that have arrived since the last update.
+        The min/max for autoscaling are kept as running values, so only new points are looked at.
+        
+        Returns
+        -------
+        True if the plot changed and needs redrawing
+        """
         
         try:
-            if self.isTextbox==True:
-                xAxisSel = int(self.XaxisEntry.get())
-                Str = self.Y1axisEntry.get()
-                y1AxisSel = [int(i) for i in Str.replace(" ","").split(",")]
-                Str = self.Y2axisEntry.get()
-                y2AxisSel = [int(i) for i in Str.replace(" ","").split(",")]
+            xAxisSel, y1AxisSel, y2AxisSel = self.ParseSelection1D()
+            
+            if self.DataChanged(Data):
+                #New run or the data has been cleared, start again
+                self.ResetIncremental()
+                self.PlottedData = Data
+                self.PlottedGeneration = Data.Generation
+                Changed = True
             else:
-                xAxisSel=self.Data_Columns.index(self.XaxisEntry.get())
-                y1AxisSel=self.Data_Columns.index(self.Y1axisEntry.get())
-                y2AxisSel=self.Data_Columns.index(self.Y2axisEntry.get())
+                Changed = len(Data) > self.nPlotted
+            
+            if not Changed:
+                return False
 
-            xData = [float(i[xAxisSel]) for i in Data]
-            y1Data = []
-            if type(y1AxisSel)!=int:#for when we can do lists to axis. Not now.
-                for Sel in y1AxisSel:
-                    y1Data.append([float(i[Sel]) for i in Data])
-            else:
-                y1Data.append(([float(i[y1AxisSel]) for i in Data]))
-            y2Data = []
-            if type(y2AxisSel)!=int:#for when we can do lists to axis. Not now.
-                for Sel in y2AxisSel:
-                    y2Data.append([float(i[Sel]) for i in Data])
-            else:
-                y2Data.append(([float(i[y2AxisSel]) for i in Data]))
+            #Data is a DataStore, columns are views so no copying here
+            xData = Data.Column(xAxisSel)
+            y1Data = Data.Column(y1AxisSel)
+            y2Data = Data.Column(y2AxisSel)
+            
         except Exception as e:
             
             print(e)
-            
-            xAxisSel = 0
-            y1AxisSel = 1
-            y2AxisSel = 2
             print("Invalid column selection")
-            return
-
-    
-        self.Plot1.set_xdata(xData)
-        self.Plot1.set_ydata(y1Data[0])
-        self.Plot2.set_xdata(xData)
-        self.Plot2.set_ydata(y2Data[0])
+            return False
+        
+        #Only draw the min/max points of each bucket, enough to fill the pixels
+        Idx = self.Decimators["y1"].Update(y1Data)
+        self.Plot1.set_data(xData[Idx], y1Data[Idx])
+        Idx = self.Decimators["y2"].Update(y2Data)
+        self.Plot2.set_data(xData[Idx], y2Data[Idx])
         
-#        self.Plot1.set_data(*y1Data)
-#        self.Plot2.set_data(*y2Data)
+        #Only look at the points added since last time
+        Start = self.nPlotted
+        self.UpdateLimits("x", xData[Start:])
+        self.UpdateLimits("y1", y1Data[Start:])
+        self.UpdateLimits("y2", y2Data[Start:])
+        self.nPlotted = len(Data)
         
         if bool(self.Autoscale.get()):
             try:
-                self.ax.relim()
-                self.ax.autoscale()
-                self.axtwin.relim()
-                self.axtwin.autoscale()
+                if "x" in self.Limits:
+                    self.ax.set_xlim(self.PaddedLimits("x"))
+                if "y1" in self.Limits:
+                    self.ax.set_ylim(self.PaddedLimits("y1"))
+                if "y2" in self.Limits:
+                    self.axtwin.set_ylim(self.PaddedLimits("y2"))
             except Exception as e:
                 print("Couldn't autosclae graph")
                 print(e)
         
+        return True
+        
         
     def UpdateGraph2D(self,Data):
         """Updates the Graph with the selected data
+        The mesh is kept between updates and only new points are added to it,
+        it is only rebuilt when the grid size changes.
+        
+        Returns True if the plot changed and needs redrawing
         """
         
         try:
@@ -308,17 +575,17 @@ class Util(tk.Frame):
             Str = self.Y2axisEntry.get()
             zAxisSel = [int(i) for i in Str.replace(" ","").split(",")]
             
-            xData = [float(i[xAxisSel]) for i in Data]
+            xData = Data.Column(xAxisSel)
             
             yData = []
             for Sel in yAxisSel:
-                yData.append([float(i[Sel]) for i in Data])
+                yData.append(Data.Column(Sel))
             
             yData = yData[0]
         
             zData = []
             for Sel in zAxisSel:
-                zData.append([float(i[Sel]) for i in Data])
+                zData.append(Data.Column(Sel))
                 
             zData = zData[0]
             
@@ -330,7 +597,17 @@ class Util(tk.Frame):
             yAxisSel = 1
             zAxisSel = 2
             print("Invalid column selection")
-            return
+            return False
+        
+        Key = (xAxisSel, yAxisSel[0], zAxisSel[0], self.Autoscale.get())
+        if self.DataChanged(Data) or Key != self.Selection2DKey:
+            #New run, cleared data or different columns, start the mesh again
+            self.ResetIncremental()
+            self.PlottedData = Data
+            self.PlottedGeneration = Data.Generation
+            self.Selection2DKey = Key
+        elif len(Data) == self.nPlotted:
+            return False
         
         if len(xData) == 0:
             xData = [0]
@@ -339,31 +616,37 @@ class Util(tk.Frame):
         
         try:
             
-            meshgrid = self.MeshNearest(xData,yData,zData)
+            Start = self.nPlotted
+            meshgrid = self.MeshIncremental(xData,yData,zData)
+            self.UpdateLimits("z", np.asarray(zData[Start:], dtype=float))
+            self.nPlotted = len(Data)
             
             self.Plot2D.set_data(meshgrid)
             
             if bool(self.Autoscale.get()):
                 try:
                     
-                    minX = min(xData)
-                    maxX = max(xData)
+                    #running min/max kept by MeshIncremental
+                    minX, maxX, minY, maxY = self.MeshState["Limits"]
                     if minX == maxX:
                         minX = 0
                         maxX = 1
                     
-                    minY = min(yData)
-                    maxY = max(yData)
                     if minY == maxY:
                         minY = 0
                         maxY = 1
                     
-                    self.Plot2D.autoscale()
+                    #the image is blitted so moving it is cheap, the axes and
+                    #colourbar only change when the data goes past their padded range
                     self.Plot2D.set_extent([minX,maxX,
                                             minY,maxY])
-    
-                    self.ax.relim()
-                    self.ax.autoscale()
+                    
+                    self.Limits["x"] = (minX, maxX)
+                    self.Limits["y"] = (minY, maxY)
+                    self.ax.set_xlim(self.PaddedRange("x"))
+                    self.ax.set_ylim(self.PaddedRange("y"))
+                    if "z" in self.Limits:
+                        self.Plot2D.set_clim(self.PaddedRange("z"))
                     
                 except Exception as e:
                     print("Couldn't autosclae graph")
@@ -374,6 +657,30 @@ class Util(tk.Frame):
         except Exception as e:
             print(e)
             print("Failed to plot data")
+        
+        return True
+    
+    @staticmethod
+    def GridSize(Min, Max, MaxStep):
+        """Grid step and number of cells along one axis
+        The step is the biggest change between consecutive points
+        """
+        if Min == Max:
+            return 1, 1
+        Delta = abs(MaxStep)
+        return Delta, int(round( (Max-Min)/Delta )) + 1
+    
+    @staticmethod
+    def MeshScatter(meshgrid, Params, dataX, dataY, dataZ):
+        """Puts Z data into the nearest cells of the meshgrid in one go
+        Later points overwrite earlier ones in the same cell
+        """
+        minX, deltaX, nX, minY, deltaY, nY = Params
+        
+        iX = np.rint( (dataX-minX)/deltaX ).astype(int)
+        iY = (nY-1) - np.rint( (dataY-minY)/deltaY ).astype(int)
+        
+        meshgrid[iY,iX] = dataZ
     
     def MeshNearest(self,dataX,dataY,dataZ):
         """Converts a list of X, Y and Z data to a mesh grid
@@ -386,51 +693,163 @@ class Util(tk.Frame):
         if len(dataX)==0:
             return np.array([[0]])
         
-        dataX = np.array(dataX)
-        dataY = np.array(dataY)
-        dataZ = np.array(dataZ)
+        #Build from scratch
+        self.MeshState = None
+        return self.MeshIncremental(dataX,dataY,dataZ)
+    
+    def MeshIncremental(self,dataX,dataY,dataZ):
+        """Same as MeshNearest, but keeps the mesh from last time and only adds
+        the points that have arrived since. If the grid size has changed the
+        mesh is remade with all the points.
         
-        # Get max difference
-        minX = min(dataX)
-        maxX = max(dataX)
-        if minX == maxX:
-            deltaX = 1
-            nX = 1
-        else:
-            deltaX = abs(max(dataX[1:] - dataX[:-1]))
-            nX = round( (maxX-minX)/deltaX ) + 1
-        
-        minY = min(dataY)
-        maxY = max(dataY)
-        if minY == maxY:
-            deltaY = 1
-            nY = 1
-        else:
-            deltaY = abs(max(dataY[1:] - dataY[:-1]))
-            nY = round( (maxY-minY)/deltaY ) + 1
+        returns n*m grid
+        """
+        n = len(dataZ)
+        if n == 0:
+            return np.array([[0]])
+        
+        State = self.MeshState
+        if State is None or n < State["n"]:
+            State = {"n":0, "Grid":None, "Params":None}
+            self.MeshState = State
+        
+        Start = State["n"]
+        if Start == n and State["Grid"] is not None:
+            return State["Grid"]
+        
+        dataX = np.asarray(dataX, dtype=float)
+        dataY = np.asarray(dataY, dtype=float)
+        dataZ = np.asarray(dataZ, dtype=float)
+        
+        #Update the running min/max and biggest step with the new points,
+        #the last old point is included to get the step to the first new one
+        NewX = dataX[max(Start-1,0):n]
+        NewY = dataY[max(Start-1,0):n]
+        
+        Stats = [NewX.min(), NewX.max(), np.max(np.diff(NewX)) if len(NewX)>1 else -np.inf,
+                 NewY.min(), NewY.max(), np.max(np.diff(NewY)) if len(NewY)>1 else -np.inf]
+        if "Stats" in State:
+            Old = State["Stats"]
+            Stats = [min(Stats[0],Old[0]), max(Stats[1],Old[1]), max(Stats[2],Old[2]),
+                     min(Stats[3],Old[3]), max(Stats[4],Old[4]), max(Stats[5],Old[5])]
+        State["Stats"] = Stats
+        State["Limits"] = (Stats[0], Stats[1], Stats[3], Stats[4])
+        State["n"] = n
+        
+        deltaX, nX = self.GridSize(Stats[0], Stats[1], Stats[2])
+        deltaY, nY = self.GridSize(Stats[3], Stats[4], Stats[5])
         
         if nX*nY>1000000:
             print("2D plot is too large, number of cells greater that 1,000,000")
+            State["Grid"] = None
             return np.array([[0]])
         
-        #make array
-        meshgrid = np.zeros([int(nY),int(nX)])
+        Params = (Stats[0], deltaX, nX, Stats[3], deltaY, nY)
         
-        #Move Z data to meshgrid
-        for i in range(len(dataZ)):
-            x = dataX[i]
-            y = dataY[i]
-            z = dataZ[i]
-            
-            iX = int(round( (x-minX)/deltaX ))
-            iY = int(nY-1) - int(round((y-minY)/deltaY ))
+        if State["Grid"] is None or Params != State["Params"]:
+            #Grid has changed shape, make a new one and put everything in it
+            State["Grid"] = np.zeros([int(nY),int(nX)])
+            State["Params"] = Params
+            Start = 0
+        
+        self.MeshScatter(State["Grid"], Params, dataX[Start:n], dataY[Start:n], dataZ[Start:n])
+        
+        return State["Grid"]
             
-            #print(nX,nY,iX,iY)
             
-            meshgrid[iY,iX] = z
+
+class MinMaxDecimator(object):
+    """
+    Cuts a trace down to about 2 points per pixel for drawing, keeping the min and
+    max of each bucket of points so spikes and glitches are still visible.
+    
+    Buckets are by point number, so it works for sweeps that go back and forth.
+    Updated incrementally: only new points get looked at, and when there are too many
+    buckets neighbouring pairs are merged and the bucket size doubles.
+    """
+    
+    def __init__(self, nBuckets=600):
+        """
+        Parameters
+        ----------
+        nBuckets : int, optional
+            Max number of buckets, roughly the width of the plot in pixels.
+            The default is 600.
+        """
+        self.nBuckets = max(int(nBuckets),1)
+        self.Reset()
+    
+    def Reset(self):
+        self.BucketSize = 1
+        #index of the min and max point of every finished bucket
+        self.Mins = np.empty(0, dtype=np.intp)
+        self.Maxs = np.empty(0, dtype=np.intp)
+        #number of points in finished buckets
+        self.nDone = 0
+    
+    def Update(self, yData):
+        """
+        Add any new points and return the indices of the points to draw
         
-        return meshgrid
-            
+        Parameters
+        ----------
+        yData : array
+            The whole trace so far (a DataStore column view)
+        
+        Returns
+        -------
+        Array of indices into yData, in order
+        """
+        n = len(yData)
+        if n < self.nDone:
+            self.Reset()
+        
+        #Don't bother until there are more points than pixels
+        if self.BucketSize == 1 and n <= 2*self.nBuckets:
+            return np.arange(n)
+        
+        if self.BucketSize == 1:
+            #first time over the limit, start with buckets big enough to fit
+            self.BucketSize = 2
+            while n//self.BucketSize > self.nBuckets:
+                self.BucketSize *= 2
+        
+        B = self.BucketSize
+        nNew = (n - self.nDone)//B
+        if nNew > 0:
+            Seg = yData[self.nDone:self.nDone+nNew*B].reshape(nNew,B)
+            NaN = np.isnan(Seg)
+            Offsets = self.nDone + B*np.arange(nNew)
+            self.Mins = np.concatenate([self.Mins, Offsets + np.argmin(np.where(NaN,np.inf,Seg),axis=1)])
+            self.Maxs = np.concatenate([self.Maxs, Offsets + np.argmax(np.where(NaN,-np.inf,Seg),axis=1)])
+            self.nDone += nNew*B
+        
+        while len(self.Mins) > self.nBuckets:
+            self.Merge(yData)
+        
+        Idx = np.empty(2*len(self.Mins), dtype=np.intp)
+        Idx[0::2] = np.minimum(self.Mins, self.Maxs)
+        Idx[1::2] = np.maximum(self.Mins, self.Maxs)
+        #points in the unfinished bucket are drawn as they are
+        return np.concatenate([Idx, np.arange(self.nDone, n)])
+    
+    def Merge(self, yData):
+        """
+        Merge neighbouring buckets in pairs, doubling the bucket size
+        """
+        if len(self.Mins) % 2 == 1:
+            #odd one out at the end goes back to being unfinished
+            self.Mins = self.Mins[:-1]
+            self.Maxs = self.Maxs[:-1]
+            self.nDone -= self.BucketSize
+        
+        A = self.Mins[0::2]
+        B = self.Mins[1::2]
+        self.Mins = np.where(yData[A] <= yData[B], A, B)
+        A = self.Maxs[0::2]
+        B = self.Maxs[1::2]
+        self.Maxs = np.where(yData[A] >= yData[B], A, B)
+        self.BucketSize *= 2
             
 
 if __name__=="__main__":
@@ -10,6 +10,7 @@ AND THE LAKESHORE 218 IS REFERRED TO AS Tmon (Temperature Monitor)
 import tkinter as tk
 import time
 import pyvisa
+from .InstrumentBroker import ResourceManager
 import Instruments as Inst
 from time import sleep
 from Utility import Monitor_Window
@@ -100,7 +101,7 @@ class Util(tk.Frame):
         """
         Attempt to connect to the two temperature controllers
         """
-        self.rm=pyvisa.ResourceManager()
+        self.rm=ResourceManager()
         L350add=self.gpib350Entry.get()
         L218add=int(self.gpib218Entry.get())#lakeshore addresses
         try:
@@ -168,7 +169,7 @@ class Util(tk.Frame):
         
     def Alloff(self):
         if self.Isconnected == False:
-            rm=pyvisa.ResourceManager()
+            rm=ResourceManager()
             L350add=self.gpib350Entry.get()
             Tcon=Inst.lakeshore350(self.rm,int(L350add))
             Tcon.allOff()
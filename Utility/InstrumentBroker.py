@@ -0,0 +1,613 @@
+# -*- coding: utf-8 -*-
+"""
+One process that owns every VISA session.
+
+The main window, every worker process, the temperature controller process and the
+utility tabs (LockinUtil configure, Keithley Export_MetaData...) all used to make
+their own ResourceManager and open their own session to the same GPIB address.
+Opening and closing sessions on every click or run is slow, and two processes
+talking to one instrument at once can lock up the bus.
+
+Now the broker process holds one session per address, opened the first time it's
+asked for and kept open until the broker stops. Everything else talks to it through
+a BrokerResourceManager, which looks like a pyvisa ResourceManager:
+
+    rm = Utility.ResourceManager()
+    Lockin = Inst.SR830(rm, 8)
+
+open_resource gives back a ResourceProxy instead of a pyvisa resource, it has the
+write/query/read/clear/close and termination/timeout parts the drivers use on self.VI,
+so Instrument_class and all the drivers work as they are. Each command is sent to the
+broker over a multiprocessing connection (named pipe on Windows, unix socket otherwise)
+and one lock per session in the broker means commands to the same instrument are done
+one at a time, a query's write and read are never split up by someone else.
+A separate write and read (e.g. SMS120C.update writes "U" then reads 13 lines) are kept
+together too: after a write the session is held for that client until it queries,
+clears, or leaves it alone for HoldTime seconds, other clients wait until then.
+
+VISA errors (e.g. a VisaIOError timeout) are raised again in the client as they were,
+so drivers that catch them work the same. Ones that can't be sent come back as BrokerError.
+
+Closing a proxy (or the driver __del__) only lets go of it, the session stays open
+for the next user. The broker is started by AutoLab if it isn't already running and
+stops with it. To keep the sessions open all day start it on its own:
+
+    python -m Utility.InstrumentBroker
+
+ResourceManager() gives every caller in a process the same connection to the broker,
+closing it does nothing. If the broker can't be reached it gives a normal pyvisa one instead.
+"""
+
+import os
+import sys
+import time
+import pickle
+import itertools
+import threading
+import tempfile
+import multiprocessing as mp
+from multiprocessing.connection import Listener, Client
+
+from .SimulatedVisa import Simulating, SharedSimulation, CallingDriver
+
+#Environment variable with the broker address, set by StartBroker so worker processes find the same one
+AddressVar = "AUTOLAB_BROKER"
+
+AuthKey = b"AutoLab"
+
+def DefaultAddress():
+    """
+    Where the broker listens unless AUTOLAB_BROKER says otherwise
+    """
+    if AddressVar in os.environ:
+        return os.environ[AddressVar]
+    if sys.platform == "win32":
+        return r"\\.\pipe\AutoLabBroker"
+    try:
+        User = os.getlogin()
+    except OSError:
+        User = str(os.getuid())
+    return os.path.join(tempfile.gettempdir(), "AutoLabBroker-" + User + ".sock")
+
+def _Family(Address):
+    return "AF_PIPE" if sys.platform == "win32" else "AF_UNIX"
+
+
+# =============================================================================
+# BROKER (the process that owns the sessions)
+# =============================================================================
+
+class _Session(object):
+    """
+    An open VISA resource and the lock that makes its users take turns.
+
+    After a write the client that sent it owns the session, so the reads that
+    go with it get its replies and not someone else's. Ownership ends when the
+    same client queries or clears, or after HoldTime seconds without it using it.
+    """
+    #Seconds the write's owner can leave it before someone else can have it
+    HoldTime = 2.0
+
+    def __init__(self, VI):
+        self.VI = VI
+        #held while a command is being done, waited on for the owner to finish
+        self.Lock = threading.Condition()
+        self.Owner = None
+        self.OwnerUntil = 0.0
+
+    def WaitTurn(self, Client):
+        """
+        Waits (with Lock held) until no other client owns the session
+        """
+        while self.Owner not in (None, Client):
+            Left = self.OwnerUntil - time.time()
+            if Left <= 0:
+                #owner has gone quiet, don't hold everyone else up
+                self.Owner = None
+                break
+            self.Lock.wait(Left)
+
+    def Done(self, Client, Op):
+        """
+        Updates the owner after a command (with Lock held)
+        """
+        if Op == "write":
+            self.Owner = Client
+            self.OwnerUntil = time.time() + self.HoldTime
+        elif self.Owner == Client:
+            if Op in ("query", "clear"):
+                #a new exchange, the last one must be finished
+                self.Release(Client)
+            else:
+                #read, get, set, call: still going, more reads may come
+                self.OwnerUntil = time.time() + self.HoldTime
+
+    def Release(self, Client):
+        """
+        Lets go of the session if Client owns it (with Lock held)
+        """
+        if self.Owner == Client:
+            self.Owner = None
+            self.Lock.notify_all()
+
+class Broker(object):
+    """
+    Serves VISA commands from any number of clients, one thread per client
+    """
+
+    def __init__(self, Address=None):
+        self.Address = Address or DefaultAddress()
+        self.rm = None
+        self.Sessions = {}
+        #protects Sessions and rm
+        self._Lock = threading.Lock()
+        self._Stop = threading.Event()
+        self.Listener = None
+        #a number for each client, for session ownership
+        self._ClientIDs = itertools.count()
+
+    def GetRM(self):
+        if self.rm is None:
+            #pyvisa, or the simulation if AUTOLAB_SIMULATE is set
+            self.rm = ResourceManager(UseBroker=False)
+        return self.rm
+
+    def Open(self, Address, Args):
+        """
+        Session for an address, opened the first time it's asked for
+        """
+        Kwargs, Driver = Args
+        with self._Lock:
+            if Address not in self.Sessions:
+                rm = self.GetRM()
+                if getattr(rm, "Simulated", False):
+                    #the simulation can't see the driver from here
+                    Kwargs = dict(Kwargs, Driver=Driver)
+                self.Sessions[Address] = _Session(rm.open_resource(Address, **Kwargs))
+                print("Broker opened {}".format(Address))
+            return Address
+
+    def Handle(self, Op, Address, Args, Client=None):
+        """
+        Does one request. Anything to do with a session holds its lock,
+        and waits if another client is in the middle of a write and read.
+        """
+        if Op == "open":
+            return self.Open(Address, Args)
+        if Op == "list":
+            with self._Lock:
+                rm = self.GetRM()
+            #can take seconds, don't hold up opening sessions
+            return tuple(rm.list_resources(*Args))
+        if Op == "sessions":
+            return list(self.Sessions)
+        if Op == "ping":
+            return True
+        if Op == "reset":
+            #really close one session, next open makes a new one
+            with self._Lock:
+                Session = self.Sessions.pop(Address, None)
+            if Session is not None:
+                with Session.Lock:
+                    Session.VI.close()
+            return None
+
+        Session = self.Sessions.get(Address)
+        if Session is None:
+            raise Exception("{} has not been opened through the broker".format(Address))
+        with Session.Lock:
+            Session.WaitTurn(Client)
+            try:
+                return self.Do(Session, Op, Address, Args)
+            finally:
+                #even if it failed, e.g. a read that timed out still ends the exchange
+                Session.Done(Client, Op)
+
+    def Do(self, Session, Op, Address, Args):
+        if Op == "write":
+            return Session.VI.write(*Args)
+        if Op == "query":
+            return Session.VI.query(*Args)
+        if Op == "read":
+            return Session.VI.read(*Args)
+        if Op == "clear":
+            return Session.VI.clear()
+        if Op == "get":
+            return getattr(Session.VI, Args)
+        if Op == "set":
+            #only what the resource already has, so a typo isn't silently kept
+            if not hasattr(Session.VI, Args[0]):
+                raise AttributeError("{} has no attribute {}".format(Address, Args[0]))
+            return setattr(Session.VI, Args[0], Args[1])
+        if Op == "call":
+            #anything else on the resource, e.g. read_raw, assert_trigger
+            return getattr(Session.VI, Args[0])(*Args[1], **Args[2])
+        raise ValueError("Unknown broker request {}".format(Op))
+
+    def Serve(self, Conn):
+        """
+        Answers one client until it disconnects
+        """
+        Client = next(self._ClientIDs)
+        try:
+            while not self._Stop.is_set():
+                try:
+                    Op, Address, Args = Conn.recv()
+                except (EOFError, OSError):
+                    break
+                if Op == "shutdown":
+                    Conn.send(("ok", None))
+                    self.Shutdown()
+                    break
+                try:
+                    Reply = ("ok", self.Handle(Op, Address, Args, Client))
+                except Exception as e:
+                    Reply = self.ErrorReply(e)
+                try:
+                    Conn.send(Reply)
+                except (EOFError, OSError):
+                    break
+                except Exception as e:
+                    #the answer couldn't be pickled
+                    Conn.send(("err", type(e).__name__, "Could not send reply: " + str(e)))
+        finally:
+            #don't keep anyone waiting for a client that has gone
+            for Session in list(self.Sessions.values()):
+                with Session.Lock:
+                    Session.Release(Client)
+            Conn.close()
+
+    @staticmethod
+    def ErrorReply(e):
+        """
+        The exception itself if it can be sent, so the client can raise the same type
+        (e.g. VisaIOError), otherwise its type and message
+        """
+        try:
+            pickle.loads(pickle.dumps(e))
+            return ("exc", e)
+        except Exception:
+            return ("err", type(e).__name__, str(e))
+
+    def Run(self):
+        """
+        Listens for clients until shut down
+        """
+        Family = _Family(self.Address)
+        if Family == "AF_UNIX" and os.path.exists(self.Address):
+            #left over from a broker that didn't exit cleanly
+            if Ping(self.Address):
+                raise Exception("A broker is already running at {}".format(self.Address))
+            os.remove(self.Address)
+
+        self.Listener = Listener(self.Address, Family, authkey=AuthKey)
+        print("Instrument broker listening on {}".format(self.Address))
+        try:
+            while not self._Stop.is_set():
+                try:
+                    Conn = self.Listener.accept()
+                except Exception as e:
+                    if self._Stop.is_set():
+                        break
+                    print(e)
+                    print("Broker failed to accept a connection")
+                    continue
+                threading.Thread(target=self.Serve, args=(Conn,), daemon=True).start()
+        finally:
+            self.CloseAll()
+
+    def Shutdown(self):
+        self._Stop.set()
+        #accept() doesn't notice the listener closing, connect once to wake it up
+        try:
+            Client(self.Address, _Family(self.Address), authkey=AuthKey).close()
+        except Exception:
+            pass
+        try:
+            self.Listener.close()
+        except Exception:
+            pass
+
+    def CloseAll(self):
+        with self._Lock:
+            while len(self.Sessions) > 0:
+                Address, Session = self.Sessions.popitem()
+                try:
+                    Session.VI.close()
+                except Exception:
+                    print("Failed to close {}".format(Address))
+            if self.rm is not None:
+                try:
+                    self.rm.close()
+                except Exception:
+                    pass
+                self.rm = None
+
+def RunBroker(Address=None):
+    """
+    Runs a broker in this process until it's shut down. Target for the broker Process.
+    """
+    Broker(Address).Run()
+
+
+# =============================================================================
+# CLIENT SIDE
+# =============================================================================
+
+class BrokerError(Exception):
+    """
+    An error raised in the broker, e.g. a VISA timeout. args[0] is the message.
+    """
+    pass
+
+class BrokerAttributeError(BrokerError, AttributeError):
+    """
+    The resource in the broker doesn't have the attribute, an AttributeError
+    so hasattr and getattr with a default work on a ResourceProxy
+    """
+    pass
+
+class BrokerResourceManager(object):
+    """
+    Stands in for pyvisa.ResourceManager, everything goes through the broker
+    """
+
+    def __init__(self, Address=None, Timeout=60.0, Shared=False):
+        """
+        Parameters
+        ----------
+        Address : str, optional
+            Where the broker is listening. The default is DefaultAddress().
+        Timeout : float, optional
+            Seconds to wait for the broker to answer before giving up, longer than
+            any VISA timeout so it only goes off if the broker is stuck. The default is 60.
+        Shared : bool, optional
+            The one ResourceManager() gives to everything in this process,
+            close() leaves it connected. The default is False.
+        """
+        self.Address = Address or DefaultAddress()
+        self.Timeout = Timeout
+        self.Shared = Shared
+        self.Closed = False
+        #threads in this process share the connection
+        self._Lock = threading.Lock()
+        self.Conn = None
+        self._Connect()
+
+    def _Connect(self):
+        self.Conn = Client(self.Address, _Family(self.Address), authkey=AuthKey)
+
+    def _Drop(self):
+        """
+        Forget the connection, e.g. after a timeout the late answer would be taken
+        as the answer to the next request. The next request connects again.
+        """
+        try:
+            self.Conn.close()
+        except Exception:
+            pass
+        self.Conn = None
+
+    def Request(self, Op, Address=None, Args=()):
+        with self._Lock:
+            if self.Closed:
+                raise BrokerError("Connection to the instrument broker is closed")
+            try:
+                if self.Conn is None:
+                    self._Connect()
+                self.Conn.send((Op, Address, Args))
+                if not self.Conn.poll(self.Timeout):
+                    self._Drop()
+                    raise BrokerError("No answer from the instrument broker after {} s ({} {})".format(self.Timeout, Op, Address))
+                Reply = self.Conn.recv()
+            except (EOFError, OSError) as e:
+                self._Drop()
+                raise BrokerError("Lost the connection to the instrument broker: {}".format(e))
+        if Reply[0] == "ok":
+            return Reply[1]
+        if Reply[0] == "exc":
+            #raised in the broker, e.g. pyvisa.errors.VisaIOError
+            raise Reply[1]
+        if Reply[1] == "AttributeError":
+            raise BrokerAttributeError("{}: {}".format(Reply[1], Reply[2]))
+        raise BrokerError("{}: {}".format(Reply[1], Reply[2]))
+
+    def open_resource(self, resource_name, **kwargs):
+        #driver name as well, for when the broker is simulating
+        return ResourceProxy(self, self.Request("open", resource_name, (kwargs, CallingDriver())))
+
+    def list_resources(self, *args):
+        return self.Request("list", None, args)
+
+    def Sessions(self):
+        """
+        Addresses the broker has open
+        """
+        return self.Request("sessions")
+
+    def close(self):
+        """
+        Disconnects from the broker, the sessions stay open.
+        Does nothing on the shared one, the utility tabs close it after every use.
+        """
+        if self.Shared:
+            return
+        self.Disconnect()
+
+    def Disconnect(self):
+        """
+        Really disconnects, even the shared one
+        """
+        with self._Lock:
+            self.Closed = True
+            if self.Conn is not None:
+                self._Drop()
+
+    def __del__(self):
+        try:
+            self.Disconnect()
+        except Exception:
+            pass
+
+class ResourceProxy(object):
+    """
+    Stands in for a pyvisa resource (the self.VI of a driver)
+    """
+    #same as pyvisa's, drivers use them as self.VI.LF
+    CR = "\r"
+    LF = "\n"
+    CRLF = "\r\n"
+
+    def __init__(self, rm, resource_name):
+        object.__setattr__(self, "_rm", rm)
+        object.__setattr__(self, "resource_name", resource_name)
+
+    def write(self, message, *args):
+        return self._rm.Request("write", self.resource_name, (message,) + args)
+
+    def query(self, message, *args):
+        return self._rm.Request("query", self.resource_name, (message,) + args)
+
+    def read(self, *args):
+        return self._rm.Request("read", self.resource_name, args)
+
+    def clear(self):
+        return self._rm.Request("clear", self.resource_name)
+
+    def close(self):
+        """
+        Nothing to do, the broker keeps the session open
+        """
+        pass
+
+    def reset_session(self):
+        """
+        Makes the broker really close the session, e.g. after the instrument was power cycled
+        """
+        return self._rm.Request("reset", self.resource_name)
+
+    def __getattr__(self, Name):
+        #only called for things not defined here: timeout, write_termination...
+        #an AttributeError if the resource doesn't have it either
+        if Name.startswith("_"):
+            raise AttributeError(Name)
+        return self._rm.Request("get", self.resource_name, Name)
+
+    def __setattr__(self, Name, Value):
+        #private ones stay here, the rest must already exist on the resource
+        if Name.startswith("_"):
+            object.__setattr__(self, Name, Value)
+        else:
+            self._rm.Request("set", self.resource_name, (Name, Value))
+
+    def call(self, Method, *args, **kwargs):
+        """
+        Any other resource method, e.g. call("read_raw")
+        """
+        return self._rm.Request("call", self.resource_name, (Method, args, kwargs))
+
+
+def Ping(Address=None):
+    """
+    True if a broker is answering at the address
+    """
+    try:
+        rm = BrokerResourceManager(Address, Timeout=5.0)
+    except Exception:
+        return False
+    try:
+        return rm.Request("ping")
+    except Exception:
+        return False
+    finally:
+        rm.close()
+
+def StartBroker(Address=None, Timeout=10.0):
+    """
+    Makes sure a broker is running, starting one if needed, and sets AUTOLAB_BROKER
+    so processes started from this one use it.
+
+    Returns
+    -------
+    The broker Process if one was started here, None if one was already running
+    (or it couldn't be started, check Ping())
+    """
+    Address = Address or DefaultAddress()
+    os.environ[AddressVar] = Address
+    if Ping(Address):
+        return None
+
+    Proc = mp.Process(target=RunBroker, args=(Address,), daemon=True)
+    Proc.start()
+    End = time.time() + Timeout
+    while time.time() < End:
+        if Ping(Address):
+            return Proc
+        if not Proc.is_alive():
+            break
+        time.sleep(0.05)
+    print("Instrument broker did not start")
+    return Proc
+
+def StopBroker(Address=None):
+    """
+    Asks the broker to close all its sessions and exit
+    """
+    try:
+        rm = BrokerResourceManager(Address)
+        rm.Request("shutdown")
+        rm.close()
+    except Exception as e:
+        print(e)
+        print("Failed to stop the instrument broker")
+
+#One broker connection per process (and address), so the tabs don't connect on every click
+_SharedRM = {}
+_SharedLock = threading.Lock()
+
+def SharedBroker():
+    """
+    The BrokerResourceManager shared by everything in this process,
+    connected the first time it's needed. None if the broker isn't running.
+    """
+    #the pid is in the key so a forked worker doesn't use its parent's connection
+    Key = (os.getpid(), DefaultAddress())
+    with _SharedLock:
+        rm = _SharedRM.get(Key)
+        if rm is not None and rm.Conn is None:
+            #dropped after an error, see if the broker is still there
+            try:
+                with rm._Lock:
+                    if rm.Conn is None:
+                        rm._Connect()
+            except Exception:
+                rm = None
+                del _SharedRM[Key]
+        if rm is None:
+            try:
+                rm = BrokerResourceManager(Key[1], Shared=True)
+            except Exception:
+                return None
+            _SharedRM[Key] = rm
+        return rm
+
+def ResourceManager(UseBroker=True):
+    """
+    Use instead of pyvisa.ResourceManager().
+    Goes through the broker if it's running, otherwise a normal pyvisa ResourceManager
+    (or the simulated instruments if AUTOLAB_SIMULATE is set).
+    The broker one is shared by the whole process, closing it does nothing.
+    """
+    if UseBroker:
+        rm = SharedBroker()
+        if rm is not None:
+            return rm
+    if Simulating():
+        return SharedSimulation()
+    import pyvisa
+    return pyvisa.ResourceManager()
+
+
+if __name__ == "__main__":
+    #run a broker on its own so the sessions stay open between AutoLab runs
+    RunBroker(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -11,6 +11,8 @@ from tkinter import ttk
 import numpy as np
 
 import pyvisa
+from .VisaResources import ListResources
+from .InstrumentBroker import ResourceManager
 import Instruments as Inst
 
 class Util(tk.Frame):
@@ -29,9 +31,7 @@ class Util(tk.Frame):
         #want this populated with valid VISA adresses but dont want a dangling resource manager,
         #SO
         if len(addresses)==0:
-            rm=pyvisa.ResourceManager()
-            addresses=rm.list_resources()
-            rm.close()
+            addresses=ListResources()#cached, scanned once in the background
         #if addresses are supplied through the script which calls this util, we dont need to poll all instruments
         #speeds up loading the util
         
@@ -90,7 +90,7 @@ class Util(tk.Frame):
         
     def configure(self,rm=None):
         if rm==None:
-            rm=pyvisa.ResourceManager()
+            rm=ResourceManager()
         address=self.Com.get()
         try:
             try:
@@ -158,7 +158,7 @@ class Util(tk.Frame):
         Dictionary of metadata
 
         """
-        rm=pyvisa.ResourceManager()
+        rm=ResourceManager()
         address=self.Com.get()
         try:
             address=int(address)
@@ -12,6 +12,8 @@ from tkinter import font as tkFont
 import numpy as np
 
 import pyvisa
+from .VisaResources import ListResources
+from .InstrumentBroker import ResourceManager
 import Instruments as Inst
 
 class Util(tk.Frame):
@@ -47,9 +49,7 @@ class Util(tk.Frame):
         ###COMMS GUI Element###
 
         if len(addresses)==0:
-            rm=pyvisa.ResourceManager()
-            addresses=rm.list_resources()
-            rm.close()
+            addresses=ListResources()#cached, scanned once in the background
 
         #if addresses are supplied through the script which calls this util, we dont need to poll all instruments
         #speeds up loading the util
@@ -103,7 +103,7 @@ class Util(tk.Frame):
         
         
     def configure(self):
-        rm=pyvisa.ResourceManager()
+        rm=ResourceManager()
         address=self.Com.get()
         is_default=[True,True,True,True,True,True]
         #list of bools to see if we need to send values to the Lockin
@@ -224,7 +224,7 @@ class Util(tk.Frame):
         Returns:
             Metadata: A Dictionary of Metadata values.
         """
-        rm=pyvisa.ResourceManager()
+        rm=ResourceManager()
         address=self.Com.get()
         Lockin_Manager=Inst.SR530(rm,address)
         #create Metadata Dictionary
@@ -14,6 +14,8 @@ from tkinter import font as tkFont
 import numpy as np
 
 import pyvisa
+from .VisaResources import ListResources
+from .InstrumentBroker import ResourceManager
 import Instruments as Inst
 
 class Util(tk.Frame):
@@ -53,9 +55,7 @@ class Util(tk.Frame):
         #want this populated with valid VISA adresses but dont want a dangling resource manager,
         #SO
         if len(addresses)==0:
-            rm=pyvisa.ResourceManager()
-            addresses=rm.list_resources()
-            rm.close()
+            addresses=ListResources()#cached, scanned once in the background
         #if addresses are supplied through the script which calls this util, we dont need to poll all instruments
         #speeds up loading the util
         
@@ -105,7 +105,7 @@ class Util(tk.Frame):
     #For now, if a default option is selected in the drop-downs or no offset is entered, 
     #The values will not be altered. BUT, Adrresses need to be set or everything Falls over.
     def configure(self):
-        rm=pyvisa.ResourceManager()
+        rm=ResourceManager()
         address=self.Com.get()
         is_default=[True,True,True,True,True]
         #list of bools to see if we need to send values to the Lockin
@@ -211,7 +211,7 @@ class Util(tk.Frame):
         Returns:
             Metadata: A Dictionary of Metadata values.
         """
-        rm=pyvisa.ResourceManager()
+        rm=ResourceManager()
         address=self.Com.get()
         Lockin_Manager=Inst.DSP_7265(rm,address)
         #create Metadata Dictionary
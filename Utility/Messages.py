@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Messages sent from a worker process to the GUI down the Pipe.
+
+Every message is a (Tag, Payload) tuple where Tag is one byte saying what it is,
+so the GUI can look up what to do with it straight away rather than checking the
+type of everything inside it. Workers should use the Send functions:
+
+    Utility.SendHeader(Pipe, Header_List)      column names/header text for the save file
+    Utility.SendRow(Pipe, [X,Y1,Y2])           one point
+    Utility.SendBlock(Pipe, np.array(Rows))    lots of points at once
+    Utility.SendControl(Pipe, "Esc")           Esc, ClearGraph, NewFile...
+    Utility.SendError(Pipe, e)                 an exception, shown as a pop-up
+    Utility.SendCheckpoint(Pipe, i)            sweep point i is done, for resuming after a crash
+
+Old workers that send raw lists and strings still work, Unpack works out the tag
+for them the old way.
+
+Resuming: when a run is resumed from a checkpoint the GUI sends ("RESUME", i) down
+the pipe before the worker starts. Workers with a standard loop over sweep points do
+
+    First = Utility.ResumeIndex(Pipe)
+    for i, x in enumerate(Points):
+        if i < First:
+            continue
+        ...measure and send x...
+        Utility.SendCheckpoint(Pipe, i)
+
+and carry on from the point after the last one that was saved.
+"""
+
+MSG_ROW = b"R"
+MSG_BLOCK = b"B"
+MSG_HEADER = b"H"
+MSG_CONTROL = b"C"
+MSG_ERROR = b"E"
+MSG_CHECKPOINT = b"K"
+
+MSG_TAGS = (MSG_ROW, MSG_BLOCK, MSG_HEADER, MSG_CONTROL, MSG_ERROR, MSG_CHECKPOINT)
+
+#Commands the GUI understands (NewFile has the file suffix after it),
+#anything else that's a string is header text
+MSG_COMMANDS = ("Esc", "ClearGraph", "NewFile")
+
+def SendRow(Pipe, Row):
+    """
+    Send a single point, list of numbers in the same order as Header_List
+    """
+    Pipe.send((MSG_ROW, Row))
+
+def SendBlock(Pipe, Block):
+    """
+    Send many points at once, 2D numpy array or list of rows
+    """
+    Pipe.send((MSG_BLOCK, Block))
+
+def SendHeader(Pipe, Header):
+    """
+    Send column names (list of str) or a line of header text to go in the save file
+    """
+    Pipe.send((MSG_HEADER, Header))
+
+def SendControl(Pipe, Command):
+    """
+    Send a command to the GUI: "Esc", "ClearGraph" or "NewFile <suffix>"
+    """
+    Pipe.send((MSG_CONTROL, Command))
+
+def SendError(Pipe, Error):
+    """
+    Send an exception to be shown to the user
+    """
+    Pipe.send((MSG_ERROR, Error))
+
+def SendCheckpoint(Pipe, Index):
+    """
+    Tell the GUI everything up to and including sweep point Index has been sent
+    """
+    Pipe.send((MSG_CHECKPOINT, Index))
+
+def ResumeIndex(Pipe):
+    """
+    Called by the worker before its loop. Returns the first sweep point to do,
+    0 unless the run is being resumed from a checkpoint.
+    """
+    if not Pipe.poll():
+        return 0
+    Message = Pipe.recv()
+    if type(Message) is tuple and len(Message) == 2 and Message[0] == "RESUME":
+        print("Resuming from point {}".format(Message[1]+1))
+        return Message[1] + 1
+    print("Unexpected message before starting, ignored: {}".format(Message))
+    return 0
+
+def Unpack(Message):
+    """
+    Split a message from the pipe into its tag and payload
+
+    Returns
+    -------
+    (Tag, Payload). Tag is None if it's something that can't be worked out.
+    """
+    if type(Message) is tuple and len(Message) == 2 and Message[0] in MSG_TAGS:
+        return Message
+
+    #Old style message, work out what it is from what's in it
+    if isinstance(Message, Exception):
+        return (MSG_ERROR, Message)
+
+    if isinstance(Message, str):
+        if Message.startswith(MSG_COMMANDS):
+            return (MSG_CONTROL, Message)
+        return (MSG_HEADER, Message)
+
+    try:
+        Types = [type(ob) for ob in Message]
+    except TypeError:
+        #a single number or something else that isn't a list
+        return (None, Message)
+
+    if str in Types:
+        return (MSG_HEADER, Message)
+
+    #2D array or a list of rows (lists, tuples or arrays)
+    if getattr(Message, "ndim", 1) == 2 or (len(Message) > 0 and hasattr(Message[0], "__len__")):
+        return (MSG_BLOCK, Message)
+
+    return (MSG_ROW, Message)
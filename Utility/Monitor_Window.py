@@ -32,6 +32,7 @@ from matplotlib import ticker
 #Instrument Packages
 import Instruments as Inst
 import pyvisa
+from .VisaResources import ListResources
 #Export/String Packages
 import time
 import re
@@ -40,6 +41,7 @@ import csv
 from os import path, mkdir
 #scripts to handle the temperature controllers themselves. 
 from .Temperature_Controllers import*
+from .Messages import *
 #Previously just "Controller". Needed as different controllers return things differently.
 #NB: COMMAND SYNTAX MUST BE THE SAME
 
@@ -75,9 +77,7 @@ class Mon_Win(tk.Frame):
         Control_Frame=tk.Frame(self.Window)#,height = 330,width = 480)
         Control_Frame.grid(column=0, row=1,sticky="E"+"W",columnspan=2)
         if len(addresses)==0:
-            rm=pyvisa.ResourceManager()
-            addresses=rm.list_resources()
-            rm.close()
+            addresses=ListResources()#cached, scanned once in the background
         #if addresses are supplied through the script which calls this util, we dont need to poll all instruments
         #speeds up loading the util
         self.Model=tk.StringVar(Control_Frame,self.TC_Model[model])
@@ -369,35 +369,36 @@ class Mon_Win(tk.Frame):
             
             #get data from pipe
             Data = self.Temp_PipeRecv.recv()
-            #If data isn't a string append to rawdata list
-            try:
-                types=[type(ob) for ob in Data]
-                if str not in types:
-                    #if they're all numbers then its temperature data, otherwise its a command
-                    self.current_Data=Data
-                
-                elif Data=="Esc":
+            #Tagged message, see Messages.py. Old style lists/strings still get a tag
+            Tag, Payload = Unpack(Data)
+            
+            if Tag == MSG_ROW:
+                #temperature data, log it
+                self.current_Data=Payload
+                self.Temperature_Log_Writer.writerow([*self.current_Data])
+            
+            elif Tag == MSG_CONTROL:
+                if Payload=="Esc":
                     #self.MeasureFinished()
                     break
-                elif Data=="ClearGraph":
+                elif Payload=="ClearGraph":
                     self.Temperature_Data = []
-                    continue
-            except TypeError as e:
-                #if Data is a single int/float, the types generator wont work. 
-                #because strings are lists of string characters, strings work fine.
-                #But Exceptions are not indexable. If the Handler throws an exception we can catch it here to MakeToast
+            
+            elif Tag == MSG_ERROR:
+                #If the Handler throws an exception we can catch it here to MakeToast
                 self.IsMonitoring=False#if we receive an exception, stop monitoring
-                if isinstance(Data,Exception):
-                    #Should catch any Exception object (Any exception, TypeError, AttrError...)
-                    #that is sent down the pipe.
-                    #Allows for Error-finding that won't get swamped by other statements on the Terminal.
-                    tk.messagebox.showerror("Found an error!",Data.args[0])
-                    
-                
-                else:
-                    print(e)
-                    
-            self.Temperature_Log_Writer.writerow([*self.current_Data])
+                #Allows for Error-finding that won't get swamped by other statements on the Terminal.
+                tk.messagebox.showerror("Found an error!",str(Payload))
+            
+            elif Tag in (MSG_HEADER, MSG_BLOCK, MSG_CHECKPOINT):
+                #nothing to do, e.g. a reply to a get command that wasn't read straight away
+                pass
+            
+            else:
+                #not sure what this is, same as an error
+                self.IsMonitoring=False
+                print("Received Data that couldnt be understood")
+                print(Payload)
     
     
     def UpdateWindow(self):
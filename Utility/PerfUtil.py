@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Performance tab, shows where the time goes in each UpdateWindow of the main window:
+reading the pipe/ring, writing the save file (on the FileWriter thread), updating
+the graph data and drawing the canvas. Also how far behind reading is and how
+many points a second are coming in.
+
+Can also log every update to a CSV file to compare worker scripts.
+When "Show timings" is off Record returns straight away, so it can be left in.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+import csv
+import time
+import os
+
+class Util(tk.Frame):
+    """
+    Per update timing of the main window
+    """
+
+    #Name of utility so it can e refer to later as part of a dictionary
+    name = "Performance"
+
+    #Columns of the CSV log
+    LogHeaders = ["Time","Read_ms","Write_ms","Graph_ms","Draw_ms","Ring_rows","Pipe_waiting","Points_per_s","Refresh_ms"]
+
+    def __init__(self, master, parent=None):
+
+        super().__init__(master)
+
+        PerfUtilTab = tk.Frame(master)
+        master.add(PerfUtilTab,text="Performance")
+
+        OptionFrame = tk.Frame(PerfUtilTab)
+        OptionFrame.pack(side=tk.LEFT)
+
+        self.EnableOption = tk.IntVar()
+        self.EnableOption.set(False)
+        EnableCheck = tk.Checkbutton(OptionFrame,text="Show timings",variable=self.EnableOption)
+        EnableCheck.pack(anchor="w")
+
+        self.LogOption = tk.IntVar()
+        self.LogOption.set(False)
+        LogCheck = tk.Checkbutton(OptionFrame,text="Log to CSV",variable=self.LogOption)
+        LogCheck.pack(anchor="w")
+
+        self.LogPath = tk.StringVar(OptionFrame,"PerfLog.csv")
+        LogPathEntry = tk.Entry(OptionFrame,textvariable=self.LogPath,width = 20)
+        LogPathEntry.pack(anchor="w")
+
+        #Readouts
+        ReadoutFrame = tk.Frame(PerfUtilTab)
+        ReadoutFrame.pack(side=tk.LEFT,padx=10)
+
+        self.Readouts = {}
+        Names = [("Read","Read (ms)"),("Write","File write (ms)"),("Graph","Graph update (ms)"),("Draw","Draw (ms)"),
+                 ("Backlog","Backlog"),("Rate","Points/s"),("Refresh","Refresh (ms)")]
+        for i, (Key, Text) in enumerate(Names):
+            Label = tk.Label(ReadoutFrame,text=Text)
+            Label.grid(column=2*(i//4), row=i%4, sticky="w")
+            Readout = tk.Label(ReadoutFrame,text="-",width=10,anchor="w")
+            Readout.grid(column=2*(i//4)+1, row=i%4, sticky="w")
+            self.Readouts[Key] = Readout
+
+        self.LogFile = None
+        self.LogWriter = None
+        self.Last_T = None
+        self.LastWriteTime = 0.0
+        self.Rate = 0.0
+
+    def Record(self, ReadTime, GraphTime, DrawTime, FileWriter, Ring, PipeWaiting, nNewPoints, Refresh):
+        """
+        Called at the end of every UpdateWindow with what happened in it
+
+        Parameters
+        ----------
+        ReadTime, GraphTime, DrawTime : float
+            Seconds spent in GetData, GraphUtil.UpdateGraph and drawing the canvas
+        FileWriter : Utility.FileWriter or None
+            The current save file writer, its WriteTime is the total time spent writing
+        Ring : Utility.SharedRing or None
+            The shared memory ring if the worker uses one, for the number of rows waiting
+        PipeWaiting : bool
+            There was still something in the pipe after GetData
+        nNewPoints : int
+            Number of points added to the graph data
+        Refresh : int
+            ms until the next update
+        """
+        if not self.EnableOption.get():
+            self.CloseLog()
+            self.Last_T = None
+            return
+
+        Now = time.time()
+
+        #File writing happens on another thread, show how much it did since last time
+        try:
+            WriteTotal = FileWriter.WriteTime
+        except AttributeError:
+            WriteTotal = 0.0
+        if WriteTotal < self.LastWriteTime:
+            #new save file
+            self.LastWriteTime = 0.0
+        WriteTime = WriteTotal - self.LastWriteTime
+        self.LastWriteTime = WriteTotal
+
+        try:
+            RingRows = len(Ring) if Ring is not None else 0
+        except Exception:
+            RingRows = 0
+
+        #smoothed so it doesn't jump around with the uneven refresh
+        if self.Last_T is not None and Now > self.Last_T:
+            self.Rate = 0.8*self.Rate + 0.2*max(nNewPoints,0)/(Now-self.Last_T)
+        self.Last_T = Now
+
+        Row = [Now, 1000*ReadTime, 1000*WriteTime, 1000*GraphTime, 1000*DrawTime,
+               RingRows, int(bool(PipeWaiting)), self.Rate, Refresh]
+
+        self.Readouts["Read"]["text"] = "{:.1f}".format(Row[1])
+        self.Readouts["Write"]["text"] = "{:.1f}".format(Row[2])
+        self.Readouts["Graph"]["text"] = "{:.1f}".format(Row[3])
+        self.Readouts["Draw"]["text"] = "{:.1f}".format(Row[4])
+        if PipeWaiting:
+            self.Readouts["Backlog"]["text"] = "{} + pipe".format(RingRows)
+        else:
+            self.Readouts["Backlog"]["text"] = str(RingRows)
+        self.Readouts["Rate"]["text"] = "{:.0f}".format(self.Rate)
+        self.Readouts["Refresh"]["text"] = str(Refresh)
+
+        if self.LogOption.get():
+            self.WriteLog(Row)
+        else:
+            self.CloseLog()
+
+    def WriteLog(self, Row):
+        """
+        Adds a row to the CSV log, opening it first if needed
+        """
+        if self.LogWriter is None:
+            try:
+                Path = self.LogPath.get()
+                NewFile = not os.path.isfile(Path)
+                self.LogFile = open(Path,"a",newline="")
+                self.LogWriter = csv.writer(self.LogFile)
+                if NewFile:
+                    self.LogWriter.writerow(self.LogHeaders)
+            except Exception as e:
+                print(e)
+                print("Couldn't open performance log, logging turned off")
+                self.LogOption.set(False)
+                self.CloseLog()
+                return
+
+        self.LogWriter.writerow(Row)
+
+    def CloseLog(self):
+        if self.LogFile is not None:
+            self.LogFile.close()
+        self.LogFile = None
+        self.LogWriter = None
+
+
+if __name__=="__main__":
+
+    #Make and start main window
+    root = tk.Tk()
+    UtilTabs = ttk.Notebook(root,height = 100,width = 595)
+    UtilTabs.pack()
+    UtilTab = Util(UtilTabs)
+    UtilTab.mainloop()
@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""
+Catalog of every save file made, kept in a local SQLite database so runs can be
+found by what they were rather than by grepping thousands of test_###.txt files.
+
+CreateFile registers each run (path, start time, worker script, Header_List, header
+text and the Export_MetaData dictionaries) and CloseSaveFile fills in the end time,
+number of rows and the min/max of each column.
+
+Metadata is flattened into (Key, Value) rows, nested dictionaries get their keys
+joined with dots. Values that are numbers are also kept as numbers so ranges can be
+searched. Everything searched on is indexed, so finding runs is a few ms however
+many files there are:
+
+    Catalog = Utility.RunCatalog("RunCatalog.db")
+    Catalog.Find(Worker="Field_Sweep", MetaData={"Temperature":(1.4,1.6), "Sensitivity":"1 mV"})
+
+Files made before the catalog existed can be added with IndexFiles, which reads
+them in a process pool:
+
+    Utility.IndexFiles("D:\\\\Data", "RunCatalog.db")
+"""
+
+import os
+import json
+import time
+import sqlite3
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .DataLoader import LoadData, OpenText, ReadHeader
+from .Compression import SplitCompression
+
+#Save files IndexFiles looks at, .json are the sidecars of .npy files.
+#Compressed text files are looked at if the extension before the compression is one of these
+IndexExtensions = (".txt", ".dat", ".csv", ".npy", ".h5", ".hdf5")
+
+Tables = ["""CREATE TABLE IF NOT EXISTS Runs (
+                RunID INTEGER PRIMARY KEY,
+                Path TEXT UNIQUE,
+                Start REAL,
+                End REAL,
+                Worker TEXT,
+                Header TEXT,
+                Columns TEXT,
+                Rows INTEGER,
+                FileSize INTEGER,
+                Modified REAL)""",
+          """CREATE TABLE IF NOT EXISTS ColumnStats (
+                RunID INTEGER,
+                Col INTEGER,
+                Name TEXT,
+                Min REAL,
+                Max REAL)""",
+          """CREATE TABLE IF NOT EXISTS MetaData (
+                RunID INTEGER,
+                Key TEXT,
+                Value TEXT,
+                Number REAL)""",
+          "CREATE INDEX IF NOT EXISTS RunsWorker ON Runs (Worker, Start)",
+          "CREATE INDEX IF NOT EXISTS RunsStart ON Runs (Start)",
+          "CREATE INDEX IF NOT EXISTS StatsRun ON ColumnStats (RunID)",
+          "CREATE INDEX IF NOT EXISTS StatsName ON ColumnStats (Name, Min, Max)",
+          "CREATE INDEX IF NOT EXISTS MetaRun ON MetaData (RunID)",
+          "CREATE INDEX IF NOT EXISTS MetaValue ON MetaData (Key, Value)",
+          "CREATE INDEX IF NOT EXISTS MetaNumber ON MetaData (Key, Number)"]
+
+
+def FlattenMetaData(MetaData, Prefix=""):
+    """
+    Turns the Export_MetaData dictionaries into a list of (Key, Value, Number).
+    Number is the value as a float if it is one, otherwise None.
+
+    Parameters
+    ----------
+    MetaData : list of dict, or dict
+    Prefix : str, optional
+        Put in front of every key, used for nested dictionaries.
+    """
+    Flat = []
+    if isinstance(MetaData, dict):
+        Items = MetaData.items()
+    elif isinstance(MetaData, (list, tuple)) and Prefix == "":
+        #list of dictionaries from each tab, their keys aren't prefixed
+        for Dict in MetaData:
+            Flat.extend(FlattenMetaData(Dict, Prefix))
+        return Flat
+    else:
+        Items = enumerate(MetaData)
+
+    for Key, Value in Items:
+        Key = Prefix + str(Key)
+        if isinstance(Value, (dict, list, tuple)):
+            Flat.extend(FlattenMetaData(Value, Key + "."))
+            continue
+        try:
+            Number = float(Value)
+        except (ValueError, TypeError):
+            Number = None
+        Flat.append((Key, str(Value), Number))
+    return Flat
+
+
+class RunCatalog(object):
+    """
+    SQLite catalog of save files
+    """
+
+    def __init__(self, Path="RunCatalog.db"):
+        """
+        Parameters
+        ----------
+        Path : str, optional
+            Database file, made if it doesn't exist. The default is RunCatalog.db
+            in the current folder.
+        """
+        self.Path = Path
+        #Several AutoLab windows (or the indexer) can have it open at once, wait for each other
+        self.Connection = sqlite3.connect(Path, timeout=10)
+        self.Connection.execute("PRAGMA journal_mode=WAL")
+        with self.Connection:
+            for Table in Tables:
+                self.Connection.execute(Table)
+
+    def Close(self):
+        self.Connection.close()
+
+    ######## Adding runs ########
+
+    def StartRun(self, Path, Worker=None, Header="", Columns=None, MetaData=None, Start=None):
+        """
+        Adds a new run, replacing anything already catalogued with the same path
+
+        Parameters
+        ----------
+        Path : str
+            Save file
+        Worker : str, optional
+            Name of the worker script
+        Header : str, optional
+            Header text written at the top of the file
+        Columns : list of str, optional
+            Header_List of the worker
+        MetaData : list of dict, optional
+            Export_MetaData dictionaries
+        Start : float, optional
+            time.time() the run started. The default is now.
+
+        Returns
+        -------
+        RunID to pass to FinishRun
+        """
+        if Start is None:
+            Start = time.time()
+        Path = os.path.abspath(Path)
+        if Columns is not None:
+            Columns = json.dumps([str(Column) for Column in Columns])
+
+        with self.Connection:
+            self.RemoveRun(Path)
+            Cursor = self.Connection.execute("INSERT INTO Runs (Path, Start, Worker, Header, Columns) VALUES (?,?,?,?,?)",
+                                             (Path, Start, Worker, Header, Columns))
+            RunID = Cursor.lastrowid
+            if MetaData is not None:
+                self.Connection.executemany("INSERT INTO MetaData (RunID, Key, Value, Number) VALUES (?,?,?,?)",
+                                            [(RunID,) + Row for Row in FlattenMetaData(MetaData)])
+        return RunID
+
+    def FinishRun(self, RunID, Rows=None, ColumnMin=None, ColumnMax=None, End=None, Columns=None):
+        """
+        Fills in the end of a run
+
+        Parameters
+        ----------
+        RunID : int
+            From StartRun
+        Rows : int, optional
+            Number of rows of data saved
+        ColumnMin, ColumnMax : list of float, optional
+            Range of each column
+        End : float, optional
+            time.time() the run finished. The default is now.
+        Columns : list of str, optional
+            Column names if they weren't known at the start
+        """
+        if End is None:
+            End = time.time()
+
+        with self.Connection:
+            Row = self.Connection.execute("SELECT Path, Columns FROM Runs WHERE RunID=?", (RunID,)).fetchone()
+            if Row is None:
+                return
+            Path, Names = Row
+            if Columns is not None:
+                Names = [str(Column) for Column in Columns]
+                self.Connection.execute("UPDATE Runs SET Columns=? WHERE RunID=?", (json.dumps(Names), RunID))
+            elif Names is not None:
+                Names = json.loads(Names)
+
+            try:
+                FileSize = os.path.getsize(Path)
+                Modified = os.path.getmtime(Path)
+            except OSError:
+                FileSize = None
+                Modified = None
+
+            self.Connection.execute("UPDATE Runs SET End=?, Rows=?, FileSize=?, Modified=? WHERE RunID=?",
+                                    (End, Rows, FileSize, Modified, RunID))
+
+            self.Connection.execute("DELETE FROM ColumnStats WHERE RunID=?", (RunID,))
+            if ColumnMin is not None and ColumnMax is not None:
+                Stats = []
+                for i, (Min, Max) in enumerate(zip(ColumnMin, ColumnMax)):
+                    Name = Names[i] if Names is not None and i < len(Names) else None
+                    #NaN (all NaN column) goes in as NULL
+                    Min = float(Min) if Min == Min else None
+                    Max = float(Max) if Max == Max else None
+                    Stats.append((RunID, i, Name, Min, Max))
+                self.Connection.executemany("INSERT INTO ColumnStats (RunID, Col, Name, Min, Max) VALUES (?,?,?,?,?)", Stats)
+
+    def AddRun(self, Info):
+        """
+        Adds a whole run in one go, e.g. from FileInfo
+
+        Parameters
+        ----------
+        Info : dict
+            Keys are the arguments of StartRun and FinishRun
+        """
+        RunID = self.StartRun(Info["Path"], Info.get("Worker"), Info.get("Header",""), Info.get("Columns"),
+                              Info.get("MetaData"), Info.get("Start"))
+        self.FinishRun(RunID, Info.get("Rows"), Info.get("ColumnMin"), Info.get("ColumnMax"), Info.get("End"))
+        return RunID
+
+    def RemoveRun(self, Path):
+        """
+        Removes a file from the catalog
+        """
+        Path = os.path.abspath(Path)
+        with self.Connection:
+            for (RunID,) in self.Connection.execute("SELECT RunID FROM Runs WHERE Path=?", (Path,)).fetchall():
+                self.Connection.execute("DELETE FROM MetaData WHERE RunID=?", (RunID,))
+                self.Connection.execute("DELETE FROM ColumnStats WHERE RunID=?", (RunID,))
+                self.Connection.execute("DELETE FROM Runs WHERE RunID=?", (RunID,))
+
+    def IsCurrent(self, Path):
+        """
+        True if the file is catalogued and hasn't changed since
+        """
+        Row = self.Connection.execute("SELECT FileSize, Modified FROM Runs WHERE Path=?",
+                                      (os.path.abspath(Path),)).fetchone()
+        if Row is None:
+            return False
+        try:
+            return Row[0] == os.path.getsize(Path) and Row[1] == os.path.getmtime(Path)
+        except OSError:
+            return False
+
+    ######## Finding runs ########
+
+    def Find(self, Worker=None, After=None, Before=None, MetaData=None, ColumnRanges=None, Path=None):
+        """
+        Finds runs matching everything given
+
+        Parameters
+        ----------
+        Worker : str, optional
+            Worker script name
+        After, Before : float, optional
+            Runs that started between these times (time.time() values)
+        MetaData : dict, optional
+            Key: value pairs. A (low, high) tuple matches numbers in that range,
+            anything else has to match exactly (compared as text).
+        ColumnRanges : dict, optional
+            Column name: (low, high), runs where the column covers some of that range
+        Path : str, optional
+            SQL LIKE pattern for the path, e.g. "%Sample3%"
+
+        Returns
+        -------
+        List of dicts, one per run, newest first
+        """
+        Where = []
+        Params = []
+        if Worker is not None:
+            Where.append("Worker=?")
+            Params.append(Worker)
+        if After is not None:
+            Where.append("Start>=?")
+            Params.append(After)
+        if Before is not None:
+            Where.append("Start<=?")
+            Params.append(Before)
+        if Path is not None:
+            Where.append("Path LIKE ?")
+            Params.append(Path)
+
+        for Key, Value in (MetaData or {}).items():
+            if isinstance(Value, tuple):
+                Where.append("RunID IN (SELECT RunID FROM MetaData WHERE Key=? AND Number BETWEEN ? AND ?)")
+                Params.extend([Key, Value[0], Value[1]])
+            else:
+                Where.append("RunID IN (SELECT RunID FROM MetaData WHERE Key=? AND Value=?)")
+                Params.extend([Key, str(Value)])
+
+        for Name, (Low, High) in (ColumnRanges or {}).items():
+            Where.append("RunID IN (SELECT RunID FROM ColumnStats WHERE Name=? AND Max>=? AND Min<=?)")
+            Params.extend([Name, Low, High])
+
+        SQL = "SELECT RunID, Path, Start, End, Worker, Header, Columns, Rows FROM Runs"
+        if len(Where) > 0:
+            SQL += " WHERE " + " AND ".join(Where)
+        SQL += " ORDER BY Start DESC"
+
+        Runs = []
+        for RunID, Path, Start, End, Worker, Header, Columns, Rows in self.Connection.execute(SQL, Params):
+            Runs.append({"RunID":RunID, "Path":Path, "Start":Start, "End":End, "Worker":Worker,
+                         "Header":Header, "Columns":json.loads(Columns) if Columns else None, "Rows":Rows})
+        return Runs
+
+    def RunMetaData(self, RunID):
+        """
+        Flattened metadata of a run as a dict
+        """
+        return {Key:Value for Key, Value in
+                self.Connection.execute("SELECT Key, Value FROM MetaData WHERE RunID=?", (RunID,))}
+
+    def Query(self, SQL, Params=()):
+        """
+        Runs any SQL on the catalog, for searches Find can't do
+        """
+        return self.Connection.execute(SQL, Params).fetchall()
+
+
+######## Indexing existing files ########
+
+def FileInfo(Path):
+    """
+    Reads a save file and returns what the catalog needs as a dict for RunCatalog.AddRun,
+    None if it isn't an AutoLab save file. Separate function so it can be run in a process pool.
+    """
+    try:
+        if os.path.splitext(SplitCompression(Path)[0])[1].lower() in (".txt", ".dat", ".csv"):
+            #Only text files with the header markers are AutoLab files
+            with OpenText(Path) as File:
+                ReadHeader(File)
+                if File.tell() == 0:
+                    return None
+
+        #already in a process of its own
+        Data = LoadData(Path, Processes=1)
+
+        Info = {"Path":Path,
+                "Header":Data.Header,
+                "Columns":Data.Columns,
+                "MetaData":Data.MetaData,
+                "Rows":len(Data),
+                #no record of when it really started, creation time is the closest
+                "Start":os.path.getctime(Path),
+                "End":os.path.getmtime(Path)}
+
+        if len(Data) > 0:
+            Block = Data.Data[:]
+            #skipping NaNs like FileWriter.AddStats
+            Info["ColumnMin"] = np.fmin.reduce(Block, axis=0).tolist()
+            Info["ColumnMax"] = np.fmax.reduce(Block, axis=0).tolist()
+
+        #h5py keeps the file open otherwise
+        File = getattr(Data.Data, "file", None)
+        if File is not None:
+            File.close()
+
+        return Info
+    except Exception as e:
+        print(e)
+        print("Couldn't index {}".format(Path))
+        return None
+
+
+def IndexFiles(Folder, CatalogPath="RunCatalog.db", Processes=None, Recursive=True, Reindex=False):
+    """
+    Adds existing save files to the catalog. Files are read in a process pool,
+    only this process writes to the database.
+
+    Parameters
+    ----------
+    Folder : str or list of str
+        Folder to look through, or a list of files
+    CatalogPath : str, optional
+        Database file. The default is RunCatalog.db.
+    Processes : int, optional
+        Size of the process pool. The default (None) uses all the cores.
+    Recursive : bool, optional
+        Look in sub folders too. The default is True.
+    Reindex : bool, optional
+        Re-read files that are already catalogued and haven't changed. The default is False.
+
+    Returns
+    -------
+    Number of files added
+    """
+    if isinstance(Folder, str):
+        Paths = []
+        if Recursive:
+            for Root, Dirs, Files in os.walk(Folder):
+                Paths.extend(os.path.join(Root, File) for File in Files)
+        else:
+            Paths = [os.path.join(Folder, File) for File in os.listdir(Folder)]
+    else:
+        Paths = list(Folder)
+
+    Paths = [Path for Path in Paths if os.path.splitext(SplitCompression(Path)[0])[1].lower() in IndexExtensions]
+
+    Catalog = RunCatalog(CatalogPath)
+    if not Reindex:
+        Paths = [Path for Path in Paths if not Catalog.IsCurrent(Path)]
+
+    if Processes is None:
+        Processes = os.cpu_count() or 1
+
+    Added = 0
+    try:
+        if Processes > 1 and len(Paths) > 1:
+            with ProcessPoolExecutor(Processes) as Pool:
+                Infos = Pool.map(FileInfo, Paths, chunksize=8)
+                for Info in Infos:
+                    if Info is not None:
+                        Catalog.AddRun(Info)
+                        Added += 1
+        else:
+            for Path in Paths:
+                Info = FileInfo(Path)
+                if Info is not None:
+                    Catalog.AddRun(Info)
+                    Added += 1
+    finally:
+        Catalog.Close()
+
+    print("Indexed {} files".format(Added))
+    return Added
@@ -13,6 +13,7 @@ from tkinter import font as tkFont
 import time
 
 import pyvisa
+from .InstrumentBroker import ResourceManager
 import Instruments as Inst
 
 class Util(tk.Frame):
@@ -112,7 +113,7 @@ class Util(tk.Frame):
         
         gbip = int(self.gbipEntry.get())
         
-        rm = pyvisa.ResourceManager()
+        rm = ResourceManager()
         
         try:
             self.Mag = Inst.SMS120C(rm,gbip)
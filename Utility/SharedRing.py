@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Shared memory ring buffer for sending numeric data from the measurement worker
+to the GUI without pickling every point through the Pipe.
+
+The ring has a fixed number of columns (normally len(Header_List)) and is made
+by the Handler in Start(), then passed to the Worker process as an argument.
+The Worker writes rows in, the GUI reads them out using the head/tail counters
+at the start of the shared block. Only one writer and one reader!
+The Pipe is still used for everything that isn't data (Esc, NewFile, STOP, errors...)
+
+Layout of the shared block:
+    [head, tail] as int64, then Capacity*nColumns float64 values row by row
+head and tail only ever count up, the position in the ring is count % Capacity
+"""
+
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+class SharedRing(object):
+    """
+    Single producer/single consumer ring buffer in shared memory
+    """
+
+    def __init__(self, nColumns, Capacity=65536, Name=None):
+        """
+        Parameters
+        ----------
+        nColumns : int
+            Number of values in each row
+        Capacity : int, optional
+            Number of rows the ring can hold before the writer has to wait.
+            The default is 65536.
+        Name : str, optional
+            Name of an existing block to attach to. If None a new block is made
+            and this object owns it (and will unlink it on Close).
+        """
+        self.nColumns = int(nColumns)
+        self.Capacity = int(Capacity)
+
+        Size = 16 + 8*self.nColumns*self.Capacity
+
+        if Name is None:
+            self._Shm = shared_memory.SharedMemory(create=True, size=Size)
+            self.Owner = True
+        else:
+            self._Shm = self._Attach(Name)
+            self.Owner = False
+
+        self._MapArrays()
+
+        if self.Owner:
+            self._Index[:] = 0
+
+    @staticmethod
+    def _Attach(Name):
+        """
+        Attach to an existing block without the resource tracker unlinking it
+        when this process exits (only the owner should do that)
+        """
+        try:
+            return shared_memory.SharedMemory(name=Name, track=False)
+        except TypeError:
+            #track keyword is only in python 3.13+. Worker processes share the
+            #GUI's resource tracker so the owner's unlink still cleans up.
+            return shared_memory.SharedMemory(name=Name)
+
+    def _MapArrays(self):
+        self._Index = np.ndarray((2,), dtype=np.int64, buffer=self._Shm.buf, offset=0)
+        self._Data = np.ndarray((self.Capacity, self.nColumns), dtype=np.float64,
+                                buffer=self._Shm.buf, offset=16)
+
+    def __getstate__(self):
+        #Only the name goes to the worker process, it attaches to the same memory
+        return {"Name":self._Shm.name, "nColumns":self.nColumns, "Capacity":self.Capacity}
+
+    def __setstate__(self, State):
+        self.nColumns = State["nColumns"]
+        self.Capacity = State["Capacity"]
+        self._Shm = self._Attach(State["Name"])
+        self.Owner = False
+        self._MapArrays()
+
+    def __len__(self):
+        """
+        Number of rows waiting to be read
+        """
+        return int(self._Index[0] - self._Index[1])
+
+    ######## Writer side (Worker) ########
+
+    def Write(self, Row, Timeout=None):
+        """
+        Write a single row, see WriteBlock
+        """
+        return self.WriteBlock([Row], Timeout)
+
+    def WriteBlock(self, Block, Timeout=None):
+        """
+        Write rows into the ring. Waits for the GUI to make room if the ring is full.
+
+        Parameters
+        ----------
+        Block : Array-like
+            Rows to write, shape (number of rows, nColumns)
+        Timeout : float, optional
+            Seconds to wait for room before giving up. None waits forever.
+
+        Returns
+        -------
+        True if all the rows were written, False if it timed out
+        """
+        Block = np.asarray(Block, dtype=np.float64).reshape(-1, self.nColumns)
+        nRows = Block.shape[0]
+        Written = 0
+        Start_T = time.time()
+
+        while Written < nRows:
+            Head = int(self._Index[0])
+            Free = self.Capacity - (Head - int(self._Index[1]))
+
+            if Free == 0:
+                if Timeout is not None and time.time()-Start_T > Timeout:
+                    return False
+                time.sleep(0.001)
+                continue
+
+            Pos = Head % self.Capacity
+            N = min(Free, nRows-Written, self.Capacity-Pos)
+            self._Data[Pos:Pos+N] = Block[Written:Written+N]
+            #Only move the head once the rows are in so the reader never sees half a row
+            self._Index[0] = Head + N
+            Written += N
+
+        return True
+
+    ######## Reader side (GUI) ########
+
+    def Peek(self, MaxRows=None):
+        """
+        Returns a view of the oldest unread rows, up to the end of the ring.
+        Call Consume with the number of rows used once done with them.
+        """
+        Tail = int(self._Index[1])
+        N = int(self._Index[0]) - Tail
+        Pos = Tail % self.Capacity
+        N = min(N, self.Capacity-Pos)
+        if MaxRows is not None:
+            N = min(N, MaxRows)
+        return self._Data[Pos:Pos+N]
+
+    def Consume(self, N):
+        """
+        Mark N rows as read so the writer can reuse the space
+        """
+        self._Index[1] = int(self._Index[1]) + N
+
+    def Close(self):
+        """
+        Detach from the shared memory, and free it if this is the owner
+        """
+        #views have to go before the memory can be closed
+        self._Index = None
+        self._Data = None
+        try:
+            self._Shm.close()
+            if self.Owner:
+                self._Shm.unlink()
+        except Exception as e:
+            print(e)
+            print("Failed to close shared memory ring")
@@ -0,0 +1,1213 @@
+# -*- coding: utf-8 -*-
+"""
+Simulated instruments, so drivers, workers and the GUI can be run without any hardware.
+
+SimResourceManager stands in for pyvisa.ResourceManager. Its open_resource gives a
+SimResource in place of the pyvisa resource (the self.VI of a driver), which passes
+every write to a model of the instrument and gives back the model's answers on read.
+The models keep their own state (setpoints, ranges, field, temperatures...) and answer
+the same commands the drivers send, in the format the drivers parse:
+
+    Lockins:        SR830, SR860, DSP_7265, DSP_7280
+    Sources:        Keithley2400, Keithley6221 (+2182), Keithley236, Arroyo4300
+    Temperature:    lakeshore350, lakeshore218, OI_503, OI_ILM
+    Magnets:        IPS120, SMS120C
+
+Each command takes about as long as it would on the bus (Latency, seconds per write
+and per reply, can be set per command) and readings have gaussian noise (Noise,
+fraction of the reading). Instruments on the same GPIB board take turns like they
+would on the real bus.
+
+Which model is behind an address is found from the driver that opens it, so nothing
+has to be set up: Inst.SR830(rm, 8) gets an SR830 on GPIB0::8::INSTR. It can also be
+given, e.g. for a script talking to rm directly:
+
+    rm = Utility.SimResourceManager({"GPIB0::8::INSTR":"SR830"}, Latency={"query":0.01})
+
+To run AutoLab (or AutoLabHeadless) simulated set AUTOLAB_SIMULATE to 1, or to a json
+file of SimResourceManager arguments, {"Instruments": {...}, "Latency": {...}, "Noise": 0.001}.
+Utility.ResourceManager() then gives the simulation (through the broker if it's running).
+"""
+
+import os
+import re
+import json
+import time
+import inspect
+import threading
+from collections import deque
+
+import numpy as np
+
+#Environment variable that turns the simulation on, 1 or the path of a json config
+SimulateVar = "AUTOLAB_SIMULATE"
+
+class SimulatedVisaError(Exception):
+    """
+    Raised where pyvisa would raise a VisaIOError, e.g. reading when nothing was sent back
+    """
+    pass
+
+TimeoutMessage = "VI_ERROR_TMO (-1073807339): Timeout expired before operation completed."
+
+
+# =============================================================================
+# BASE MODELS
+# =============================================================================
+
+class SimModel(object):
+    """
+    A simulated instrument. Subclasses add the commands in Commands,
+    [(regex, method name)], tried in order against each command. The method
+    gets the regex groups and returns the reply (None for no reply).
+    """
+    Commands = []
+    IDN = "AutoLab,Simulated,0,1.0"
+    #added to replies when the driver hasn't set a read termination
+    Termination = "\n"
+    #seconds per write and per reply, and per command (the longest matching start of the command)
+    Latency = {"write":0.001, "query":0.003}
+    #gaussian noise on readings as a fraction of the reading
+    Noise = 1e-3
+
+    def __init__(self, Latency=None, Noise=None, Seed=None):
+        self.Latency = dict(self.Latency)
+        if Latency is not None:
+            self.Latency.update(Latency)
+        if Noise is not None:
+            self.Noise = Noise
+        self.Rng = np.random.default_rng(Seed)
+        self.Lock = threading.Lock()
+        self.Start_T = time.time()
+        self.Last_T = self.Start_T
+        #commands the model didn't understand, to find what's missing
+        self.Unknown = []
+        self._Compiled = [(re.compile(Pattern, re.IGNORECASE), Method) for Pattern, Method in self.Commands]
+
+    def CommandLatency(self, Command, Kind):
+        """
+        Seconds the command takes, Kind is "write" or "query"
+        """
+        Best = None
+        for Key in self.Latency:
+            if Key not in ("write", "query") and Command.upper().startswith(Key.upper()):
+                if Best is None or len(Key) > len(Best):
+                    Best = Key
+        if Best is not None:
+            return self.Latency[Best]
+        return self.Latency.get(Kind, 0)
+
+    def Noisy(self, Value, Floor=0.0):
+        """
+        Value with noise, Floor is the noise when the value is 0
+        """
+        return Value + self.Rng.normal(0, self.Noise*abs(Value) + Floor)
+
+    def Update(self, Now):
+        """
+        Moves things on in time (ramps, temperatures...). Called before every command.
+        """
+        pass
+
+    def Split(self, Message):
+        """
+        One message can hold several commands
+        """
+        return [Command.strip() for Command in Message.split(";") if Command.strip() != ""]
+
+    def Handle(self, Message):
+        """
+        Does the commands in a message
+
+        Returns
+        -------
+        List of replies
+        """
+        Replies = []
+        with self.Lock:
+            Now = time.time()
+            self.Update(Now)
+            self.Last_T = Now
+            for Command in self.Split(Message):
+                if Command == "*IDN?":
+                    Replies.append(self.IDN)
+                    continue
+                for Pattern, Method in self._Compiled:
+                    Match = Pattern.fullmatch(Command)
+                    if Match is not None:
+                        Reply = getattr(self, Method)(*Match.groups())
+                        if isinstance(Reply, list):
+                            #several lines, read one at a time
+                            Replies.extend(Reply)
+                        elif Reply is not None:
+                            Replies.append(Reply)
+                        break
+                else:
+                    self.Unknown.append(Command)
+        return Replies
+
+    def Talk(self):
+        """
+        Reply when read with nothing waiting, None for a timeout
+        """
+        return None
+
+def _Number(Value, Default=0.0):
+    try:
+        return float(Value)
+    except (TypeError, ValueError):
+        return Default
+
+
+class SimThermal(object):
+    """
+    Sensor temperatures relaxing towards a target, with ramped setpoints
+    """
+    def __init__(self, Temps, Tau=20.0):
+        self.Temps = list(Temps)
+        self.Base = list(Temps)
+        self.Tau = Tau
+
+    def Step(self, dt, Targets):
+        Factor = 1 - np.exp(-dt/self.Tau)
+        for i, Target in enumerate(Targets):
+            if Target is None:
+                Target = self.Base[i]
+            self.Temps[i] += (Target - self.Temps[i])*Factor
+
+def _Ramp(Value, Target, Rate, dt):
+    """
+    Moves Value towards Target at Rate per second
+    """
+    Step = abs(Rate)*dt
+    if abs(Target - Value) <= Step:
+        return Target
+    return Value + np.sign(Target - Value)*Step
+
+
+# =============================================================================
+# LOCKINS
+# =============================================================================
+
+class SimSR830(SimModel):
+    """
+    Stanford SR830. NAME<args> sets, NAME?<args> queries.
+    The signal is Gain*SLVL at -PHAS degrees.
+    """
+    IDN = "Stanford_Research_Systems,SR830,s/n00001,ver1.07"
+    Latency = {"write":0.001, "query":0.003}
+    Commands = [(r"OUTP\?\s*(\d)", "Output"),
+                (r"SNAP\?\s*([\d,\s]+)", "Snap"),
+                (r"OAUX\?\s*(\d)", "AuxIn"),
+                (r"AUXV\?\s*(\d)", "GetAuxOut"),
+                (r"AUXV\s*(\d)\s*,\s*(\S+)", "SetAuxOut"),
+                (r"OEXP\?\s*(\d)", "GetOffExp"),
+                (r"OEXP\s*(\d)\s*,\s*([^,]+),\s*(\d)", "SetOffExp"),
+                (r"([A-Z]{4})\?\s*", "Get"),
+                (r"([A-Z]{4})\s*(\S*)", "Set")]
+    #OUTP?/SNAP? codes
+    Outputs = {1:"X", 2:"Y", 3:"R", 4:"T"}
+    Gain = 1e-4
+
+    def __init__(self, **kwargs):
+        SimModel.__init__(self, **kwargs)
+        self.Settings = {"OFLT":"8", "SENS":"22", "SCAL":"5", "RMOD":"1", "OFSL":"1", "PHAS":"0.0",
+                         "SLVL":"1.000", "FREQ":"1000.0", "FMOD":"1", "HARM":"1", "RSLP":"0",
+                         "ISRC":"0", "IGND":"0", "ICPL":"0", "ILIN":"0", "SYNC":"0", "OUTX":"1", "OVRM":"1"}
+        self.AuxOut = {1:0.0, 2:0.0, 3:0.0, 4:0.0}
+        self.OffExp = {1:(0.0, 0), 2:(0.0, 0)}
+
+    def Signal(self):
+        R = self.Gain*_Number(self.Settings["SLVL"])
+        Theta = -_Number(self.Settings["PHAS"])
+        X = self.Noisy(R*np.cos(np.radians(Theta)), 1e-9)
+        Y = self.Noisy(R*np.sin(np.radians(Theta)), 1e-9)
+        return {"X":X, "Y":Y, "R":np.hypot(X, Y), "T":np.degrees(np.arctan2(Y, X))}
+
+    def Output(self, Code):
+        return "{:.6e}".format(self.Signal()[self.Outputs[int(Code)]])
+
+    def Snap(self, Codes):
+        Signal = self.Signal()
+        return ",".join("{:.6e}".format(Signal[self.Outputs[int(Code)]]) for Code in Codes.split(","))
+
+    def AuxIn(self, Port):
+        return "{:.4f}".format(self.Noisy(0.0, 1e-3))
+
+    def GetAuxOut(self, Port):
+        return "{:.3f}".format(self.AuxOut[int(Port)])
+
+    def SetAuxOut(self, Port, Voltage):
+        self.AuxOut[int(Port)] = _Number(Voltage)
+
+    def GetOffExp(self, Channel):
+        return "{:.2f},{}".format(*self.OffExp[int(Channel)])
+
+    def SetOffExp(self, Channel, Offset, Expand):
+        self.OffExp[int(Channel)] = (_Number(Offset), int(Expand))
+
+    def Get(self, Name):
+        return self.Settings.get(Name.upper(), "0")
+
+    def Set(self, Name, Value):
+        self.Settings[Name.upper()] = Value
+
+class SimSR860(SimSR830):
+    """
+    Stanford SR860, same as the SR830 apart from the output codes and SCAL
+    """
+    IDN = "Stanford_Research_Systems,SR860,004000,V1.47"
+    Outputs = {0:"X", 1:"Y", 2:"R", 3:"T"}
+
+
+class SimDSP_7265(SimModel):
+    """
+    Signal Recovery 7265. NAME args sets, NAME queries the code, NAME. queries the value.
+    """
+    IDN = "7265"
+    Termination = "\r"
+    Latency = {"write":0.002, "query":0.005}
+    Commands = [(r"XY\.", "XY"),
+                (r"(X|Y|MAG|PHA)\.", "Output"),
+                (r"FRQ\.", "Freq"),
+                (r"REFP\.", "RefPhase"),
+                (r"TC\.", "TCValue"),
+                (r"SEN\.", "SenValue"),
+                (r"(XOF|YOF)\s*(\d)?\s*(-?\d+)?", "Offset"),
+                (r"([A-Z]+)", "Get"),
+                (r"([A-Z]+)\s+(.+)", "Set")]
+    Gain = 1e-4
+
+    def __init__(self, **kwargs):
+        SimModel.__init__(self, **kwargs)
+        self.Settings = {"TC":"10", "SEN":"21", "IMODE":"0", "VMODE":"1", "FET":"1", "CP":"0",
+                         "FLOAT":"0", "AUTOMATIC":"1", "ACGAIN":"0", "SLOPE":"1", "SYNC":"0",
+                         "OF":"1000000", "OA":"1000000", "REFP":"0", "REMOTE":"0", "EX":"0"}
+        self.Offsets = {"XOF":[0, 0], "YOF":[0, 0]}
+
+    def TCSeconds(self, Code):
+        #10 us to 640 us doubling, then 5 ms, 10 ms, 20 ms, 50 ms...
+        if Code < 7:
+            return 10e-6*2**Code
+        return [5e-3, 10e-3, 20e-3][(Code-7) % 3]*10**((Code-7)//3)
+
+    def Signal(self):
+        R = self.Gain*_Number(self.Settings["OA"])*1e-6
+        Theta = -_Number(self.Settings["REFP"])*1e-3
+        X = self.Noisy(R*np.cos(np.radians(Theta)), 1e-9)
+        Y = self.Noisy(R*np.sin(np.radians(Theta)), 1e-9)
+        return {"X":X, "Y":Y, "MAG":np.hypot(X, Y), "PHA":np.degrees(np.arctan2(Y, X))}
+
+    def XY(self):
+        Signal = self.Signal()
+        return "{:.4E},{:.4E}".format(Signal["X"], Signal["Y"])
+
+    def Output(self, Name):
+        return "{:.4E}".format(self.Signal()[Name.upper()])
+
+    def Freq(self):
+        return "{:.4E}".format(_Number(self.Settings["OF"])*1e-3)
+
+    def RefPhase(self):
+        return "{:.3f}".format(_Number(self.Settings["REFP"])*1e-3)
+
+    def TCValue(self):
+        return "{:.4E}".format(self.TCSeconds(int(self.Settings["TC"])))
+
+    def SenValue(self):
+        Code = int(self.Settings["SEN"])
+        Value = [2e-9, 5e-9, 10e-9][(Code-1) % 3]*10**((Code-1)//3)
+        #current modes are in amps
+        Value *= {"0":1, "1":1e-6, "2":1e-8}.get(self.Settings["IMODE"], 1)
+        return "{:.4E}".format(Value)
+
+    def Offset(self, Name, Enable, Value):
+        Name = Name.upper()
+        if Enable is None:
+            return "{},{}".format(*self.Offsets[Name])
+        self.Offsets[Name][0] = int(Enable)
+        if Value is not None:
+            self.Offsets[Name][1] = int(Value)
+        return None
+
+    def Get(self, Name):
+        return self.Settings.get(Name.upper(), "0")
+
+    def Set(self, Name, Value):
+        self.Settings[Name.upper()] = Value.strip()
+
+class SimDSP_7280(SimDSP_7265):
+    """
+    Signal Recovery 7280, only the time constants are different
+    """
+    IDN = "7280"
+
+    def TCSeconds(self, Code):
+        #1 us, 2 us, 5 us, 10 us...
+        return [1e-6, 2e-6, 5e-6][Code % 3]*10**(Code//3)
+
+
+# =============================================================================
+# SOURCES
+# =============================================================================
+
+class SimSCPI(SimModel):
+    """
+    SCPI instruments. NAME value sets, NAME? gives it back. Leading : and case don't matter.
+    Subclasses put their special commands before these.
+    """
+    Commands = [(r":?([A-Z0-9:*]+)\?", "Get"),
+                (r":?([A-Z0-9:*]+)\s*(.*)", "Set")]
+
+    def __init__(self, **kwargs):
+        SimModel.__init__(self, **kwargs)
+        self.Settings = {}
+
+    def Get(self, Name):
+        return self.Settings.get(Name.upper(), "0")
+
+    def Set(self, Name, Value):
+        self.Settings[Name.upper()] = Value.strip()
+
+class SimKeithley2400(SimSCPI):
+    """
+    Keithley 2400 sourcemeter sourcing onto a Load ohm resistor.
+    Readings are voltage,current,resistance,time,status.
+    """
+    IDN = "KEITHLEY INSTRUMENTS INC.,MODEL 2400,0000001,C30"
+    Latency = {"write":0.002, "query":0.004, ":READ?":0.025, ":MEAS":0.025}
+    Commands = [(r"\*RST", "Reset"),
+                (r":?OUTP(?:UT)?\s+(ON|OFF|1|0)", "SetOutput"),
+                (r":?SOUR(?:CE)?:VOLT(?:AGE)?(?::LEV(?:EL)?)?\s+(\S+)", "SetVoltage"),
+                (r":?SOUR(?:CE)?:CURR(?:ENT)?(?::LEV(?:EL)?)?\s+(\S+)", "SetCurrent"),
+                (r":?SOUR(?:CE)?:FUNC(?:TION)?:?\s+(\S+)", "SetFunction"),
+                (r":?(READ|MEAS:\S*)\?", "Reading")] + SimSCPI.Commands
+    Load = 1e3
+
+    def __init__(self, **kwargs):
+        SimSCPI.__init__(self, **kwargs)
+        self.Reset()
+
+    def Reset(self):
+        self.Settings = {}
+        self.Output = False
+        self.Function = "VOLT"
+        self.Source = 0.0
+        self.Reset_T = time.time()
+
+    def SetOutput(self, State):
+        self.Output = State.upper() in ("ON", "1")
+
+    def SetVoltage(self, Value):
+        self.Source = _Number(Value)
+
+    def SetCurrent(self, Value):
+        self.Source = _Number(Value)
+
+    def SetFunction(self, Function):
+        self.Function = "CURR" if Function.upper().startswith("CURR") else "VOLT"
+
+    def Reading(self, Name):
+        if not self.Output:
+            V, I = 0.0, 0.0
+        elif self.Function == "VOLT":
+            V = self.Source
+            I = V/self.Load
+        else:
+            I = self.Source
+            V = I*self.Load
+        V = self.Noisy(V, 1e-6)
+        I = self.Noisy(I, 1e-11)
+        R = V/I if I != 0 else 9.91e37
+        return "{:+.6E},{:+.6E},{:+.6E},{:+.6E},{:+.6E}".format(V, I, R, time.time()-self.Reset_T, 0)
+
+class SimKeithley6221(SimSCPI):
+    """
+    Keithley 6221 current source with a 2182 nanovoltmeter on its serial port,
+    measuring a Load ohm sample. A list sweep takes SweepStep seconds per point.
+    """
+    IDN = "KEITHLEY INSTRUMENTS INC.,MODEL 6221,0000001,D02"
+    Latency = {"write":0.002, "query":0.004}
+    Commands = [(r"\*STB\?", "Status"),
+                (r"\*CLS", "ClearStatus"),
+                (r"SOUR:LIST:CURR:POIN\?", "ListPoints"),
+                (r"SOUR:LIST:CURR\?", "GetList"),
+                (r"SOUR:LIST:CURR\s*(.+)", "SetList"),
+                (r"INIT(?::IMM)?", "StartSweep"),
+                (r"STAT:OPER:EVEN\?", "OperationEvent"),
+                (r"SYST:COMM:SER:SEND\s+(.+)", "SerialSend"),
+                (r"SYST:COMM:SER:ENT\?", "SerialEnter")] + SimSCPI.Commands
+    Load = 100.0
+    SweepStep = 0.01
+
+    def __init__(self, **kwargs):
+        SimSCPI.__init__(self, **kwargs)
+        self.List = []
+        self.Sweep_T = None
+        self.Event = 0
+        #the 2182's settings and the answer waiting on its serial port
+        self.Nanovolt = {"VOLT:RANG":"10"}
+        self.SerialReply = ""
+
+    def Status(self):
+        return "0"
+
+    def ClearStatus(self):
+        self.Event = 0
+
+    def ListPoints(self):
+        return str(len(self.List))
+
+    def GetList(self):
+        return ",".join("{:.6E}".format(Current) for Current in self.List)
+
+    def SetList(self, Currents):
+        self.List = [_Number(Current) for Current in Currents.split(",")]
+
+    def StartSweep(self):
+        self.Sweep_T = time.time()
+        self.Event = 0
+
+    def OperationEvent(self):
+        if self.Sweep_T is not None and time.time()-self.Sweep_T >= self.SweepStep*len(self.List):
+            #sweep done
+            self.Event = 1066
+            self.Sweep_T = None
+        Event = self.Event
+        self.Event = 0
+        return str(Event)
+
+    def SerialSend(self, Command):
+        Command = Command.strip().upper()
+        if Command == "TRAC:DATA?":
+            self.SerialReply = ",".join("{:+.9E}".format(self.Noisy(Current*self.Load, 1e-9)) for Current in self.List)
+        elif Command.endswith("?"):
+            self.SerialReply = self.Nanovolt.get(Command[:-1], "0")
+        else:
+            Parts = Command.split(None, 1)
+            self.Nanovolt[Parts[0]] = Parts[1] if len(Parts) > 1 else ""
+
+    def SerialEnter(self):
+        Reply = self.SerialReply
+        self.SerialReply = ""
+        return Reply
+
+class SimKeithley236(SimModel):
+    """
+    Keithley 236 SMU (Keithley device dependent commands, ending in X) sourcing onto a Load ohm resistor.
+    Like the real one it gives a reading whenever it's read.
+    """
+    IDN = "236A07"
+    Latency = {"write":0.003, "query":0.02}
+    Commands = [(r"F(\d),(\d)", "SetFunction"),
+                (r"B([^,]+),(\d+),(\d+)", "SetBias"),
+                (r"N(\d)", "SetOperate"),
+                (r"G(\d+),(\d),(\d)", "SetFormat"),
+                (r"Q(\d),(.+)", "SweepPoint"),
+                (r"H0", "Trigger"),
+                (r"([A-Z])(.*)", "Set")]
+    Load = 1e6
+
+    def __init__(self, **kwargs):
+        SimModel.__init__(self, **kwargs)
+        self.Settings = {}
+        self.SourceCurrent = False
+        self.Sweep = False
+        self.Bias = 0.0
+        self.Operate = False
+        self.Items = 4
+        self.Prefix = True
+        self.Lines = 0
+        self.SweepList = []
+
+    def Split(self, Message):
+        #commands are run by X
+        return [Command.strip() for Command in Message.strip().split("X") if Command.strip() != ""]
+
+    def SetFunction(self, Source, Function):
+        self.SourceCurrent = Source == "1"
+        self.Sweep = Function == "1"
+
+    def SetBias(self, Bias, Range, Delay):
+        self.Bias = _Number(Bias)
+
+    def SetOperate(self, On):
+        self.Operate = On == "1"
+
+    def SetFormat(self, Items, Form, Lines):
+        self.Items = int(Items)
+        self.Prefix = Form in ("0", "1")
+        self.Lines = int(Lines)
+        #the driver reads the reading straight after
+        return self.Reading()
+
+    def SweepPoint(self, Kind, Args):
+        Level = _Number(Args.split(",")[0])
+        if Kind == "0":
+            self.SweepList = [Level]
+        else:
+            self.SweepList.append(Level)
+
+    def Trigger(self):
+        pass
+
+    def Set(self, Letter, Args):
+        self.Settings[Letter] = Args
+
+    def Point(self, Source):
+        Measure = Source*self.Load if self.SourceCurrent else Source/self.Load
+        Measure = self.Noisy(Measure, 1e-12) if self.Operate else 0.0
+        Parts = []
+        SourceUnit, MeasureUnit = ("I", "V") if self.SourceCurrent else ("V", "I")
+        if self.Items & 1:
+            Parts.append(("NSDC" + SourceUnit if self.Prefix else "") + "{:+.4E}".format(Source))
+        if self.Items & 2:
+            Parts.append(("NDDC" if self.Prefix else "") + "{:+.4E}".format(0.0))
+        if self.Items & 4:
+            Parts.append(("NMDC" + MeasureUnit if self.Prefix else "") + "{:+.4E}".format(Measure))
+        if self.Items & 8:
+            Parts.append(("NTDC" if self.Prefix else "") + "{:+.4E}".format(time.time()-self.Start_T))
+        return ",".join(Parts)
+
+    def Reading(self):
+        if self.Sweep and self.Lines == 2 and len(self.SweepList) > 0:
+            return ",".join(self.Point(Level) for Level in self.SweepList)
+        return self.Point(self.Bias)
+
+    def Talk(self):
+        return self.Reading()
+
+class SimArroyo4300(SimSCPI):
+    """
+    Arroyo 4300 laser driver, the laser is a diode with a 1.5 V drop
+    """
+    IDN = "Arroyo,4300,00001,1.0"
+    Termination = "\r\n"
+    Latency = {"write":0.005, "query":0.01}
+    Commands = [(r"LAS:LDV\?", "Voltage"),
+                (r"LAS:DC\?", "DutyCycle"),
+                (r"LAS:PWF?\s+(\S+)", "SetPulseWidth")] + SimSCPI.Commands
+
+    def __init__(self, **kwargs):
+        SimSCPI.__init__(self, **kwargs)
+        self.Settings = {"LAS:OUT":"0", "LAS:LDI":"0", "LAS:F":"1000", "LAS:PW":"0.1", "TERM":"0"}
+
+    def Voltage(self):
+        if self.Settings["LAS:OUT"] != "1":
+            return "0.000"
+        return "{:.3f}".format(self.Noisy(1.5 + 0.01*_Number(self.Settings["LAS:LDI"])))
+
+    def DutyCycle(self):
+        return "{:.3f}".format(_Number(self.Settings["LAS:PW"])*_Number(self.Settings["LAS:F"])/10)
+
+    def SetPulseWidth(self, ms):
+        self.Settings["LAS:PW"] = ms
+
+
+# =============================================================================
+# TEMPERATURE
+# =============================================================================
+
+class SimLakeshore350(SimModel):
+    """
+    Lakeshore 350. Inputs A-D, heater loops 1-4 (OUTMODE sets which input a loop controls).
+    An input heads for its loop's setpoint while the heater range is on, otherwise back to its base temperature.
+    """
+    IDN = "LSCI,MODEL350,SIM0001,1.0"
+    Latency = {"write":0.01, "query":0.015}
+    Commands = [(r"([KS])RDG\?\s*([A-D0])", "Reading"),
+                (r"SETP\?\s*(\d)", "GetSetpoint"),
+                (r"SETP\s*(\d)\s*,\s*(\S+)", "SetSetpoint"),
+                (r"RAMPST\?\s*(\d)", "RampStatus"),
+                (r"(OUTMODE|RANGE|PID|RAMP|MOUT)\?\s*(\d)", "Get"),
+                (r"(OUTMODE|RANGE|PID|RAMP|MOUT)\s*(\d)\s*,\s*(.+)", "Set")]
+    Inputs = "ABCD"
+    Base = [4.2, 4.2, 3.0, 3.0]
+
+    def __init__(self, **kwargs):
+        SimModel.__init__(self, **kwargs)
+        self.Thermal = SimThermal(self.Base)
+        self.Setpoint = {N:self.Base[0] for N in range(1, 5)}
+        #setpoint the ramp has got to
+        self.Ramped = dict(self.Setpoint)
+        self.Loops = {"OUTMODE":{1:"1,1,0", 2:"1,2,0", 3:"0,3,0", 4:"0,4,0"},
+                      "RANGE":{1:"0", 2:"0", 3:"0", 4:"0"},
+                      "PID":{N:"+0050.0,+0020.0,+000.0" for N in range(1, 5)},
+                      "RAMP":{N:"0,+10.000" for N in range(1, 5)},
+                      "MOUT":{N:"+000.00" for N in range(1, 5)}}
+
+    def Update(self, Now):
+        dt = Now - self.Last_T
+        Targets = [None]*len(self.Inputs)
+        for N in range(1, 5):
+            Ramp = self.Loops["RAMP"][N].split(",")
+            if Ramp[0].strip() == "1":
+                self.Ramped[N] = _Ramp(self.Ramped[N], self.Setpoint[N], _Number(Ramp[1])/60, dt)
+            else:
+                self.Ramped[N] = self.Setpoint[N]
+            Mode, Input = self.Loops["OUTMODE"][N].split(",")[:2]
+            if Mode.strip() != "0" and self.Loops["RANGE"][N] != "0" and 1 <= int(Input) <= len(self.Inputs):
+                Targets[int(Input)-1] = self.Ramped[N]
+        self.Thermal.Step(dt, Targets)
+
+    def Sensor(self, i):
+        #rough cernox curve
+        return 1000/max(self.Thermal.Temps[i], 0.1)**0.5
+
+    def Reading(self, Kind, Input):
+        if Input == "0":
+            Channels = range(len(self.Inputs))
+        else:
+            Channels = [self.Inputs.index(Input.upper())]
+        Values = []
+        for i in Channels:
+            Value = self.Thermal.Temps[i] if Kind.upper() == "K" else self.Sensor(i)
+            Values.append("{:+.4f}".format(self.Noisy(Value)))
+        return ",".join(Values)
+
+    def GetSetpoint(self, N):
+        return "{:+.4f}".format(self.Setpoint[int(N)])
+
+    def SetSetpoint(self, N, Value):
+        self.Setpoint[int(N)] = _Number(Value)
+
+    def RampStatus(self, N):
+        N = int(N)
+        return "1" if self.Ramped[N] != self.Setpoint[N] else "0"
+
+    def Get(self, Name, N):
+        return self.Loops[Name.upper()][int(N)]
+
+    def Set(self, Name, N, Value):
+        self.Loops[Name.upper()][int(N)] = ",".join(Part.strip() for Part in Value.split(","))
+
+class SimLakeshore218(SimModel):
+    """
+    Lakeshore 218 monitor, 8 inputs sitting at their base temperatures
+    """
+    IDN = "LSCI,MODEL218S,SIM0001,1.0"
+    Latency = {"write":0.03, "query":0.05}
+    Commands = [(r"([KS])RDG\?\s*(\d)", "Reading"),
+                (r"ALARM\?\s*(\d)", "GetAlarm"),
+                (r"ALARM\s*(\d)\s*,\s*(.+)", "SetAlarm"),
+                (r"ALARMST\?\s*(\d)", "AlarmStatus"),
+                (r"DATETIME\?", "DateTime"),
+                (r"IEEE\?", "GetIEEE"),
+                (r"IEEE\s*(.+)", "SetIEEE"),
+                (r"QOPC\?", "OperationComplete"),
+                (r"(ALMRST|QCLS|QOPC|DATETIME.*)", "Ignore")]
+    Base = [4.2, 4.5, 3.2, 45.0, 60.0, 290.0, 290.0, 290.0]
+
+    def __init__(self, **kwargs):
+        SimModel.__init__(self, **kwargs)
+        self.Alarms = {N:"0,1,+310.00,+000.00,+005.00,0" for N in range(1, 9)}
+        self.IEEE = "0,0,12"
+
+    def Reading(self, Kind, N):
+        Channels = range(8) if N == "0" else [int(N)-1]
+        Values = []
+        for i in Channels:
+            Value = self.Base[i] if Kind.upper() == "K" else 1000/self.Base[i]**0.5
+            Values.append("{:+.4f}".format(self.Noisy(Value)))
+        return ",".join(Values)
+
+    def GetAlarm(self, N):
+        return self.Alarms[int(N)]
+
+    def SetAlarm(self, N, Settings):
+        self.Alarms[int(N)] = ",".join(Part.strip() for Part in Settings.split(","))
+
+    def AlarmStatus(self, N):
+        return "0,0"
+
+    def DateTime(self):
+        return time.strftime("%m,%d,%y,%H,%M,%S")
+
+    def GetIEEE(self):
+        return self.IEEE
+
+    def SetIEEE(self, Settings):
+        self.IEEE = ",".join(Part.strip() for Part in Settings.split(","))
+
+    def OperationComplete(self):
+        return "1"
+
+    def Ignore(self, Command):
+        pass
+
+
+class SimOxford(SimModel):
+    """
+    Oxford Instruments ISOBUS instruments, a letter and a value
+    """
+    Termination = "\r"
+    Latency = {"write":0.02, "query":0.03}
+    Commands = [(r"([A-Z])\s*(.*)", "Command")]
+
+    def Command(self, Letter, Value):
+        Method = getattr(self, "Command_" + Letter.upper(), None)
+        if Method is None:
+            self.Unknown.append(Letter + Value)
+            return None
+        return Method(Value.strip())
+
+class SimOI_503(SimOxford):
+    """
+    Oxford ITC503. Sensor H follows the setpoint while the heater is in auto (A1 or A3).
+    """
+    IDN = "ITC503 Version 1.1"
+    Base = [4.2, 4.2, 4.2]
+
+    def __init__(self, **kwargs):
+        SimOxford.__init__(self, **kwargs)
+        self.Thermal = SimThermal(self.Base)
+        self.Auto = 0
+        self.Remote = 0
+        self.Sensor = 1
+        self.PIDMode = 0
+        self.Setpoint = self.Base[0]
+        self.Power = 0.0
+        self.Gas = 0.0
+        self.PID = [5.0, 1.0, 0.0]
+
+    def Update(self, Now):
+        Targets = [None]*3
+        if self.Auto in (1, 3):
+            Targets[self.Sensor-1] = self.Setpoint
+        self.Thermal.Step(Now - self.Last_T, Targets)
+
+    def Command_R(self, N):
+        N = int(N)
+        if N == 0:
+            return "{:.4f}".format(self.Setpoint)
+        if N in (1, 2, 3):
+            return "{:.4f}".format(self.Noisy(self.Thermal.Temps[N-1]))
+        if N == 5:
+            return "{:.1f}".format(self.Power)
+        if N == 7:
+            return "{:.1f}".format(self.Gas)
+        if N in (8, 9, 10):
+            return "{:.1f}".format(self.PID[N-8])
+        return "0"
+
+    def Command_X(self, Value):
+        return "X0A{}C{}S0H{}L{}".format(self.Auto, self.Remote, self.Sensor, self.PIDMode)
+
+    def Command_A(self, Value):
+        self.Auto = int(Value)
+
+    def Command_C(self, Value):
+        self.Remote = int(Value)
+
+    def Command_H(self, Value):
+        self.Sensor = int(Value)
+
+    def Command_L(self, Value):
+        self.PIDMode = int(Value)
+
+    def Command_T(self, Value):
+        self.Setpoint = _Number(Value)
+
+    def Command_O(self, Value):
+        self.Power = _Number(Value)
+
+    def Command_G(self, Value):
+        self.Gas = _Number(Value)
+
+    def Command_P(self, Value):
+        self.PID[0] = _Number(Value)
+
+    def Command_I(self, Value):
+        self.PID[1] = _Number(Value)
+
+    def Command_D(self, Value):
+        self.PID[2] = _Number(Value)
+
+class SimOI_ILM(SimOxford):
+    """
+    Oxford ILM level meter, channel 1 helium boiling off slowly, channel 2 nitrogen
+    """
+    IDN = "ILM200 Version 1.0"
+    Latency = {"write":0.03, "query":0.05}
+    #percent per hour
+    BoilOff = 0.5
+
+    def __init__(self, **kwargs):
+        SimOxford.__init__(self, **kwargs)
+        self.Levels = [80.0, 60.0, 0.0]
+
+    def Update(self, Now):
+        self.Levels[0] = max(self.Levels[0] - self.BoilOff*(Now - self.Last_T)/3600, 0)
+
+    def Command_R(self, N):
+        N = int(N)
+        if N in (1, 2, 3):
+            return "{:.1f}".format(self.Levels[N-1])
+        return "0"
+
+    def Command_X(self, Value):
+        #He, N2, not used; no alarms
+        return "X210S000000R00"
+
+    def Command_C(self, Value):
+        pass
+
+
+# =============================================================================
+# MAGNETS
+# =============================================================================
+
+class SimIPS120(SimOxford):
+    """
+    Oxford IPS120 magnet supply, the field ramps to the setpoint (A1) or zero (A2) at the sweep rate
+    """
+    IDN = "IPS120-10 Version 3.07"
+
+    def __init__(self, **kwargs):
+        SimOxford.__init__(self, **kwargs)
+        self.B = 0.0
+        self.Setpoint = 0.0
+        #tesla per minute
+        self.Rate = 0.1
+        self.Activity = 0
+        #switch heater on, the magnet follows the supply
+        self.Heater = 1
+        self.Remote = 3
+
+    def Target(self):
+        if self.Activity == 1:
+            return self.Setpoint
+        if self.Activity == 2:
+            return 0.0
+        return self.B
+
+    def Update(self, Now):
+        self.B = _Ramp(self.B, self.Target(), self.Rate/60, Now - self.Last_T)
+
+    def Command_R(self, N):
+        N = int(N)
+        if N == 7:
+            return "R{:+.5f}".format(self.B)
+        if N == 8:
+            return "R{:+.5f}".format(self.Setpoint)
+        if N == 9:
+            return "{:.5f}".format(self.Rate)
+        return "R0"
+
+    def Command_X(self, Value):
+        Ramping = 1 if self.B != self.Target() else 0
+        return "X00A{}C{}H{}M1{}P00".format(self.Activity, self.Remote, self.Heater, Ramping)
+
+    def Command_A(self, Value):
+        self.Activity = int(Value)
+
+    def Command_C(self, Value):
+        self.Remote = int(Value)
+
+    def Command_H(self, Value):
+        #0 off, 1 on, 2 on without checking
+        self.Heater = 1 if Value in ("1", "2") else (2 if self.B != 0 else 0)
+
+    def Command_J(self, Value):
+        self.Setpoint = _Number(Value)
+
+    def Command_T(self, Value):
+        self.Rate = _Number(Value)
+
+    def Command_Q(self, Value):
+        pass
+
+    def Command_M(self, Value):
+        pass
+
+class SimSMS120C(SimModel):
+    """
+    Cryogenic SMS120C magnet supply (serial, "LETTER ARG" commands, replies start with the time).
+    Ramps to zero, mid or max at RampRate amps per second.
+    """
+    IDN = "SMS120C"
+    Termination = "\r\n"
+    Latency = {"write":0.03, "query":0.05}
+    Commands = [(r"R\s+S", "Status"),
+                (r"R\s+([0%!])", "RampTo"),
+                (r"G\s+([O%!TSL])", "GetValue"),
+                (r"S\s+([%!R])\s+(\S+)", "SetValue"),
+                (r"U", "Update_All"),
+                (r"P\s+(\d)", "Pause"),
+                (r"H\s+(\d)", "Heater"),
+                (r"T\s+(\d)", "Tesla"),
+                (r"D\s+([+-])", "Direction")]
+
+    def __init__(self, **kwargs):
+        SimModel.__init__(self, **kwargs)
+        #output in amps, TPA tesla per amp
+        self.I = 0.0
+        self.TPA = 0.1
+        self.RampRate = 0.05
+        self.Mid = 1.0
+        self.Max = 2.0
+        self.TargetI = 0.0
+        self.Paused = False
+        self.HeaterOn = False
+        self.InTesla = True
+        self.Sign = 1
+
+    def Update(self, Now):
+        if not self.Paused:
+            self.I = _Ramp(self.I, self.TargetI, self.RampRate, Now - self.Last_T)
+
+    def Stamp(self, Text):
+        return time.strftime("%H:%M:%S") + " " + Text
+
+    def Units(self, Amps):
+        if self.InTesla:
+            return "{:.4f} TESLA".format(Amps*self.TPA)
+        return "{:.4f} AMPS".format(Amps)
+
+    def RampStatus(self):
+        if self.Paused:
+            return "PAUSED"
+        return "RAMPING" if self.I != self.TargetI else "HOLDING"
+
+    def Status(self):
+        return self.Stamp("RAMP STATUS: " + self.RampStatus())
+
+    def RampTo(self, Where):
+        Field = {"0":0.0, "%":self.Mid, "!":self.Max}[Where]
+        self.TargetI = self.Sign*Field/self.TPA if self.InTesla else self.Sign*Field
+
+    def GetValue(self, Which):
+        if Which == "O":
+            return "OUTPUT: " + self.Units(self.I) + " AT 0.0 VOLTS"
+        if Which == "%":
+            return self.Stamp("MID SETTING: {:.4f} TESLA".format(self.Mid))
+        if Which == "!":
+            return self.Stamp("MAX SETTING: {:.4f} TESLA".format(self.Max))
+        if Which == "T":
+            return self.Stamp("FIELD CONSTANT: {:.4f} TESLA/AMP".format(self.TPA))
+        if Which == "S":
+            return self.Stamp("DIRECTION: " + ("POSITIVE" if self.Sign > 0 else "NEGATIVE"))
+        return self.Stamp("HEATER OUTPUT: 5.0 VOLTS")
+
+    def SetValue(self, Which, Value):
+        if Which == "%":
+            self.Mid = _Number(Value)
+            return self.GetValue("%")
+        if Which == "!":
+            self.Max = _Number(Value)
+            return self.GetValue("!")
+        self.RampRate = _Number(Value)
+        return self.Stamp("RAMP RATE: {:.4f} A/SEC".format(self.RampRate))
+
+    def Update_All(self):
+        #the lines update() reads, in order
+        return [self.Stamp("........ SMS120C STATUS"),
+                self.Stamp("UNITS: " + ("TESLA" if self.InTesla else "AMPS")),
+                self.Stamp("FIELD CONSTANT: {:.4f} TESLA/AMP".format(self.TPA)),
+                self.Stamp("VOLTAGE LIMIT: 5.0 VOLTS"),
+                self.Stamp("HEATER OUTPUT: 5.0 VOLTS"),
+                self.Stamp("RAMP RATE: {:.4f} A/SEC".format(self.RampRate)),
+                self.Stamp("MID SETTING: {:.4f} TESLA".format(self.Mid)),
+                self.Stamp("MAX SETTING: {:.4f} TESLA".format(self.Max)),
+                self.Stamp("HEATER STATUS: " + ("ON" if self.HeaterOn else "OFF")),
+                self.Stamp("PAUSE STATUS: " + ("ON" if self.Paused else "OFF")),
+                self.Stamp("RAMP STATUS: " + self.RampStatus()),
+                self.Stamp("DIRECTION: " + ("POSITIVE" if self.Sign > 0 else "NEGATIVE")),
+                self.Stamp("OUTPUT: " + self.Units(self.I) + " AT 0.0 VOLTS")]
+
+    def Pause(self, On):
+        self.Paused = On == "1"
+
+    def Heater(self, On):
+        self.HeaterOn = On == "1"
+        return self.Stamp("HEATER STATUS: " + ("ON" if self.HeaterOn else "OFF"))
+
+    def Tesla(self, On):
+        self.InTesla = On == "1"
+
+    def Direction(self, Sign):
+        self.Sign = 1 if Sign == "+" else -1
+
+
+#Driver name: model
+SimModels = {"SR830":SimSR830,
+             "SR860":SimSR860,
+             "DSP_7265":SimDSP_7265,
+             "DSP_7280":SimDSP_7280,
+             "Keithley2400":SimKeithley2400,
+             "Keithley6221":SimKeithley6221,
+             "Keithley236":SimKeithley236,
+             "Arroyo4300":SimArroyo4300,
+             "lakeshore350":SimLakeshore350,
+             "lakeshore218":SimLakeshore218,
+             "OI_503":SimOI_503,
+             "OI_ILM":SimOI_ILM,
+             "IPS120":SimIPS120,
+             "SMS120C":SimSMS120C}
+
+
+# =============================================================================
+# RESOURCES
+# =============================================================================
+
+class SimResource(object):
+    """
+    Stands in for a pyvisa resource (the self.VI of a driver)
+    """
+    CR = "\r"
+    LF = "\n"
+    CRLF = "\r\n"
+
+    def __init__(self, resource_name, Model, BusLock):
+        self.resource_name = resource_name
+        self.Model = Model
+        self.BusLock = BusLock
+        #ms, like pyvisa
+        self.timeout = 2000
+        self.write_termination = None
+        self.read_termination = None
+        self._Replies = deque()
+        #last command, for the reply latency
+        self._Last = ""
+
+    def _Strip(self, Message):
+        for Termination in (self.write_termination, "\r\n", "\n", "\r"):
+            if Termination and Message.endswith(Termination):
+                Message = Message[:-len(Termination)]
+        return Message
+
+    def write(self, message):
+        Command = self._Strip(message)
+        with self.BusLock:
+            time.sleep(self.Model.CommandLatency(Command, "write"))
+            self._Replies.extend(self.Model.Handle(Command))
+            self._Last = Command
+        return len(message)
+
+    def read(self):
+        with self.BusLock:
+            if len(self._Replies) == 0:
+                Reply = self.Model.Talk()
+                if Reply is None:
+                    #nothing to read, the real thing waits for the timeout
+                    time.sleep((self.timeout or 0)/1000)
+                    raise SimulatedVisaError(TimeoutMessage)
+            else:
+                Reply = self._Replies.popleft()
+            time.sleep(self.Model.CommandLatency(self._Last, "query"))
+        if self.read_termination:
+            return Reply
+        return Reply + self.Model.Termination
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    def clear(self):
+        self._Replies.clear()
+
+    def close(self):
+        pass
+
+class SimResourceManager(object):
+    """
+    Stands in for pyvisa.ResourceManager, every resource is a simulated instrument
+    """
+    Simulated = True
+
+    def __init__(self, Instruments=None, Latency=None, Noise=None, Seed=None):
+        """
+        Parameters
+        ----------
+        Instruments : dict, optional
+            {address: model name}, or {address: {"Model":name, "Latency":{...}, "Noise":n}}.
+            Anything else gets the model of the driver that opens it.
+        Latency : dict, optional
+            Seconds, {"write":s, "query":s, "<start of a command>":s}, for all the instruments.
+            The default is each model's own.
+        Noise : float, optional
+            Noise as a fraction of the readings. The default is each model's own.
+        Seed : int, optional
+            Random seed for the noise
+        """
+        self.Instruments = dict(Instruments or {})
+        self.Latency = Latency
+        self.Noise = Noise
+        self.Seed = Seed
+        #models stay the same for an address, like the instrument would
+        self.Models = {}
+        self.BusLocks = {}
+        self._Lock = threading.Lock()
+
+    def MakeModel(self, Address, Name):
+        Settings = self.Instruments.get(Address, {})
+        if isinstance(Settings, str):
+            Settings = {"Model":Settings}
+        Name = Settings.get("Model", Name)
+        Latency = dict(self.Latency or {})
+        Latency.update(Settings.get("Latency", {}))
+        Noise = Settings.get("Noise", self.Noise)
+        Model = SimModels.get(Name, SimSCPI)
+        return Model(Latency=Latency or None, Noise=Noise, Seed=self.Seed)
+
+    def open_resource(self, resource_name, Driver=None, **kwargs):
+        """
+        Driver is the name of the driver opening it, found from the stack if not given
+        """
+        with self._Lock:
+            if resource_name not in self.Models:
+                self.Models[resource_name] = self.MakeModel(resource_name, Driver or CallingDriver())
+            #one bus per GPIB board, serial ports are on their own
+            Bus = resource_name.split("::")[0] if resource_name.upper().startswith("GPIB") else resource_name
+            BusLock = self.BusLocks.setdefault(Bus, threading.RLock())
+        return SimResource(resource_name, self.Models[resource_name], BusLock)
+
+    def list_resources(self, query="?*::INSTR"):
+        return tuple(sorted(set(self.Instruments) | set(self.Models)))
+
+    def close(self):
+        pass
+
+def CallingDriver():
+    """
+    Name of the driver class opening a resource, found from the stack
+    (Instrument.__init__ called from the driver's __init__)
+    """
+    Frame = inspect.currentframe()
+    try:
+        while Frame is not None:
+            Self = Frame.f_locals.get("self")
+            if Self is not None:
+                for Class in type(Self).__mro__:
+                    if Class.__name__ in SimModels:
+                        return Class.__name__
+            Frame = Frame.f_back
+    finally:
+        del Frame #done to prevent memory leaks due to reccurent frame references
+    return None
+
+
+def Simulating():
+    """
+    True if AUTOLAB_SIMULATE is set
+    """
+    return os.environ.get(SimulateVar, "") not in ("", "0")
+
+#The one for this process, so the instruments keep their state between users
+_Shared = None
+_SharedLock = threading.Lock()
+
+def SharedSimulation():
+    """
+    The SimResourceManager for this process, set up from AUTOLAB_SIMULATE
+    """
+    global _Shared
+    with _SharedLock:
+        if _Shared is None:
+            Config = os.environ.get(SimulateVar, "")
+            Settings = {}
+            if os.path.isfile(Config):
+                with open(Config) as File:
+                    Settings = json.load(File)
+            _Shared = SimResourceManager(**Settings)
+        return _Shared
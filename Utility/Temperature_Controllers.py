@@ -6,10 +6,13 @@ Created on Thu May 29 17:13:36 2025
 """
 import Instruments as Inst
 import pyvisa
+from .InstrumentBroker import ResourceManager
 #Export/String Packages
 import time
 import re
 
+from .Messages import SendRow, SendControl, SendError
+
 def Lakeshore_350_Controller(Pipe,TCon_add, TMon_add=None):
     """
     Multiprocessing Process for Temperature Monitoring using Lakeshores. 
@@ -50,7 +53,7 @@ def Lakeshore_350_Controller(Pipe,TCon_add, TMon_add=None):
     TMon_add : VISA address for a Temperature Monitor.
 
     """
-    rm = pyvisa.ResourceManager()
+    rm = ResourceManager()
     Abort = False
     IsRamping=False#Bool to tag if temperature is ramping
     IsStable=False#Placeholder for Stability criteria.
@@ -64,7 +67,7 @@ def Lakeshore_350_Controller(Pipe,TCon_add, TMon_add=None):
     except Exception as e:
         print(e)
         print("Error IN Connection")
-        Pipe.send("Esc")
+        SendControl(Pipe,"Esc")
         Abort=True
 
 
@@ -77,7 +80,7 @@ def Lakeshore_350_Controller(Pipe,TCon_add, TMon_add=None):
             
         else:
             Current_TMon=[]
-        Pipe.send([time.time(),Current_TCon_VTI,Current_TCon_Sample,*Current_TMon,IsRamping,IsStable])#sends the current reading of the pipes to be read
+        SendRow(Pipe,[time.time(),Current_TCon_VTI,Current_TCon_Sample,*Current_TMon,IsRamping,IsStable])#sends the current reading of the pipes to be read
         
         #time.sleep(0.25)
 # =============================================================================
@@ -198,7 +201,7 @@ def OI_503_Controller(Pipe,TCon_add, LMon_add=None):
     LMon_add : VISA address for a LevelMeter.
 
     """
-    rm = pyvisa.ResourceManager()
+    rm = ResourceManager()
     Abort = False
     IsRamping=False#Bool to tag if temperature is ramping
     IsStable=False#Placeholder for Stability criteria.
@@ -212,8 +215,8 @@ def OI_503_Controller(Pipe,TCon_add, LMon_add=None):
     except Exception as e:
         print(e)
         print("Error IN Connection")
-        Pipe.send(e)
-        Pipe.send("Esc")
+        SendError(Pipe,e)
+        SendControl(Pipe,"Esc")
         Abort=True
 
    
@@ -226,7 +229,7 @@ def OI_503_Controller(Pipe,TCon_add, LMon_add=None):
         if L_Mon is not None:
             Current_LMon.append(L_Mon.getLevelN(1))
             Current_LMon.append(L_Mon.getLevelN(2))#query channels 1 and 2. If there is no Lmon, should return a blank list
-        Pipe.send([time.time(),Current_TCon_VTI,Current_TCon_Sample,*Current_LMon,IsRamping,IsStable])
+        SendRow(Pipe,[time.time(),Current_TCon_VTI,Current_TCon_Sample,*Current_LMon,IsRamping,IsStable])
         #sends the current reading of the pipes to be read
         
         #time.sleep(0.25)
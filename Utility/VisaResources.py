@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Shared list of VISA addresses.
+
+rm.list_resources() scans every GPIB/serial/USB interface and can take seconds.
+It used to be called by the main window and again by every lockin/keithley tab
+as it was made, so opening AutoLab did the same slow scan many times over.
+
+Now there is one ResourceDiscovery per process (ResourcesObj holds it as
+Resources.Discovery). It scans in a background thread and keeps the answer for
+TTL seconds. After that the old list is still given out straight away while a
+new scan runs in the background. Tabs just call Utility.ListResources().
+Only the very first call has to wait for a scan to finish.
+
+The Refresh Comms button (or Refresh()) forces a new scan.
+"""
+
+import threading
+import time
+
+class ResourceDiscovery(object):
+    """
+    Background scanned, cached list of VISA resources
+    """
+
+    def __init__(self, TTL=300.0):
+        """
+        Parameters
+        ----------
+        TTL : float, optional
+            Seconds before the list is scanned again. The default is 300.
+        """
+        self.TTL = TTL
+
+        self.Addresses = None
+        self.Scan_T = None
+
+        self._Lock = threading.Lock()
+        self._Scanning = None
+        #set when a scan finishes
+        self._Done = threading.Event()
+
+    def Scan(self):
+        """
+        Scans for resources, blocking. Normally run on the background thread.
+        """
+        try:
+            #through the broker if it's running, simulated instruments if AUTOLAB_SIMULATE is set
+            from .InstrumentBroker import ResourceManager
+            rm = ResourceManager()
+            try:
+                Addresses = tuple(rm.list_resources())
+            finally:
+                rm.close()
+        except Exception as e:
+            print(e)
+            print("VISA resource scan failed")
+            #keep the last list if there was one
+            Addresses = self.Addresses if self.Addresses is not None else ()
+
+        with self._Lock:
+            self.Addresses = Addresses
+            self.Scan_T = time.time()
+            self._Scanning = None
+        self._Done.set()
+        return Addresses
+
+    def StartScan(self):
+        """
+        Starts a scan in the background unless one is already going
+        """
+        with self._Lock:
+            if self._Scanning is not None:
+                return
+            self._Done.clear()
+            self._Scanning = threading.Thread(target=self.Scan, daemon=True)
+            self._Scanning.start()
+
+    def IsScanning(self):
+        return self._Scanning is not None
+
+    def List(self, Timeout=None):
+        """
+        The cached list of addresses.
+        Starts a new scan if it's older than the TTL, but still returns the old list.
+        Only waits if there has never been a scan.
+
+        Parameters
+        ----------
+        Timeout : float, optional
+            Max seconds to wait for the first scan. The default is None (as long as it takes).
+
+        Returns
+        -------
+        New list of addresses, so it can be changed without changing the cache
+        """
+        if self.Scan_T is None or time.time()-self.Scan_T > self.TTL:
+            self.StartScan()
+        if self.Addresses is None:
+            self._Done.wait(Timeout)
+        return list(self.Addresses or ())
+
+    def Refresh(self, Wait=True):
+        """
+        Forces a new scan
+
+        Parameters
+        ----------
+        Wait : bool, optional
+            Wait for it to finish and return the new list. The default is True.
+            Otherwise returns straight away, check IsScanning() for when it's done.
+        """
+        self.StartScan()
+        if Wait:
+            self._Done.wait()
+            return list(self.Addresses or ())
+        return None
+
+
+#The one for this process, made by SharedDiscovery
+_Shared = None
+_SharedLock = threading.Lock()
+
+def SharedDiscovery():
+    """
+    The ResourceDiscovery shared by everything in this process, made the first time it's needed
+    """
+    global _Shared
+    with _SharedLock:
+        if _Shared is None:
+            _Shared = ResourceDiscovery()
+        return _Shared
+
+def ListResources():
+    """
+    Cached list of VISA addresses, use instead of rm.list_resources()
+    """
+    return SharedDiscovery().List()
@@ -1,5 +1,3 @@
-
-
 #Code from https://stackoverflow.com/questions/1057431/how-to-load-all-modules-in-a-folder
 #from os.path import dirname, basename, isfile, join
 #import glob
@@ -8,28 +6,66 @@
 #__all__ = [ basename(f)[:-3] for f in modules if isfile(f) and not f.endswith('__init__.py')]
 
 #Actually works
-from .GraphUtil import *
-from .FileUtil import *
 
-#test utility
-from .TestUtil import *
-from .TimeUtil import *
+#The non-GUI parts every run needs are imported straight away, they only need numpy.
+#Some of them have a class with the same name as the file (FileWriter, DataStore...),
+#importing them here is what makes Utility.FileWriter the class rather than the module.
+from .FileWriter import *
+from .FileEnum import *
+from .Compression import *
+from .DataStore import *
+from .SharedRing import *
+from .Messages import *
+from .DataLoader import *
+from .RunCatalog import *
+from .VisaResources import *
+from .InstrumentBroker import *
+from .SimulatedVisa import *
+
+#Everything else (the utility tabs, monitor window, preview plot...) pulls in
+#tkinter/matplotlib/scipy/pyvisa, so it's only imported the first time it's used:
+#Utility.GraphUtil.Util, getattr(Utility,"TestUtil") in SetupUtilTabs, Utility.HDF5Writer...
+#Worker processes then only import what they use.
+#
+#Use Utility.Preview_plot rather than "import Utility.Preview_plot", importing the file
+#directly before it's been used makes Utility.Preview_plot the module instead of the class.
+
+import os
+import importlib
 
-from .IPSMagUtil import *
-from .SMSMagUtil import *
+#Names from the lazily loaded files that are used as Utility.<name>, and the file they're in
+_LazyNames = {"HDF5Writer":"BinaryWriter",
+              "NpyWriter":"BinaryWriter",
+              "HasHDF5":"BinaryWriter",
+              "MinMaxDecimator":"GraphUtil",
+              "Mon_Win":"Monitor_Window",
+              "Preview_plot":"Preview_plot",
+              "Lakeshore_350_Controller":"Temperature_Controllers",
+              "OI_503_Controller":"Temperature_Controllers"}
 
-from .Keithley_Current_Source import *
-from .LockinUtil import *
-from .LockinUtil_big import*#7280 Lockin
-from .LockinUtil_small import*#7265 Lockin
-from .LockinUtil_SRS import*
-from .ArroyoUtil import*
-from .LockinUtil_530SRS import *
+_Folder = os.path.dirname(__file__)
 
-from .Green_CryoTemp_Con import*
-from .Monitor_Window import*
+def _Modules():
+    """
+    Names of all the utility files
+    """
+    return [File[:-3] for File in os.listdir(_Folder) if File.endswith(".py") and File != "__init__.py"]
 
-from .Preview_plot import*
+def __getattr__(Name):
+    """
+    Imports a utility file the first time something from it is used
+    """
+    if Name in _LazyNames:
+        Value = getattr(importlib.import_module("." + _LazyNames[Name], __name__), Name)
+    elif not Name.startswith("_") and os.path.isfile(os.path.join(_Folder, Name + ".py")):
+        #utility tabs are used as Utility.<file>.Util
+        Value = importlib.import_module("." + Name, __name__)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, Name))
 
-from .sudoUtil import *
+    #next time it's found straight away
+    globals()[Name] = Value
+    return Value
 
+def __dir__():
+    return sorted(set(globals()) | set(_Modules()) | set(_LazyNames))
@@ -10,6 +10,8 @@ Utility for calling commands from the front panel
 import tkinter as tk
 from tkinter import ttk
 import pyvisa
+from .VisaResources import ListResources
+from .InstrumentBroker import ResourceManager
 import Instruments as Inst
 import pkgutil
 from inspect import signature
@@ -26,12 +28,11 @@ class Util(tk.Frame):
         master.add(sudoTab,text="Manual Control")
         
         try:
-            self.addresses=parent.address_list
+            #copy, the "GPIB Address" put on the front shouldn't end up in the main window's list
+            self.addresses=list(parent.address_list)
         except AttributeError:
             #if there is no address list, then make your own list
-            rm=pyvisa.ResourceManager()
-            self.addresses=rm.list_resources()
-            rm.close()
+            self.addresses=ListResources()#cached, scanned once in the background
         self.addresses.insert(0, "GPIB Address")
         self.Comlabel=tk.Label(sudoTab,text="Visa Address")
         self.Comlabel.grid(column=0,row=0)
@@ -135,7 +136,7 @@ class Util(tk.Frame):
         """
         Connect to the device using the parameters given from the menu and initialise the resource manager
         """
-        self.rm=pyvisa.ResourceManager()
+        self.rm=ResourceManager()
         if self.Com.get() != "GPIB Address" and self.Devices.get() != "Select Instrument": 
             #only does something if you have selected an address+instrument from dropdown
             try:
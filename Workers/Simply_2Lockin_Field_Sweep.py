@@ -123,7 +123,7 @@ class Handler(ttk.Notebook):
         
 def Worker(Pipe,Str,Stp,Rate,Dwl):
     
-    rm = pyvisa.ResourceManager()
+    rm = Util.ResourceManager()
     
     Abort = False
     
@@ -133,11 +133,11 @@ def Worker(Pipe,Str,Stp,Rate,Dwl):
         Mag = Inst.IPS120(rm,25)
     except Exception as e:
         print(e)
-        Pipe.send("Esc")
+        Util.SendControl(Pipe,"Esc")
         return
     
     #column headers
-    Pipe.send("#B    Rxx_X    Rxx_Y    Rxy_X    Rxy_Y\n")
+    Util.SendHeader(Pipe,"#B    Rxx_X    Rxx_Y    Rxy_X    Rxy_Y\n")
     
 
     #Test if Magnet switch heater is on
@@ -196,7 +196,7 @@ def Worker(Pipe,Str,Stp,Rate,Dwl):
         
         B = Mag.get_B()
         
-        Pipe.send([B,Rxx_X,Rxx_Y,Rxy_X,Rxy_Y])
+        Util.SendRow(Pipe,[B,Rxx_X,Rxx_Y,Rxy_X,Rxy_Y])
         
         time.sleep(Dwl)
         Mag.ExamineStatus()
@@ -223,12 +223,12 @@ def Worker(Pipe,Str,Stp,Rate,Dwl):
         
         B = Mag.get_B()
         
-        Pipe.send([B,Rxx_X,Rxx_Y,Rxy_X,Rxy_Y])
+        Util.SendRow(Pipe,[B,Rxx_X,Rxx_Y,Rxy_X,Rxy_Y])
         
         time.sleep(Dwl)
         Mag.ExamineStatus()
     
-    Pipe.send("Esc")
+    Util.SendControl(Pipe,"Esc")
 
 
 
@@ -137,7 +137,7 @@ class Handler(ttk.Notebook):
         
 def Worker(Pipe,Headers,Str,Stp,Steps,Dwl):
     #column headers
-    Pipe.send(Headers)
+    Utility.SendHeader(Pipe,Headers)
     
     for x in np.linspace(Str,Stp,int(Steps)):
         #steps has to be broadcast as int explicitly for np 1.23.5
@@ -155,15 +155,15 @@ def Worker(Pipe,Headers,Str,Stp,Steps,Dwl):
         Y1 = np.sin(x)*x**1.2 + np.random.normal()
         Y2 = np.cos(x)*x**1.2 + np.random.normal()
         
-        Pipe.send([X,Y1,Y2])
+        Utility.SendRow(Pipe,[X,Y1,Y2])
 
         time.sleep(Dwl)
     try:
        X[4]#nonsense. will throw an error.
     except Exception as e:
-        Pipe.send(e)
+        Utility.SendError(Pipe,e)
     finally:    
-        Pipe.send("Esc")
+        Utility.SendControl(Pipe,"Esc")
 
 
 
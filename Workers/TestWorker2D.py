@@ -14,6 +14,7 @@ from multiprocessing import Process, Queue
 import sys
 sys.path.append("..")
 import Instruments as Inst
+import Utility
 
 import pyvisa
 
@@ -96,10 +97,20 @@ class Handler(ttk.Notebook):
         
 def Worker(Pipe,Str,Stp,Steps,Dwl):
     
-    #column headers
-    Pipe.send("X    Y1    Y2\n")
+    #Line to start from, not 0 if resuming from a checkpoint
+    First = Utility.ResumeIndex(Pipe)
+    
+    #column headers, already in the file if carrying on from a checkpoint
+    if First==0:
+        Utility.SendHeader(Pipe,"X    Y1    Y2\n")
  
-    for x in np.linspace(Str,Stp,int(Steps)):
+    for i, x in enumerate(np.linspace(Str,Stp,int(Steps))):
+        
+        if i<First:
+            continue
+        
+        #collect each line of the map and send it as one block
+        Line = []
         
         for y in np.linspace(Str,Stp,int(Steps)):
         
@@ -112,11 +123,18 @@ def Worker(Pipe,Str,Stp,Steps,Dwl):
             
             z = np.cos(x)*np.sin(y)*x*y  + np.random.normal()
             
-            Pipe.send([x,y,z])
+            Line.append([x,y,z])
     
             time.sleep(Dwl)
+        
+        if len(Line)>0:
+            Utility.SendBlock(Pipe,np.array(Line))
+        
+        if len(Line)==int(Steps):
+            #the whole line is saved, can resume from the next one
+            Utility.SendCheckpoint(Pipe,i)
     
-    Pipe.send("Esc")
+    Utility.SendControl(Pipe,"Esc")
 
 
 
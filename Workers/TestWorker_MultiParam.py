@@ -148,7 +148,7 @@ def Worker(Pipe,Headers,Str,Stp,Steps,Dwl):
     z=0
     while z<3 and Abort==False:
         #column headers, do it once per multi param loop.
-        Pipe.send(Headers)
+        Utility.SendHeader(Pipe,Headers)
         for x in np.linspace(Str,Stp,int(Steps)):
             #steps has to be broadcast as int explicitly for np 1.23.5
             #Check for commands from controller
@@ -165,13 +165,13 @@ def Worker(Pipe,Headers,Str,Stp,Steps,Dwl):
             Y1 = np.sin(x)*x**z + np.random.normal()
             Y2 = np.cos(x)*x**z + np.random.normal()
             
-            Pipe.send([X,Y1,Y2,z])
+            Utility.SendRow(Pipe,[X,Y1,Y2,z])
     
             time.sleep(Dwl)
         print("Finished Loop {}".format(z+1))
-        Pipe.send("NewFile")
+        Utility.SendControl(Pipe,"NewFile")
         z+=1
-    Pipe.send("Esc")
+    Utility.SendControl(Pipe,"Esc")
 
 
 
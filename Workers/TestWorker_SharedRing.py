@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Test Worker for sending data through a shared memory ring rather than the Pipe.
+Use this as a template for fast measurements (buffered lockin/Keithley reads)
+where pickling every point through the pipe is too slow.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+import time
+import numpy as np
+from multiprocessing import Process, Queue
+
+import sys
+sys.path.append("..")
+import Instruments as Inst
+import Utility
+
+class Handler(ttk.Notebook):
+    """
+    Measurement worker of the main AutoLab window
+    """
+    def __init__(self, master, parent):
+        """
+        Preamble to set up the Main Script Frame
+        """
+        self.parent = parent
+        super().__init__(master)
+        self.Worker = None
+        self.Ring = None
+        self.MainFrame=tk.Frame(master)
+        self.MainFrame.grid(column=0, row=1, columnspan=3, rowspan=3)
+        master.add(self.MainFrame,text="Main Script")
+
+        """
+        Data Format Section
+        """
+        self.Header_List=["X","Y1","Y2"]
+
+        """
+        Initial setup of GUI widgets and the general window position
+        """
+
+        StartEntryLabel = tk.Label(self.MainFrame,text="Start")
+        StartEntryLabel.pack()
+        self.StartEntry = tk.Entry(self.MainFrame,width = 10)
+        self.StartEntry.insert(tk.END,"0")
+        self.StartEntry.pack()
+
+        StopEntryLabel = tk.Label(self.MainFrame,text="Stop")
+        StopEntryLabel.pack()
+        self.StopEntry = tk.Entry(self.MainFrame,width = 10)
+        self.StopEntry.insert(tk.END,"100")
+        self.StopEntry.pack()
+
+        StepEntryLabel = tk.Label(self.MainFrame,text="Steps")
+        StepEntryLabel.pack()
+        self.StepsEntry = tk.Entry(self.MainFrame,width = 10)
+        self.StepsEntry.insert(tk.END,"100000")
+        self.StepsEntry.pack()
+
+        BufferEntryLabel = tk.Label(self.MainFrame,text="Points per read")
+        BufferEntryLabel.pack()
+        self.BufferEntry = tk.Entry(self.MainFrame,width = 10)
+        self.BufferEntry.insert(tk.END,"1000")
+        self.BufferEntry.pack()
+
+        DwellEntryLabel = tk.Label(self.MainFrame,text="Dwell per read (s)")
+        DwellEntryLabel.pack()
+        self.DwellEntry = tk.Entry(self.MainFrame,width = 10)
+        self.DwellEntry.insert(tk.END,"0.05")
+        self.DwellEntry.pack()
+
+
+    def Start(self,Pipe):
+
+        Str  = float(self.StartEntry.get())
+        Stp  = float(self.StopEntry.get() )
+        Steps = float(self.StepsEntry.get())
+        Buf  = int(self.BufferEntry.get())
+        Dwl  = float(self.DwellEntry.get())
+
+        try:
+            #The main window picks up self.Ring after Start and reads from it.
+            #It also frees it when the measurement finishes, so make a new one every run
+            self.Ring = Utility.SharedRing(len(self.Header_List))
+
+            self.Worker = Process(target=Worker, args=(Pipe,self.Ring,Str,Stp,Steps,Buf,Dwl))
+            self.Worker.start()
+
+        except Exception as e:
+            print(e)
+            print("failed to start multiprocessing of expirement worker")
+            return False
+
+        return True
+
+    def Stop(self):
+        """
+        Abort the current measurement as gracefully as possible
+        """
+        try:
+            self.Worker.terminate()
+        except:
+            return False
+
+        return True
+
+
+def Worker(Pipe,Ring,Str,Stp,Steps,Buf,Dwl):
+
+    X = np.linspace(Str,Stp,int(Steps))
+
+    for i in range(0,len(X),Buf):
+        #Check for commands from controller
+        if Pipe.poll():
+            Comm = Pipe.recv()
+            if Comm=="STOP":
+                break
+
+        #pretend this is one buffered read from an instrument
+        x = X[i:i+Buf]
+        Y1 = np.sin(x)*x + np.random.normal(size=len(x))
+        Y2 = np.cos(x)*x + np.random.normal(size=len(x))
+
+        Ring.WriteBlock(np.column_stack([x,Y1,Y2]))
+
+        time.sleep(Dwl)
+
+    #commands still go through the pipe
+    Utility.SendControl(Pipe,"Esc")
+
+
+
+if __name__=="__main__":
+    root = tk.Tk()
+    Expirment = Handler(root)
+    Expirment.mainloop()